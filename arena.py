@@ -0,0 +1,402 @@
+import math
+import random
+from array import array
+from collections import deque
+
+from engine import (DIRECTIONS, OPPOSITE, LINK_CODES, OPPOSITE_LINK,
+                    FOOD_SCORE, INPUT_QUEUE_SIZE, direction_between)
+
+# Đấu trường nhiều rắn trên cùng một bàn (không phụ thuộc pygame).
+# - Một lưới occupancy chung (bytearray) + owner (id rắn trên mỗi ô) +
+#   tail_links (hướng tới đốt kề phía đuôi, cho renderer như SnakeEngine).
+#   Va chạm đầu-thân, đầu-đầu và ăn táo đều là tra lưới O(1), không so
+#   từng cặp rắn, nên chi phí một tick tỉ lệ với số đầu đang di chuyển chứ
+#   không với tổng độ dài thân.
+# - Một tick: mọi rắn chọn ô kế tiếp, đuôi của rắn không ăn được bỏ trước
+#   (đi vào ô đuôi vừa rời là hợp lệ, như SnakeEngine), rồi xét va chạm đồng
+#   thời: hai đầu vào cùng ô -> cả hai chết ('head'); vào ô đang có thân ->
+#   'self' hoặc 'snake' theo owner. Thân rắn chết được dọn sau cùng (mỗi ô
+#   chỉ bị dọn một lần trong đời nên tổng chi phí vẫn khấu hao O(1)).
+# - Rắn được điều khiển bởi người (queue_turn), AI (ArenaBot) hoặc replay
+#   (ReplayDriver); slot của rắn chết được dùng lại khi spawn.
+# - add_snake / advance_snake / remove_snake / add_food áp dụng từng thay
+#   đổi từ bên ngoài, để client mạng (net.py) dựng lại đúng trạng thái từ
+#   delta của server mà không chạy lại mô phỏng.
+
+ARENA_SPAWN_TRIES = 50
+ARENA_CELLS_PER_SNAKE = 150
+ARENA_FOOD_PER_SNAKE = 0.5
+
+
+def arena_size(snakes, min_width=32, min_height=16):
+    # Bàn vuông đủ ARENA_CELLS_PER_SNAKE ô cho mỗi con rắn.
+    side = math.ceil(math.sqrt(snakes * ARENA_CELLS_PER_SNAKE))
+    return max(min_width, side), max(min_height, side)
+
+
+def arena_food_count(snakes):
+    return max(1, int(snakes * ARENA_FOOD_PER_SNAKE))
+
+
+class ArenaSnake:
+    __slots__ = ('id', 'body', 'direction', 'change_to', 'turn_queue', 'alive',
+                 'death_cause', 'score', 'ticks', 'grew')
+
+    def __init__(self, snake_id, cells, direction):
+        self.id = snake_id
+        self.body = deque(cells)
+        self.direction = direction
+        self.change_to = direction
+        self.turn_queue = deque()
+        self.alive = True
+        self.death_cause = None
+        self.score = 0
+        self.ticks = 0
+        self.grew = False
+
+    @property
+    def head(self):
+        return self.body[0]
+
+    @property
+    def tail(self):
+        return self.body[-1]
+
+    @property
+    def length(self):
+        return len(self.body)
+
+
+class ArenaStepResult:
+    __slots__ = ('deaths', 'eaten', 'food_added')
+
+    def __init__(self):
+        self.deaths = [] # (id, nguyên nhân): 'wall', 'self', 'snake' hoặc 'head'
+        self.eaten = []  # (id, ô táo)
+        self.food_added = [] # Ô táo mới sinh trong tick
+
+
+class ArenaEngine:
+    def __init__(self, grid_width=64, grid_height=36, food_count=1, seed=None, base_speed=10):
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.food_count = food_count
+        self.seed = seed
+        self.speed = base_speed
+        self.rng = random.Random(seed)
+        size = grid_width * grid_height
+        self.occupancy = bytearray(size)
+        self.owner = array('i', [-1]) * size
+        self.tail_links = bytearray(size)
+        self.food = bytearray(size)
+        self.food_cells = set()
+        self._free_cells = array('i', range(size))
+        self._free_index = array('i', range(size))
+        self.snakes = []
+        self._free_ids = []
+        self.ticks = 0
+        self.refill_food()
+
+    # --- GRID ---
+    def _occupy(self, index, snake_id):
+        self.occupancy[index] += 1
+        self.owner[index] = snake_id
+        if self.occupancy[index] == 1:
+            free_cells = self._free_cells
+            free_index = self._free_index
+            pos = free_index[index]
+            last = free_cells.pop()
+            if last != index:
+                free_cells[pos] = last
+                free_index[last] = pos
+            free_index[index] = -1
+
+    def _vacate(self, index):
+        self.occupancy[index] -= 1
+        if self.occupancy[index] == 0:
+            self._free_index[index] = len(self._free_cells)
+            self._free_cells.append(index)
+
+    @property
+    def free_cell_count(self):
+        return len(self._free_cells)
+
+    def random_free_cell(self):
+        free_cells = self._free_cells
+        for _ in range(ARENA_SPAWN_TRIES):
+            if not free_cells:
+                return None
+            index = free_cells[self.rng.randrange(len(free_cells))]
+            if not self.food[index]:
+                return index
+        return None
+
+    def spawn_food(self):
+        index = self.random_free_cell()
+        if index is None:
+            return None
+        self.food[index] = 1
+        self.food_cells.add(index)
+        return (index % self.grid_width, index // self.grid_width)
+
+    def refill_food(self):
+        added = []
+        while len(self.food_cells) < self.food_count:
+            pos = self.spawn_food()
+            if pos is None:
+                break
+            added.append(pos)
+        return added
+
+    def add_food(self, pos):
+        index = pos[1] * self.grid_width + pos[0]
+        self.food[index] = 1
+        self.food_cells.add(index)
+
+    @property
+    def food_positions(self):
+        width = self.grid_width
+        return [(index % width, index // width) for index in self.food_cells]
+
+    # --- SNAKES ---
+    @property
+    def alive_snakes(self):
+        return [snake for snake in self.snakes if snake.alive]
+
+    def spawn_snake(self, length=3, direction=None):
+        # Đặt rắn thẳng hàng ở chỗ trống ngẫu nhiên; trả về id, hoặc None
+        # nếu không tìm được chỗ sau ARENA_SPAWN_TRIES lần thử.
+        width, height = self.grid_width, self.grid_height
+        occupancy, food = self.occupancy, self.food
+        for _ in range(ARENA_SPAWN_TRIES):
+            head = self.random_free_cell()
+            if head is None:
+                return None
+            facing = direction or self.rng.choice(tuple(DIRECTIONS))
+            dx, dy = DIRECTIONS[facing]
+            x, y = head % width, head // width
+            # Chừa ít nhất 2 ô trống trước đầu để rắn mới không chết ngay.
+            cells = [(x - dx * i, y - dy * i) for i in range(-2, length)]
+            if all(0 <= cx < width and 0 <= cy < height and not occupancy[cy * width + cx]
+                   and not food[cy * width + cx] for cx, cy in cells):
+                break
+        else:
+            return None
+        return self.add_snake(cells[2:], facing)
+
+    def add_snake(self, cells, direction, snake_id=None):
+        # cells: đầu -> đuôi. snake_id do server quyết định khi dựng lại ở
+        # client; None = slot trống đầu tiên.
+        if snake_id is None:
+            snake_id = self._free_ids.pop() if self._free_ids else len(self.snakes)
+        else:
+            # Các slot chưa thấy bao giờ được giữ chỗ bằng rắn đã chết.
+            for free_id in range(len(self.snakes), snake_id + 1):
+                placeholder = ArenaSnake(free_id, (), direction)
+                placeholder.alive = False
+                self.snakes.append(placeholder)
+                self._free_ids.append(free_id)
+            self._free_ids.remove(snake_id)
+        snake = ArenaSnake(snake_id, cells, direction)
+        if snake_id == len(self.snakes):
+            self.snakes.append(snake)
+        else:
+            self.snakes[snake_id] = snake
+        width = self.grid_width
+        code = LINK_CODES[OPPOSITE[direction]]
+        for cx, cy in cells:
+            index = cy * width + cx
+            self._occupy(index, snake_id)
+            self.tail_links[index] = code
+        self.tail_links[cells[-1][1] * width + cells[-1][0]] = 0
+        return snake_id
+
+    def advance_snake(self, snake_id, head, grew):
+        # Một bước đã được server xác nhận là hợp lệ: không xét va chạm.
+        snake = self.snakes[snake_id]
+        width = self.grid_width
+        snake.direction = snake.change_to = direction_between(snake.body[0], head)
+        snake.grew = grew
+        snake.ticks += 1
+        if not grew:
+            tail_x, tail_y = snake.body.pop()
+            self._vacate(tail_y * width + tail_x)
+        index = head[1] * width + head[0]
+        snake.body.appendleft(head)
+        self._occupy(index, snake_id)
+        self.tail_links[index] = OPPOSITE_LINK[LINK_CODES[snake.direction]]
+        if self.food[index]:
+            self.food[index] = 0
+            self.food_cells.discard(index)
+            snake.score += FOOD_SCORE
+
+    def remove_snake(self, snake_id, cause='left'):
+        snake = self.snakes[snake_id]
+        snake.alive = False
+        snake.death_cause = cause
+        width = self.grid_width
+        for x, y in snake.body:
+            self._vacate(y * width + x)
+        self._free_ids.append(snake_id)
+
+    def turn(self, snake_id, direction):
+        snake = self.snakes[snake_id]
+        if direction in DIRECTIONS and direction != OPPOSITE[snake.direction]:
+            snake.change_to = direction
+
+    def queue_turn(self, snake_id, direction, timestamp=None):
+        # Như SnakeEngine.queue_turn: hàng đợi có giới hạn cho người chơi.
+        snake = self.snakes[snake_id]
+        queue = snake.turn_queue
+        last = queue[-1][0] if queue else snake.change_to
+        if (direction not in DIRECTIONS or direction == last or
+                direction == OPPOSITE[last] or len(queue) >= INPUT_QUEUE_SIZE):
+            return False
+        queue.append((direction, timestamp))
+        return True
+
+    def _kill(self, snake, cause, result):
+        result.deaths.append((snake.id, cause))
+        self.remove_snake(snake.id, cause)
+
+    # --- TICK ---
+    def step(self, actions=None):
+        # actions: {id: hướng} cho rắn do AI/replay điều khiển; rắn không có
+        # trong actions lấy lệnh từ hàng đợi của mình.
+        result = ArenaStepResult()
+        self.ticks += 1
+        width, height = self.grid_width, self.grid_height
+        food = self.food
+        moves = []
+        for snake in self.snakes:
+            if not snake.alive:
+                continue
+            action = actions.get(snake.id) if actions else None
+            if action is not None:
+                self.turn(snake.id, action)
+            elif snake.turn_queue:
+                queue = snake.turn_queue
+                while queue:
+                    direction = queue.popleft()[0]
+                    if direction != snake.change_to and direction != OPPOSITE[snake.direction]:
+                        snake.change_to = direction
+                        break
+            snake.ticks += 1
+            snake.direction = snake.change_to
+            dx, dy = DIRECTIONS[snake.direction]
+            head_x, head_y = snake.body[0]
+            x, y = head_x + dx, head_y + dy
+            if not (0 <= x < width and 0 <= y < height):
+                moves.append((snake, None, -1))
+                continue
+            index = y * width + x
+            snake.grew = bool(food[index])
+            moves.append((snake, (x, y), index))
+
+        # Bỏ đuôi trước khi xét va chạm; đếm số đầu muốn vào mỗi ô.
+        claims = {}
+        for snake, head, index in moves:
+            if head is None:
+                continue
+            if not snake.grew:
+                tail_x, tail_y = snake.body.pop()
+                self._vacate(tail_y * width + tail_x)
+            claims[index] = claims.get(index, 0) + 1
+
+        occupancy, owner = self.occupancy, self.owner
+        dead = []
+        for snake, head, index in moves:
+            if head is None:
+                dead.append((snake, 'wall'))
+            elif claims[index] > 1:
+                dead.append((snake, 'head'))
+            elif occupancy[index]:
+                dead.append((snake, 'self' if owner[index] == snake.id else 'snake'))
+            else:
+                snake.body.appendleft(head)
+                self._occupy(index, snake.id)
+                self.tail_links[index] = OPPOSITE_LINK[LINK_CODES[snake.direction]]
+                if snake.grew:
+                    food[index] = 0
+                    self.food_cells.discard(index)
+                    snake.score += FOOD_SCORE
+                    result.eaten.append((snake.id, head))
+
+        for snake, cause in dead:
+            snake.grew = False
+            self._kill(snake, cause, result)
+        if result.eaten:
+            result.food_added = self.refill_food()
+        return result
+
+
+# --- DRIVERS ---
+class ArenaBot:
+    # AI rẻ cho hàng trăm rắn: mỗi con nhắm một quả táo ngẫu nhiên (đổi khi
+    # táo mất), mỗi tick chọn trong các hướng không chết ngay hướng gần táo
+    # nhất, tránh ô kề đầu rắn khác. O(1) mỗi rắn, không tìm đường.
+    def __init__(self, seed=None, wander=0.05):
+        self.rng = random.Random(seed)
+        self.wander = wander
+        self.targets = {}
+
+    def decide(self, arena, snake):
+        width, height = arena.grid_width, arena.grid_height
+        occupancy = arena.occupancy
+        target = self.targets.get(snake.id)
+        if target is None or not arena.food[target]:
+            target = self.rng.choice(tuple(arena.food_cells)) if arena.food_cells else None
+            self.targets[snake.id] = target
+        head_x, head_y = snake.body[0]
+        tail = snake.body[-1]
+        best = None
+        best_score = None
+        for direction, (dx, dy) in DIRECTIONS.items():
+            if direction == OPPOSITE[snake.direction]:
+                continue
+            x, y = head_x + dx, head_y + dy
+            if not (0 <= x < width and 0 <= y < height):
+                continue
+            if occupancy[y * width + x] and (x, y) != tail:
+                continue
+            if target is None:
+                score = 0
+            else:
+                score = abs(x - target % width) + abs(y - target // width)
+            if self.near_other_head(arena, snake, x, y):
+                score += width + height
+            score += self.rng.random() * self.wander * width
+            if best_score is None or score < best_score:
+                best, best_score = direction, score
+        return best or snake.direction
+
+    def near_other_head(self, arena, snake, x, y):
+        # Ô kề đầu một con rắn khác: có thể va đầu nếu nó cũng rẽ vào đây.
+        width, height = arena.grid_width, arena.grid_height
+        occupancy, owner, snakes = arena.occupancy, arena.owner, arena.snakes
+        for dx, dy in DIRECTIONS.values():
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height:
+                index = ny * width + nx
+                if occupancy[index] and owner[index] != snake.id and snakes[owner[index]].body[0] == (nx, ny):
+                    return True
+        return False
+
+    def actions(self, arena, skip=()):
+        return {snake.id: self.decide(arena, snake)
+                for snake in arena.snakes if snake.alive and snake.id not in skip}
+
+
+class ReplayDriver:
+    # Phát lại danh sách (tick, hướng) (vd. replay_io.iter_inputs của một ván
+    # đơn) cho một con rắn; tick tính theo tuổi của con rắn đó.
+    def __init__(self, inputs):
+        self.inputs = list(inputs)
+        self.index = 0
+
+    def decide(self, arena, snake):
+        direction = None
+        while self.index < len(self.inputs) and self.inputs[self.index][0] <= snake.ticks:
+            direction = self.inputs[self.index][1]
+            self.index += 1
+        return direction
@@ -0,0 +1,447 @@
+import time
+from array import array
+from collections import deque
+
+from engine import DIRECTIONS, OPPOSITE, LINK_VECTORS
+
+# Người chơi tự động cho demo, chạy thử lâu (soak) và màn hình chờ.
+# Chiến lược: chu trình Hamilton có đường tắt.
+# - Chu trình Hamilton phủ mọi ô của bàn được tính một lần. Thân rắn luôn
+#   nằm theo thứ tự trên chu trình (đuôi -> đầu), nên đi theo chu trình
+#   không bao giờ tự cắn và cuối cùng lấp kín bàn.
+# - Khi rắn còn ngắn (< SHORTCUT_LIMIT diện tích), được đi tắt: tìm đường tới táo
+#   chỉ qua các ô tiến dần trên chu trình và không vượt táo (táo thì không
+#   vượt đuôi), nên cả đường đi giữ nguyên bất biến trên: đầu luôn còn đường
+#   theo chu trình tới đuôi, không cần giả lập sau khi ăn. Nếu không có
+#   đường (hoặc táo ở ngoài tầm ngân sách tìm kiếm), chọn ô kề tiến xa nhất
+#   trên chu trình mà chưa vượt táo/đuôi: trên bàn trống bước này tự nó đã
+#   đi gần như thẳng tới táo.
+# - Đường đi được giữ lại tới khi ăn và chỉ tìm lại khi mục tiêu đổi chỗ.
+#   Lần tìm không có đường cũng được nhớ: không tìm lại cho cùng mục tiêu
+#   tới khi ô thân gần đuôi nhất đã chặn nó (đánh dấu trong lúc tìm) thành
+#   đuôi. Bộ đệm tìm kiếm (mảng đánh dấu theo "tem", hàng đợi, mảng cha) và
+#   lưới occupancy ảo để giả lập được cấp phát một lần cho cả ván.
+# - Wrap mode: ăn táo làm rắn đảo đầu/đuôi và cấm rẽ theo hướng vừa đi,
+#   nên thường không thể tiếp tục theo chu trình. Ở chế độ này tìm đường tới
+#   táo (kiểm tra sau khi đảo đầu vẫn tới được đuôi mới), nếu không thì
+#   đuổi theo đuôi, cuối cùng chọn ô có vùng trống lớn nhất.
+# - Mọi lần tìm trong một quyết định (A* khoảng cách Manhattan, loang vùng
+#   trống) duyệt tổng cộng tối đa DECISION_BUDGET ô, nên thời gian quyết
+#   định có chặn trên kể cả trên bàn 500x500. Tìm táo ở wrap mode chỉ được
+#   dùng một nửa, phần còn lại để kiểm tra đuôi sau khi ăn; tìm đường tắt
+#   trên chu trình chỉ dùng một phần tư (đi theo chu trình cũng tới táo).
+#   Hết ngân sách khi tìm táo: đi về phía táo (theo chu trình, hoặc qua ô
+#   kề an toàn gần táo nhất) nửa quãng đường rồi tìm lại. Hết ngân sách khi
+#   kiểm tra đuôi: vùng trống rộng hơn phần ngân sách đó được coi là an
+#   toàn. Khi loang để chọn ô dự phòng, vùng đủ chứa cả thân (độ dài + 1 ô)
+#   là đủ.
+
+SHORTCUT_LIMIT = 0.5
+SHORTCUT_MARGIN = 4 # Số ô chừa lại trước đuôi khi đi tắt
+DECISION_BUDGET = 1200 # Số ô tối đa được duyệt (cộng mọi lần tìm) trong một quyết định
+
+
+def hamiltonian_cycle(width, height):
+    # Chu trình trên lưới width x height (toạ độ cục bộ), None nếu cả hai
+    # cạnh đều lẻ (khi đó không tồn tại chu trình Hamilton).
+    if height % 2 == 0:
+        cycle = [(x, 0) for x in range(width)]
+        for y in range(1, height):
+            xs = range(width - 1, 0, -1) if y % 2 == 1 else range(1, width)
+            cycle.extend((x, y) for x in xs)
+        cycle.extend((0, y) for y in range(height - 1, 0, -1))
+        return cycle
+    if width % 2 == 0:
+        return [(x, y) for y, x in hamiltonian_cycle(height, width)]
+    return None
+
+
+class Autopilot:
+    def __init__(self, engine, shortcut_limit=SHORTCUT_LIMIT):
+        self.engine = engine
+        self.shortcut_limit = shortcut_limit
+        width = engine.grid_width
+        top = engine.top_row
+        self.width = width
+        self.cells = width * (engine.grid_height - top)
+
+        size = width * engine.grid_height
+        self.neighbors = [()] * size
+        for y in range(top, engine.grid_height):
+            for x in range(width):
+                links = []
+                for direction, (dx, dy) in DIRECTIONS.items():
+                    nx, ny = x + dx, y + dy
+                    if 0 <= nx < width and top <= ny < engine.grid_height:
+                        links.append((direction, ny * width + nx))
+                self.neighbors[y * width + x] = tuple(links)
+        # Tuple/array thay cho list: GC không phải duyệt lại mảng lớn này.
+        self.neighbors = tuple(self.neighbors)
+
+        cycle = hamiltonian_cycle(width, engine.grid_height - top)
+        self.cycle_pos = None
+        if cycle is not None:
+            self.cycle_pos = array('i', bytes(4 * size))
+            for i, (x, y) in enumerate(cycle):
+                self.cycle_pos[(y + top) * width + x] = i
+
+        # Bộ đệm tìm kiếm dùng lại: ô đã thăm trong lần tìm hiện tại khi
+        # visit[ô] == stamp, nên không phải xoá mảng giữa các lần tìm.
+        self.visit = array('I', bytes(4 * size))
+        self.blocked = array('I', bytes(4 * size)) # tem của lần tìm gần nhất gặp ô bị chiếm này
+        self.stamp = 0
+        self.parent = array('i', bytes(4 * size))
+        self.queue = array('i', bytes(4 * size))
+        self.cost = array('i', bytes(4 * size))
+        # Bản sao occupancy, cập nhật mỗi tick theo ô đầu mới / ô đuôi vừa rời đi.
+        self.virtual = bytearray(engine.occupancy)
+        self.link_offsets = tuple(dy * width + dx for dx, dy in LINK_VECTORS)
+        self.column = array('i', [cell % width for cell in range(size)])
+        self.row = array('i', [cell // width for cell in range(size)])
+
+        self.reset()
+        self.decisions = 0
+        self.searches = 0
+        self.decide_seconds = 0.0
+        self.visited = 0 # Số ô đã duyệt trong quyết định hiện tại (trừ vào DECISION_BUDGET)
+        self.max_visited = 0
+
+    def reset(self):
+        self.forward = True
+        self.path = deque()
+        self.path_food = None
+        self.no_path = False # Lần tìm tới path_food gần nhất thất bại, chờ tới retry_tick
+        self.too_far = False # ... vì hết ngân sách, không phải vì không có đường
+        self.retry_tick = 0
+        self.cutoff = 0
+        self.last = None # (ticks, length, ô đuôi) ở lần quyết định trước
+
+    @property
+    def decisions_per_second(self):
+        return self.decisions / self.decide_seconds if self.decide_seconds else 0.0
+
+    def cycle_distance(self, a, b):
+        return (self.cycle_pos[b] - self.cycle_pos[a]) % self.cells
+
+    def cell(self, pos):
+        return pos[1] * self.width + pos[0]
+
+    # --- SEARCH ---
+    def next_stamp(self):
+        self.stamp += 1
+        if self.stamp >= 0xFFFFFFFF:
+            self.visit = array('I', bytes(len(self.visit) * 4))
+            self.blocked = array('I', bytes(len(self.blocked) * 4))
+            self.stamp = 1
+        return self.stamp
+
+    def track(self):
+        # Đồng bộ self.virtual với occupancy của engine sau một tick: thêm ô
+        # đầu mới (wrap mode: sau khi ăn rắn đảo chiều nên ô mới thành đuôi),
+        # bớt ô đuôi cũ nếu rắn không dài thêm.
+        engine = self.engine
+        ticks, length = engine.ticks, engine.length
+        last = self.last
+        if last is not None and ticks == last[0] + 1:
+            _, last_length, last_tail = last
+            grew = length != last_length
+            self.virtual[self.cell(engine.tail if grew and engine.wrap_mode else engine.head)] += 1
+            if not grew:
+                self.virtual[last_tail] -= 1
+        elif last is None or ticks != last[0]:
+            self.virtual[:] = engine.occupancy
+            self.no_path = False
+        if self.no_path and ticks >= self.retry_tick:
+            self.no_path = False
+        self.last = (ticks, length, self.cell(engine.tail))
+
+    def fail(self):
+        # Lần tìm vừa rồi (self.stamp) không tới được mục tiêu. Hết ngân sách
+        # (self.cutoff = cận dưới quãng đường còn lại): đi thêm nửa quãng đó
+        # rồi tìm lại. Không có đường: vùng đầu tới được chỉ rộng ra khi ô
+        # thân gần đuôi nhất đã chặn nó thành đuôi (đầu được đi vào ô đuôi),
+        # nên chờ chừng ấy tick rồi mới tìm lại.
+        engine = self.engine
+        self.too_far = self.cutoff > 0
+        if self.too_far:
+            wait = self.cutoff // 2
+        else:
+            stamp, blocked, links, offsets = self.stamp, self.blocked, engine.head_links, self.link_offsets
+            cell = self.cell(engine.tail)
+            wait = 1
+            for index in range(engine.length):
+                if blocked[cell] == stamp:
+                    wait = max(1, index)
+                    break
+                cell += offsets[links[cell]]
+        self.no_path = True
+        self.retry_tick = engine.ticks + wait
+
+    def search(self, start, goal, occupied, first_steps=None, mark=False, budget_ok=False, window=None,
+               limit=DECISION_BUDGET):
+        # A* (khoảng cách Manhattan) start -> goal (không gồm start) qua các ô
+        # có occupied[ô] == 0; ô goal được phép đang bị chiếm (vd. đuôi).
+        # first_steps: chỉ cho phép bước đầu tiên vào các ô này.
+        # mark: đánh dấu các ô bị chiếm đã chặn đường vào self.blocked.
+        # window: mỗi bước phải tiến trên chu trình (tính từ start) và không
+        # vượt quá window.
+        # Hết ngân sách (limit, không quá phần còn lại của quyết định này) thì
+        # trả về None với self.cutoff = cận dưới của độ dài đường đi (0 nếu
+        # đã duyệt hết mà không có đường), hoặc [] nếu budget_ok (vùng rộng
+        # hơn ngân sách coi như tới được).
+        # f = g + h của mỗi bước chỉ giữ nguyên hoặc tăng 2, nên thay heap
+        # bằng hai ngăn xếp (f hiện tại và f + 2). Lấy từ đỉnh ngăn xếp nên
+        # cùng f thì ô sâu hơn được mở trước: trên bàn trống chỉ duyệt cỡ độ
+        # dài đường đi.
+        self.cutoff = 0
+        stamp = self.next_stamp()
+        visit, parent, cost, neighbors = self.visit, self.parent, self.cost, self.neighbors
+        blocked = self.blocked if mark else None
+        cycle_pos, cells, column, row = self.cycle_pos, self.cells, self.column, self.row
+        limit = min(limit, DECISION_BUDGET - self.visited)
+        goal_x, goal_y = column[goal], row[goal]
+        estimate = abs(column[start] - goal_x) + abs(row[start] - goal_y)
+        self.searches += 1
+        visit[start] = stamp
+        cost[start] = 0
+        now, later = [], []
+        if first_steps is None:
+            now.append(start)
+        else:
+            if goal in first_steps:
+                return [goal]
+            for nxt in first_steps:
+                visit[nxt] = stamp
+                parent[nxt] = start
+                cost[nxt] = 1
+                if abs(column[nxt] - goal_x) + abs(row[nxt] - goal_y) < estimate:
+                    now.append(nxt)
+                else:
+                    later.append(nxt)
+        pushed = len(now) + len(later)
+        base = cycle_pos[start] if window is not None else 0
+        while now or later:
+            if not now:
+                now, later = later, now
+                estimate += 2
+            current = now.pop()
+            steps = cost[current]
+            distance = estimate - steps
+            if abs(column[current] - goal_x) + abs(row[current] - goal_y) != distance:
+                continue # Đã có đường ngắn hơn tới ô này
+            if pushed >= limit:
+                self.visited += pushed
+                if budget_ok:
+                    return []
+                self.cutoff = estimate
+                return None
+            steps += 1
+            if window is not None:
+                here = (cycle_pos[current] - base) % cells
+            for _, nxt in neighbors[current]:
+                if window is not None:
+                    ahead = (cycle_pos[nxt] - base) % cells
+                    if ahead <= here or ahead > window:
+                        continue
+                if nxt == goal:
+                    self.visited += pushed
+                    path = [nxt]
+                    while current != start:
+                        path.append(current)
+                        current = parent[current]
+                    path.reverse()
+                    return path
+                if visit[nxt] == stamp and cost[nxt] <= steps:
+                    continue
+                if occupied[nxt]:
+                    if mark:
+                        blocked[nxt] = stamp
+                    continue
+                visit[nxt] = stamp
+                parent[nxt] = current
+                cost[nxt] = steps
+                pushed += 1
+                if abs(column[nxt] - goal_x) + abs(row[nxt] - goal_y) < distance:
+                    now.append(nxt)
+                else:
+                    later.append(nxt)
+        self.visited += pushed
+        return None
+
+    def flood_size(self, start, limit):
+        # Số ô trống liên thông với start, đếm tới limit thì dừng.
+        stamp = self.next_stamp()
+        visit, queue, neighbors, occupied = self.visit, self.queue, self.neighbors, self.engine.occupancy
+        visit[start] = stamp
+        queue[0] = start
+        read, write = 0, 1
+        while read < write < limit:
+            current = queue[read]
+            read += 1
+            for _, nxt in neighbors[current]:
+                if visit[nxt] != stamp and occupied[nxt] == 0:
+                    visit[nxt] = stamp
+                    queue[write] = nxt
+                    write += 1
+        self.visited += write
+        return write
+
+    def tail_reachable_after(self, path):
+        # Giả lập đi hết `path` (ô cuối là táo nên rắn dài thêm 1) trên
+        # self.virtual rồi kiểm tra đầu mới còn tới được đuôi mới. Chỉ các ô
+        # đuôi rời đi (lần theo head_links từ đuôi) và các ô của path được
+        # sửa, kiểm tra xong thì hoàn lại.
+        engine = self.engine
+        virtual, links, offsets = self.virtual, engine.head_links, self.link_offsets
+        length = engine.length
+        vacated = []
+        cell = self.cell(engine.tail)
+        for _ in range(min(len(path) - 1, length)):
+            vacated.append(cell)
+            cell += offsets[links[cell]]
+        added = path[-(length + 1):]
+        # Còn giữ lại đốt nào của thân cũ thì cell là đuôi mới.
+        end = cell if len(vacated) < length else added[0]
+        for c in vacated:
+            virtual[c] -= 1
+        for c in added:
+            virtual[c] += 1
+        try:
+            if not engine.wrap_mode:
+                return self.search(path[-1], end, virtual, budget_ok=True) is not None
+            # Wrap mode: đầu mới là đuôi cũ và không được đi theo hướng của
+            # bước cuối cùng (bước ăn táo).
+            new_head, new_tail = end, path[-1]
+            last_from = path[-2] if len(path) > 1 else self.cell(engine.head)
+            banned = next(d for d, c in self.neighbors[last_from] if c == path[-1])
+            first_steps = [c for d, c in self.neighbors[new_head]
+                           if d != banned and (not virtual[c] or c == new_tail)]
+            return bool(first_steps) and self.search(new_head, new_tail, virtual, first_steps,
+                                                     budget_ok=True) is not None
+        finally:
+            for c in vacated:
+                virtual[c] += 1
+            for c in added:
+                virtual[c] -= 1
+
+    # --- DECISION ---
+    def decide(self):
+        start = time.perf_counter()
+        self.visited = 0
+        direction = self._decide()
+        self.decide_seconds += time.perf_counter() - start
+        self.decisions += 1
+        if self.visited > self.max_visited:
+            self.max_visited = self.visited
+        return direction
+
+    def _decide(self):
+        engine = self.engine
+        self.track()
+        occupancy = engine.occupancy
+        head = self.cell(engine.head)
+        tail = self.cell(engine.tail)
+        food = self.cell(engine.food_pos) if engine.food_pos else None
+        # Táo vàng (nếu có) được ưu tiên vì nhiều điểm và sắp biến mất.
+        target = self.cell(engine.golden_apple_pos) if engine.golden_apple_pos else food
+        banned = OPPOSITE[engine.direction]
+
+        moves = {}
+        for direction, nxt in self.neighbors[head]:
+            if direction == banned:
+                continue
+            # Ô đuôi sẽ được giải phóng ở chính bước này.
+            if occupancy[nxt] == 0 or nxt == tail:
+                moves[nxt] = direction
+        if not moves:
+            return engine.direction
+        if self.cycle_pos is None or engine.wrap_mode:
+            return self.survival_move(head, tail, target, moves)
+
+        tail_distance = self.cycle_distance(head, tail) if engine.length > 1 else self.cells
+        shortcuts = engine.length < self.cells * self.shortcut_limit
+        limit = tail_distance - SHORTCUT_MARGIN if shortcuts else 1
+
+        def legal(nxt):
+            return 0 < self.cycle_distance(head, nxt) <= max(1, limit)
+
+        # Chỉ tìm đường khi mục tiêu nằm trong cửa sổ hợp lệ trên chu trình
+        # (chưa vượt đuôi); nếu không, cứ đi theo chu trình tới khi tới lượt.
+        # Mỗi bước đi tắt cũng không được vượt qua mục tiêu trên chu trình,
+        # nếu không mục tiêu sẽ rơi ra ngoài cửa sổ và rắn phải đi vòng lại.
+        if shortcuts and target is not None and legal(target):
+            path = self.path
+            window = self.cycle_distance(head, target)
+
+            def on_way(nxt):
+                return 0 < self.cycle_distance(head, nxt) <= window
+
+            if self.path_food != target or (path and (path[0] not in moves or not on_way(path[0]))):
+                path.clear()
+                self.path_food = target
+                self.no_path = False
+            if not path and not self.no_path:
+                found = self.search(head, target, engine.occupancy, [nxt for nxt in moves if on_way(nxt)],
+                                    mark=True, window=window, limit=DECISION_BUDGET // 4)
+                if found:
+                    path.extend(found)
+                else:
+                    # Hết ngân sách thì đi theo chu trình (tiến dần tới mục tiêu).
+                    self.fail()
+            if path:
+                return moves[path.popleft()]
+
+        best = None
+        best_distance = -1
+        food_distance = self.cells
+        for goal in (food, target):
+            if goal is not None:
+                food_distance = min(food_distance, self.cycle_distance(head, goal))
+        for nxt in moves:
+            distance = self.cycle_distance(head, nxt)
+            if legal(nxt) and distance <= food_distance and distance > best_distance:
+                best, best_distance = nxt, distance
+        if best is not None:
+            return moves[best]
+        for nxt in moves:
+            if self.cycle_distance(head, nxt) == 1:
+                return moves[nxt]
+        return self.greedy_move(moves)
+
+    def survival_move(self, head, tail, target, moves):
+        path = self.path
+        if self.path_food != target:
+            path.clear()
+            self.path_food = target
+            self.no_path = False
+        if path and path[0] in moves:
+            return moves[path.popleft()]
+        path.clear()
+        occupancy = self.engine.occupancy
+        if target is not None and not self.no_path:
+            found = self.search(head, target, occupancy, list(moves), mark=True, limit=DECISION_BUDGET // 2)
+            if found and self.tail_reachable_after(found):
+                path.extend(found)
+                return moves[path.popleft()]
+            # Có đường nhưng không an toàn sau khi ăn thì tìm lại ở tick sau:
+            # kết quả giả lập còn phụ thuộc vị trí và hướng của đầu.
+            if not found:
+                self.fail()
+        if self.no_path and self.too_far:
+            return self.greedy_move(moves, target)
+        to_tail = self.search(head, tail, occupancy, list(moves))
+        if to_tail:
+            return moves[to_tail[0]]
+        return self.greedy_move(moves)
+
+    def greedy_move(self, moves, target=None):
+        # Dự phòng: chọn ô kề có vùng trống liên thông lớn nhất; có target
+        # thì chọn ô an toàn (vùng đủ chứa cả thân) gần target nhất.
+        enough = min(self.engine.length + 1, max(1, (DECISION_BUDGET - self.visited) // len(moves)))
+        sizes = {nxt: self.flood_size(nxt, enough) for nxt in moves}
+        if target is not None:
+            safe = [nxt for nxt in moves if sizes[nxt] >= enough]
+            if safe:
+                width = self.width
+                return moves[min(safe, key=lambda c: abs(c % width - target % width) + abs(c // width - target // width))]
+        return moves[max(moves, key=sizes.get)]
@@ -0,0 +1,672 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from arena import ArenaEngine, ArenaBot, arena_size, arena_food_count
+from autopilot import Autopilot
+from engine import SnakeEngine, direction_between
+from leaderboard import Leaderboard
+from net import NET_HOST, load_client, server_for
+from telemetry import TelemetryBus, DROP_POLICIES, read_events
+
+# Đo hiệu năng lõi mô phỏng (không cần pygame) và phần vẽ (pygame, chạy
+# được không cần màn hình nhờ SDL_VIDEODRIVER=dummy).
+# Chạy: python bench.py step | spawn | snake | idle | autopilot | arena | net | leaderboard | telemetry
+#       python bench.py suite [-o results.json] [--filter TÊN]
+#       python bench.py compare baseline.json results.json [--threshold 0.1]
+
+
+def serpentine_body(length, grid_width, grid_height):
+    # Xếp thân rắn zig-zag từ đáy bàn lên, trả về theo thứ tự đầu -> đuôi.
+    cells = []
+    for row in range(grid_height - 1, -1, -1):
+        xs = range(grid_width) if (grid_height - 1 - row) % 2 == 0 else range(grid_width - 1, -1, -1)
+        for x in xs:
+            cells.append((x, row))
+            if len(cells) == length:
+                cells.reverse()
+                return cells
+    raise ValueError("Snake does not fit on the board")
+
+
+def bench_step(lengths, steps=500, repeats=20, grid_size=1000):
+    print(f"{'length':>8} {'ns/step':>10}")
+    for length in lengths:
+        best = None
+        for _ in range(repeats):
+            engine = SnakeEngine(grid_size, grid_size, 0, seed=1)
+            body = serpentine_body(length, grid_size, grid_size)
+            engine.place_snake(body, 'UP')
+            engine.food_pos = (0, 0)
+            step = engine.step
+            start = time.perf_counter()
+            for _ in range(steps):
+                step()
+            elapsed = time.perf_counter() - start
+            if not engine.alive:
+                raise RuntimeError(f"Snake died during benchmark ({engine.death_cause})")
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{length:>8} {best / steps * 1e9:>10.0f}")
+
+
+def bench_spawn(fills, spawns=10000, grid_width=32, grid_height=16):
+    cells = grid_width * grid_height
+    print(f"{'fill':>6} {'ns/spawn':>10}")
+    for fill in fills:
+        length = min(cells - 1, max(3, int(cells * fill)))
+        engine = SnakeEngine(grid_width, grid_height, 0, seed=1)
+        engine.place_snake(serpentine_body(length, grid_width, grid_height), 'UP')
+        spawn_food = engine.spawn_food
+        start = time.perf_counter()
+        for _ in range(spawns):
+            spawn_food()
+        elapsed = time.perf_counter() - start
+        print(f"{length / cells:>6.1%} {elapsed / spawns * 1e9:>10.0f}")
+
+
+def load_game():
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    import game
+    if game.game_canvas is None:
+        game.init_display()
+    return game
+
+
+def legacy_draw_snake(game, pygame, shadow_canvas, visual_body, direction):
+    # Cách vẽ cũ: canvas bóng SRCALPHA toàn màn hình + draw.rect bo góc cho
+    # từng đốt (mắt/lưỡi bỏ qua vì không đổi giữa hai cách).
+    shadow_canvas.fill((0, 0, 0, 0))
+    for surface, color in ((shadow_canvas, game.COLOR_SHADOW), (game.game_canvas, game.COLOR_SNAKE)):
+        for pos in visual_body:
+            rect = pygame.Rect(pos[0], pos[1], game.BLOCK_SIZE, game.BLOCK_SIZE)
+            pygame.draw.rect(surface, color, rect, border_radius=game.SNAKE_CORNER_RADIUS)
+        head_rect = pygame.Rect(visual_body[0][0], visual_body[0][1], game.BLOCK_SIZE, game.BLOCK_SIZE)
+        pygame.draw.rect(surface, color, head_rect, border_radius=game.SNAKE_CORNER_RADIUS)
+        if surface is shadow_canvas:
+            game.game_canvas.blit(shadow_canvas, (game.SHADOW_OFFSET, game.SHADOW_OFFSET))
+
+
+def snake_pixels(game, length):
+    cells = serpentine_body(length, game.GRID_WIDTH, game.GRID_HEIGHT - game.INFO_BAR_GRID_HEIGHT)
+    return [[x * game.BLOCK_SIZE, (y + game.INFO_BAR_GRID_HEIGHT) * game.BLOCK_SIZE] for x, y in cells]
+
+
+def bench_snake(lengths, frames=200):
+    game = load_game()
+    import pygame
+    shadow_canvas = pygame.Surface((game.GAME_WIDTH, game.GAME_HEIGHT), pygame.SRCALPHA)
+    print(f"{'length':>8} {'legacy ms':>10} {'sprites ms':>11} {'speedup':>8}")
+    for length in lengths:
+        body = snake_pixels(game, length + 1)
+        current, prev = body[:-1], body[1:]
+        visual_body = [(game.lerp(p[0], c[0], 0.5), game.lerp(p[1], c[1], 0.5)) for c, p in zip(current, prev)]
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            legacy_draw_snake(game, pygame, shadow_canvas, visual_body, 'UP')
+        legacy = (time.perf_counter() - start) / frames
+
+        start = time.perf_counter()
+        for _ in range(frames):
+            game.draw_snake_smooth(current, prev, 0.5, 'UP')
+        sprites = (time.perf_counter() - start) / frames
+        print(f"{length:>8} {legacy * 1000:>10.3f} {sprites * 1000:>11.3f} {legacy / sprites:>7.1f}x")
+
+
+# --- IDLE CPU ---
+# Chạy từng màn hình tĩnh trong `seconds` giây rồi gửi QUIT (ở chế độ worker
+# QUIT chỉ ném SessionExit), đo CPU tiến trình đã dùng so với thời gian thực.
+# Với --mouse, một timer bắn MOUSEMOTION 60 lần/giây như khi rê chuột.
+# Dòng "event.wait floor" là một vòng pygame.event.wait trống: với driver
+# dummy SDL vẫn thăm dò mỗi ~1 ms nên đây là mức sàn của phép đo.
+def bench_idle(seconds=3.0, mouse=False):
+    game = load_game()
+    game.load_assets()
+    import pygame
+    game.WORKER_MODE = True
+
+    def wait_floor():
+        while True:
+            if any(event.type == pygame.QUIT for event in game.wait_for_events()):
+                return
+
+    screens = (
+        ('event.wait floor', wait_floor),
+        ('game_over_screen', lambda: game.game_over_screen(120, 450)),
+        ('high_score_screen', lambda: game.high_score_screen(450)),
+        ('pause_game', game.pause_game),
+    )
+    print(f"{'screen':<20} {'cpu %':>7}")
+    for name, run in screens:
+        pygame.event.clear()
+        pygame.time.set_timer(pygame.QUIT, int(seconds * 1000), loops=1)
+        if mouse:
+            pygame.time.set_timer(pygame.event.Event(pygame.MOUSEMOTION, pos=(10, 10), rel=(1, 0), buttons=(0, 0, 0)), 16)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            run()
+        except game.SessionExit:
+            pass
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+        pygame.time.set_timer(pygame.MOUSEMOTION, 0)
+        print(f"{name:<20} {cpu / wall * 100:>6.1f}%")
+
+
+# Chạy thử lâu AI (mặc định bàn 32x16, không pygame): mỗi ván một seed, đo
+# từng lần decide() để có phân vị thời gian quyết định. Mỗi ván chạy hai lần
+# (cùng seed nên cùng nước đi) và lấy thời gian nhỏ hơn của từng quyết định
+# để lọc nhiễu. max_us: trả về False nếu quyết định chậm nhất vượt ngưỡng.
+def play_autopilot(seed, wrap, max_ticks, board):
+    engine = SnakeEngine(*board, top_row=0, seed=seed, wrap_mode=wrap) if board else SnakeEngine(seed=seed, wrap_mode=wrap)
+    pilot = Autopilot(engine)
+    decide, step, clock = pilot.decide, engine.step, time.perf_counter
+    game_times = []
+    while engine.alive and engine.ticks < max_ticks:
+        start = clock()
+        direction = decide()
+        game_times.append(clock() - start)
+        step(direction)
+    return engine, pilot, game_times
+
+
+def bench_autopilot(games=5, wrap=False, max_ticks=200000, board=None, max_us=None):
+    from profiler import percentile
+    print(f"{'seed':>5} {'result':>8} {'length':>7} {'ticks':>8} {'dec/s':>9} {'p99 us':>8} {'max us':>8} {'cells':>6}")
+    times = []
+    decisions = seconds = wins = 0
+    for seed in range(games):
+        engine, pilot, game_times = play_autopilot(seed, wrap, max_ticks, board)
+        game_times = sorted(map(min, game_times, play_autopilot(seed, wrap, max_ticks, board)[2]))
+        times.extend(game_times)
+        decisions += pilot.decisions
+        seconds += pilot.decide_seconds
+        wins += engine.won
+        result = 'won' if engine.won else engine.death_cause or 'timeout'
+        print(f"{seed:>5} {result:>8} {engine.length:>7} {engine.ticks:>8} {pilot.decisions_per_second:>9,.0f} "
+              f"{percentile(game_times, 0.99) * 1e6:>8.1f} {game_times[-1] * 1e6:>8.1f} {pilot.max_visited:>6}")
+    times.sort()
+    print(f"won {wins}/{games} · {decisions / seconds:,.0f} decisions/s · "
+          f"p50 {percentile(times, 0.50) * 1e6:.1f} us · p99 {percentile(times, 0.99) * 1e6:.1f} us · "
+          f"max {times[-1] * 1e6:.1f} us")
+    if max_us is not None and times[-1] * 1e6 > max_us:
+        print(f"FAIL: slowest decision {times[-1] * 1e6:.1f} us > {max_us:.1f} us")
+        return False
+    return True
+
+
+# Đấu trường nhiều rắn do ArenaBot điều khiển (rắn chết được spawn lại để
+# giữ số lượng). Chỉ đo ArenaEngine.step, không tính thời gian của bot.
+def bench_arena(counts, lengths, ticks=1000, seed=1):
+    print(f"{'snakes':>7} {'length':>7} {'board':>9} {'cells':>8} {'us/tick':>9} {'us/head':>8} {'deaths':>7}")
+    for count in counts:
+        for length in lengths:
+            width, height = arena_size(count)
+            arena = ArenaEngine(width, height, arena_food_count(count), seed=seed)
+            bot = ArenaBot(seed)
+            spawned = sum(arena.spawn_snake(length) is not None for _ in range(count))
+            if spawned < count:
+                print(f"Warning: only {spawned}/{count} snakes of length {length} fit on {width}x{height}, skipped")
+                continue
+            elapsed = 0.0
+            heads = cells = deaths = 0
+            clock = time.perf_counter
+            for _ in range(ticks):
+                actions = bot.actions(arena)
+                heads += len(actions)
+                start = clock()
+                result = arena.step(actions)
+                elapsed += clock() - start
+                deaths += len(result.deaths)
+                alive = arena.alive_snakes
+                cells += sum(snake.length for snake in alive)
+                for _ in range(count - len(alive)):
+                    if arena.spawn_snake(length) is None:
+                        break
+            print(f"{count:>7} {length:>7} {f'{width}x{height}':>9} {cells // ticks:>8} "
+                  f"{elapsed / ticks * 1e6:>9.1f} {elapsed / max(1, heads) * 1e6:>8.2f} {deaths:>7}")
+
+
+# --- NETWORK LOAD ---
+# Server (net.py) chạy ở tiến trình riêng để CPU của các client không làm
+# sai lệch đo jitter; `clients` client không giao diện (load_client, chia
+# cho vài tiến trình) kết nối qua localhost, chơi `seconds` giây rồi so bản
+# sao với ảnh 'full'. Server chỉ dừng khi mọi client đã kiểm tra xong.
+def run_net_server(conn, players, bots, rate):
+    async def serve():
+        server = server_for(players, bots, rate, seed=1)
+        conn.send(await server.start(NET_HOST, 0))
+        task = asyncio.create_task(server.run())
+        await asyncio.get_running_loop().run_in_executor(None, conn.recv)
+        server.stop()
+        await task
+        conn.send(server.stats())
+    asyncio.run(serve())
+
+
+def run_net_clients(port, count, seconds, first_seed):
+    async def connect_all():
+        return await asyncio.gather(*(load_client(NET_HOST, port, seconds, seed=first_seed + i)
+                                      for i in range(count)))
+    return asyncio.run(connect_all())
+
+
+def bench_net(counts, seconds=5.0, bots=0, rate=10):
+    print(f"{'clients':>7} {'ticks':>6} {'jit p50':>8} {'jit p99':>8} {'jit max':>8} {'dropped':>7} "
+          f"{'delta B':>8} {'full B':>8} {'out KB/s':>9} {'in B/s':>8} {'desync':>6}")
+    processes = max(1, (os.cpu_count() or 1) - 1)
+    for count in counts:
+        parent, child = multiprocessing.Pipe()
+        server = multiprocessing.Process(target=run_net_server, args=(child, count, bots, rate))
+        server.start()
+        port = parent.recv()
+        shares = [count // processes + (i < count % processes) for i in range(processes)]
+        jobs = [(port, share, seconds, sum(shares[:i])) for i, share in enumerate(shares) if share]
+        with multiprocessing.Pool(len(jobs)) as pool:
+            clients = [c for group in pool.starmap(run_net_clients, jobs) for c in group]
+        parent.send('stop')
+        stats = parent.recv()
+        server.join()
+        server_seconds = stats['ticks'] / rate
+        received = statistics.mean(c['bytes_received'] for c in clients) / server_seconds
+        desyncs = sum(c['desyncs'] for c in clients) + sum(c['resyncs'] == 0 for c in clients)
+        print(f"{count:>7} {stats['ticks']:>6} {stats['jitter_p50_ms']:>6.2f}ms {stats['jitter_p99_ms']:>6.2f}ms "
+              f"{stats['jitter_max_ms']:>6.2f}ms {stats['dropped_ticks']:>7} {stats['delta_bytes_per_tick']:>8.0f} "
+              f"{stats['full_bytes']:>8.0f} {stats['bytes_sent'] / server_seconds / 1024:>9.1f} {received:>8.0f} {desyncs:>6}")
+
+
+# --- LEADERBOARD ---
+# Bảng điểm SQLite tạm được lấp dần tới từng cỡ trong `sizes` (ghi theo lô),
+# ở mỗi cỡ đo: ghi một ván (một transaction như game.py), điểm cao nhất và
+# top N của một chế độ.
+def bench_leaderboard(sizes, samples=200):
+    print(f"{'games':>9} {'record us':>10} {'high us':>8} {'top5 us':>8} {'top100 us':>10}")
+    rng = random.Random(1)
+
+    def timed(fn, *args):
+        times = []
+        for _ in range(samples):
+            start = time.perf_counter()
+            fn(*args)
+            times.append(time.perf_counter() - start)
+        return statistics.median(times) * 1e6
+
+    with tempfile.TemporaryDirectory() as directory:
+        board = Leaderboard(os.path.join(directory, 'bench.db'))
+        total = 0
+        for size in sizes:
+            while total < size:
+                batch = min(50000, size - total)
+                now = time.time()
+                board.record_many([(rng.choice(('normal', 'wrap')), rng.randrange(2000), rng.randrange(5000),
+                                    rng.random() * 300, now - rng.random() * 1e7) for _ in range(batch)])
+                total += batch
+            record = timed(board.record, 'normal', 10, 100, 12.5)
+            total += samples
+            print(f"{size:>9} {record:>10.1f} {timed(board.high_score, 'normal'):>8.1f} "
+                  f"{timed(board.top, 'normal', 5):>8.1f} {timed(board.top, 'normal', 100):>10.1f}")
+        board.close()
+
+
+def bench_telemetry(queue_sizes, events, burst):
+    # Dồn events sự kiện vào bus, mỗi lần burst sự kiện liền nhau rồi nhường
+    # CPU một chút (như các tick của game): đo chi phí emit trên luồng game và
+    # số sự kiện bị bỏ khi luồng ghi không theo kịp.
+    print(f"{'queue':>7} {'policy':>12} {'emit us':>8} {'max depth':>10} {'dropped':>8} "
+          f"{'written':>8} {'KB':>7} {'write ms':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for queue_size in queue_sizes:
+            for policy in DROP_POLICIES:
+                path = os.path.join(directory, f'bench-{queue_size}-{policy}.jsonl.gz')
+                bus = TelemetryBus(path, queue_size, policy)
+                emit_seconds = 0.0
+                for start in range(0, events, burst):
+                    begin = time.perf_counter()
+                    for tick in range(start, min(events, start + burst)):
+                        bus.emit('eat', tick=tick, golden=False, pos=(tick % 32, tick % 18), score=tick * 10,
+                                 length=tick % 500)
+                    emit_seconds += time.perf_counter() - begin
+                    time.sleep(0.001)
+                bus.close()
+                metrics = bus.metrics()
+                if metrics['written'] != len(read_events(path)):
+                    print("Warning: telemetry file does not match the written count")
+                print(f"{queue_size:>7} {policy:>12} {emit_seconds / events * 1e6:>8.2f} "
+                      f"{metrics['max_queue_depth']:>10} {metrics['dropped']:>8} {metrics['written']:>8} "
+                      f"{metrics['bytes'] / 1024:>7.1f} {metrics['write_ms']:>9.1f}")
+
+
+# --- SUITE ---
+# Mỗi benchmark là một hàm không đối số; thời gian/lần gọi lấy trung vị của
+# SUITE_REPEATS lượt, mỗi lượt lặp đủ số lần để kéo dài ~SUITE_ROUND_SECONDS.
+SUITE_REPEATS = 7
+SUITE_ROUND_SECONDS = 0.02
+SUITE_SNAKE_LENGTHS = (3, 100, 500)
+SUITE_WINDOW_SIZES = ((960, 540), (1280, 720), (1920, 1080), (2560, 1440))
+SUITE_PARTICLE_COUNTS = (100, 1000, 4000)
+SUITE_BOARD_SIZE = 500
+SUITE_BOARD_SNAKE = 100000
+
+
+def measure(fn, repeats=SUITE_REPEATS, round_seconds=SUITE_ROUND_SECONDS):
+    start = time.perf_counter()
+    fn()
+    once = time.perf_counter() - start
+    number = max(1, int(round_seconds / max(once, 1e-7)))
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return {'median_us': round(statistics.median(times) * 1e6, 3),
+            'min_us': round(min(times) * 1e6, 3),
+            'calls': number * repeats}
+
+
+def loop_path(x0, y0, width, height):
+    # Các ô trên chu vi một hình chữ nhật theo chiều kim đồng hồ.
+    path = [(x, y0) for x in range(x0, x0 + width)]
+    path += [(x0 + width - 1, y) for y in range(y0 + 1, y0 + height)]
+    path += [(x, y0 + height - 1) for x in range(x0 + width - 2, x0 - 1, -1)]
+    path += [(x0, y) for y in range(y0 + height - 2, y0, -1)]
+    return path
+
+
+def logic_benchmarks():
+    benches = {}
+    # Rắn chạy vòng quanh chu vi 500x300 (dài hơn thân) nên không bao giờ
+    # chết và không cần dựng lại engine giữa các lần đo.
+    path = loop_path(10, 10, 500, 300)
+    actions = [direction_between(path[i], path[(i + 1) % len(path)]) for i in range(len(path))]
+    for length in (3, 1000):
+        engine = SnakeEngine(1000, 1000, 0, seed=1)
+        engine.place_snake([path[-i] for i in range(length)], direction_between(path[-1], path[0]))
+        engine.food_pos = (700, 700)
+
+        def tick(engine=engine, state=[0]):
+            engine.step(actions[state[0]])
+            state[0] = (state[0] + 1) % len(actions)
+        benches[f'logic.tick.len{length}'] = tick
+    for fill in (0.0, 0.5, 0.99):
+        engine = SnakeEngine(32, 16, 0, seed=1)
+        cells = 32 * 16
+        engine.place_snake(serpentine_body(min(cells - 1, max(3, int(cells * fill))), 32, 16), 'UP')
+        benches[f'logic.spawn_food.fill{int(fill * 100)}'] = engine.spawn_food
+    return benches
+
+
+def render_benchmarks(game, pygame):
+    benches = {}
+    block = game.BLOCK_SIZE
+    top = game.INFO_BAR_GRID_HEIGHT * block
+
+    benches['render.checkerboard'] = game.draw_checkerboard_bg
+
+    for length in SUITE_SNAKE_LENGTHS:
+        body = snake_pixels(game, length + 1)
+        current, prev = body[:-1], body[1:]
+        benches[f'render.snake.len{length}'] = (
+            lambda current=current, prev=prev: game.draw_snake_smooth(current, prev, 0.5, 'UP'))
+
+    food_pos = [block * 5, top + block * 5]
+    benches['render.food.apple'] = lambda: game.draw_food(food_pos, 'apple')
+
+    def golden():
+        game.PULSE_COUNTER += 1
+        game.draw_food(food_pos, 'golden_apple')
+    benches['render.food.golden'] = golden
+
+    font = game.get_font_obj(game.FONT_BUTTON_SIZE)
+    def text_cached():
+        game.draw_text_with_outline(game.game_canvas, "PLAY AGAIN", font, (100, 100),
+                                    game.COLOR_WHITE, game.COLOR_OUTLINE_DARK, 2)
+    def text_uncached():
+        game.TEXT_CACHE.clear()
+        text_cached()
+    benches['render.text.cached'] = text_cached
+    benches['render.text.uncached'] = text_uncached
+
+    def score_changing(state=[0]):
+        state[0] += 10
+        game.display_score(state[0], 1000000)
+    benches['render.display_score.changing'] = score_changing
+    benches['render.display_score.same'] = lambda: game.display_score(120, 1000000)
+
+    for count in SUITE_PARTICLE_COUNTS:
+        def particles(count=count):
+            # Bù hạt mới cho đủ `count` hạt sống rồi update + vẽ như mỗi khung.
+            pool = game.PARTICLES
+            if pool.count < count:
+                pool.burst(game.GAME_WIDTH / 2, game.GAME_HEIGHT / 2, count - pool.count,
+                           game.COLOR_SPARKLE, speed=6.0, life=240, radius=6.0,
+                           spread=game.GAME_WIDTH / 3)
+            game.draw_effects()
+        benches[f'render.particles.{count}'] = particles
+
+    for width, height in SUITE_WINDOW_SIZES:
+        for mode in game.SCALE_MODES:
+            def present(size=(width, height), mode=mode):
+                if game.screen.get_size() != size or game.SCALE_MODE != mode:
+                    game.screen = pygame.display.set_mode(size, pygame.RESIZABLE)
+                    game.SCALE_MODE = mode
+                    game.SCALE_LAYOUT.clear()
+                game.draw_to_screen(game.game_canvas)
+            benches[f'render.present.{width}x{height}.{mode}'] = present
+    return benches
+
+
+def frame_benchmarks(game, pygame):
+    # Khung hình đầy đủ (nền, táo, rắn, hiệu ứng, thanh điểm, đưa lên màn
+    # hình 1280x720) qua game.draw_frame, như trong game_loop.
+    benches = {}
+    block = game.BLOCK_SIZE
+    top = game.INFO_BAR_GRID_HEIGHT * block
+    food_pos = [block * 5, top + block * 5]
+    golden_pos = [block * 9, top + block * 3]
+    for dirty in (False, True):
+        for length in SUITE_SNAKE_LENGTHS:
+            body = snake_pixels(game, length + 1)
+            current, prev = body[:-1], body[1:]
+
+            def frame(current=current, prev=prev, dirty=dirty, state={'t': 0.0}):
+                if game.DIRTY_RECTS_ENABLED != dirty:
+                    game.DIRTY_RECTS_ENABLED = dirty
+                    game.request_full_redraw()
+                state['t'] = (state['t'] + 0.1) % 1.0
+                game.PULSE_COUNTER += 1
+                game.draw_frame(food_pos, golden_pos, current, prev, state['t'],
+                                'UP', 120, 1000000)
+            mode = 'dirty' if dirty else 'full'
+            benches[f'frame.{mode}.len{length}'] = frame
+
+    # Bàn lớn: chỉ phần trong khung nhìn được quét và vẽ, nên chi phí không
+    # phụ thuộc kích thước bàn hay độ dài rắn. 'scroll' dịch camera mỗi khung.
+    engine = SnakeEngine(SUITE_BOARD_SIZE, SUITE_BOARD_SIZE, 0, seed=1)
+    engine.place_snake(serpentine_body(SUITE_BOARD_SNAKE, SUITE_BOARD_SIZE, SUITE_BOARD_SIZE), 'UP')
+    game.setup_view(engine)
+    camera = game.CAMERA
+    game.setup_view(SnakeEngine(seed=1)) # Trở lại bàn cổ điển cho các benchmark khác
+    for scroll in (False, True):
+        def board_frame(scroll=scroll, state={'t': 0.0, 'x': camera.x}):
+            game.CAMERA = camera
+            if scroll:
+                state['x'] = (state['x'] + 7) % (camera.world_width - camera.view_width)
+                camera.x = state['x']
+            game.VIEW_OFFSET = camera.offset
+            state['t'] = (state['t'] + 0.1) % 1.0
+            game.PULSE_COUNTER += 1
+            current, prev = game.view_snake(engine, state['t'], False, False)
+            game.draw_frame(food_pos, golden_pos, current, prev, state['t'], 'UP', 120, 1000000)
+            game.CAMERA = None
+            game.VIEW_OFFSET = (0, 0)
+        mode = 'scroll' if scroll else 'full'
+        benches[f'frame.board{SUITE_BOARD_SIZE}.{mode}.len{SUITE_BOARD_SNAKE}'] = board_frame
+    return benches
+
+
+def reset_game_display(game, pygame):
+    game.screen = pygame.display.set_mode((game.DEFAULT_WINDOW_WIDTH, game.DEFAULT_WINDOW_HEIGHT),
+                                          pygame.RESIZABLE)
+    game.SCALE_MODE = 'stretch'
+    game.SCALE_LAYOUT.clear()
+    game.DIRTY_RECTS_ENABLED = False
+    game.PARTICLES.clear()
+    game.request_full_redraw()
+
+
+def run_suite(name_filter=None):
+    game = load_game()
+    game.load_assets()
+    import pygame
+    groups = (lambda: logic_benchmarks(),
+              lambda: render_benchmarks(game, pygame),
+              lambda: frame_benchmarks(game, pygame))
+    results = {}
+    print(f"{'benchmark':<40} {'median us':>11} {'min us':>11}")
+    for make in groups:
+        for name, fn in make().items():
+            if name_filter and not any(f in name for f in name_filter):
+                continue
+            reset_game_display(game, pygame)
+            results[name] = measure(fn)
+            print(f"{name:<40} {results[name]['median_us']:>11.2f} {results[name]['min_us']:>11.2f}")
+    reset_game_display(game, pygame)
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'sdl': '.'.join(map(str, pygame.get_sdl_version())),
+            'platform': platform.platform(),
+            'video_driver': os.environ.get('SDL_VIDEODRIVER'),
+        },
+        'results': results,
+    }
+
+
+def format_us(entry):
+    return '-' if entry is None else f"{entry['median_us']:.2f}"
+
+
+def compare_results(baseline, current, threshold, min_delta_us):
+    # So trung vị từng benchmark; chậm hơn quá threshold (tỉ lệ) và quá
+    # min_delta_us (tránh nhiễu ở các benchmark dưới 1 us) là hồi quy.
+    regressions = []
+    print(f"{'benchmark':<40} {'baseline us':>12} {'current us':>12} {'change':>8}")
+    for name in sorted(set(baseline['results']) | set(current['results'])):
+        old = baseline['results'].get(name)
+        new = current['results'].get(name)
+        if old is None or new is None:
+            print(f"{name:<40} {format_us(old):>12} {format_us(new):>12} {'n/a':>8}")
+            continue
+        change = new['median_us'] / old['median_us'] - 1 if old['median_us'] else 0.0
+        significant = abs(new['median_us'] - old['median_us']) > min_delta_us
+        flag = ''
+        if change > threshold and significant:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif change < -threshold and significant:
+            flag = '  faster'
+        print(f"{name:<40} {old['median_us']:>12.2f} {new['median_us']:>12.2f} {change:>+8.1%}{flag}")
+    print(f"{len(regressions)} regression(s) over {threshold:.0%}")
+    return regressions
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Snake Game benchmarks')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_step = sub.add_parser('step', help='Engine step cost vs. snake length')
+    p_step.add_argument('--lengths', type=int, nargs='+',
+                        default=[3, 100, 1000, 10000, 100000])
+    p_step.add_argument('--steps', type=int, default=500)
+    p_spawn = sub.add_parser('spawn', help='Food spawn cost vs. board fill')
+    p_spawn.add_argument('--fills', type=float, nargs='+',
+                         default=[0.0, 0.5, 0.9, 0.99, 1.0])
+    p_snake = sub.add_parser('snake', help='Snake rendering: legacy path vs. batched sprites')
+    p_snake.add_argument('--lengths', type=int, nargs='+', default=[3, 100, 500])
+    p_idle = sub.add_parser('idle', help='CPU used by the menu and pause screens while idle')
+    p_idle.add_argument('--seconds', type=float, default=3.0)
+    p_idle.add_argument('--mouse', action='store_true', help='Feed 60 Hz mouse motion while measuring')
+    p_auto = sub.add_parser('autopilot', help='Headless AI soak test: score and decision time')
+    p_auto.add_argument('--games', type=int, default=5)
+    p_auto.add_argument('--wrap', action='store_true')
+    p_auto.add_argument('--max-ticks', type=int, default=200000)
+    p_auto.add_argument('--board', type=lambda text: tuple(map(int, text.split('x'))), metavar='WxH',
+                        help='Board size (default: the game board)')
+    p_auto.add_argument('--max-us', type=float, help='Exit with status 1 if the slowest decision exceeds this')
+    p_arena = sub.add_parser('arena', help='Multi-snake arena tick cost vs. number of snakes')
+    p_arena.add_argument('--snakes', type=int, nargs='+', default=[10, 100, 500])
+    p_arena.add_argument('--lengths', type=int, nargs='+', default=[3, 30])
+    p_arena.add_argument('--ticks', type=int, default=1000)
+    p_net = sub.add_parser('net', help='Localhost multiplayer load test: tick jitter and bandwidth')
+    p_net.add_argument('--clients', type=int, nargs='+', default=[10, 50, 200])
+    p_net.add_argument('--seconds', type=float, default=5.0)
+    p_net.add_argument('--bots', type=int, default=0, help='Server-side AI snakes besides the clients')
+    p_net.add_argument('--rate', type=int, default=10, help='Server ticks per second')
+    p_board = sub.add_parser('leaderboard', help='SQLite leaderboard write and top-N query cost vs. number of games')
+    p_board.add_argument('--sizes', type=int, nargs='+', default=[1000, 100000, 500000])
+    p_tele = sub.add_parser('telemetry', help='Telemetry emit cost and drops under an event flood')
+    p_tele.add_argument('--queues', type=int, nargs='+', default=[256, 4096, 65536])
+    p_tele.add_argument('--events', type=int, default=200000)
+    p_tele.add_argument('--burst', type=int, default=1000, help='Events emitted back to back between pauses')
+    p_suite = sub.add_parser('suite', help='Run all micro and full-frame benchmarks, save JSON')
+    p_suite.add_argument('-o', '--output', default='bench_results.json')
+    p_suite.add_argument('--filter', nargs='+', metavar='NAME',
+                         help='Only run benchmarks whose name contains one of these strings')
+    p_compare = sub.add_parser('compare', help='Compare a results JSON against a baseline')
+    p_compare.add_argument('baseline')
+    p_compare.add_argument('current')
+    p_compare.add_argument('--threshold', type=float, default=0.10,
+                           help='Relative slowdown reported as a regression (default: 0.10)')
+    p_compare.add_argument('--min-delta-us', type=float, default=0.2,
+                           help='Ignore differences smaller than this many microseconds (default: 0.2)')
+    args = parser.parse_args()
+
+    if args.command == 'step':
+        bench_step(args.lengths, steps=args.steps)
+    elif args.command == 'spawn':
+        bench_spawn(args.fills)
+    elif args.command == 'snake':
+        bench_snake(args.lengths)
+    elif args.command == 'idle':
+        bench_idle(args.seconds, args.mouse)
+    elif args.command == 'autopilot':
+        if not bench_autopilot(args.games, args.wrap, args.max_ticks, args.board, args.max_us):
+            sys.exit(1)
+    elif args.command == 'arena':
+        bench_arena(args.snakes, args.lengths, args.ticks)
+    elif args.command == 'net':
+        bench_net(args.clients, args.seconds, args.bots, args.rate)
+    elif args.command == 'leaderboard':
+        bench_leaderboard(args.sizes)
+    elif args.command == 'telemetry':
+        bench_telemetry(args.queues, args.events, args.burst)
+    elif args.command == 'suite':
+        data = run_suite(args.filter)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        print(f"Saved {len(data['results'])} results to {args.output}")
+    elif args.command == 'compare':
+        regressions = compare_results(load_results(args.baseline), load_results(args.current),
+                                      args.threshold, args.min_delta_us)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+import math
+
+# Camera cho bàn lớn hơn màn hình (không phụ thuộc pygame, đơn vị pixel).
+# - (x, y) là góc trên trái của khung nhìn trong toạ độ thế giới; toạ độ
+#   trên canvas = toạ độ thế giới - offset.
+# - Camera chỉ trượt khi điểm theo dõi (đầu rắn) ra khỏi vùng chết giữa
+#   khung nhìn (cách mép DEAD_ZONE_MARGIN), nên phần lớn thời gian khung
+#   nhìn đứng yên và dirty-rect vẫn dùng được.
+# - Luôn bị kẹp trong biên thế giới: khung nhìn không bao giờ lộ ra ngoài bàn.
+
+DEAD_ZONE_MARGIN = 0.3 # Tỉ lệ chiều rộng/cao khung nhìn
+
+
+class Camera:
+    def __init__(self, world_width, world_height, view_width, view_height,
+                 view_top=0, margin=DEAD_ZONE_MARGIN):
+        self.world_width = world_width
+        self.world_height = world_height
+        self.view_width = view_width
+        self.view_height = view_height
+        self.view_top = view_top
+        self.margin_x = view_width * margin
+        self.margin_y = view_height * margin
+        self.x = 0
+        self.y = 0
+
+    @property
+    def offset(self):
+        # Khung nhìn bắt đầu ở view_top trên canvas (dưới thanh thông tin).
+        return (self.x, self.y - self.view_top)
+
+    def clamp(self):
+        self.x = max(0, min(self.x, self.world_width - self.view_width))
+        self.y = max(0, min(self.y, self.world_height - self.view_height))
+
+    def center_on(self, x, y):
+        self.x = int(x - self.view_width / 2)
+        self.y = int(y - self.view_height / 2)
+        self.clamp()
+
+    def follow(self, x, y):
+        # Trả về True nếu camera đã dịch chuyển.
+        old = (self.x, self.y)
+        if x < self.x + self.margin_x:
+            self.x = int(x - self.margin_x)
+        elif x > self.x + self.view_width - self.margin_x:
+            self.x = int(x - self.view_width + self.margin_x)
+        if y < self.y + self.margin_y:
+            self.y = int(y - self.margin_y)
+        elif y > self.y + self.view_height - self.margin_y:
+            self.y = int(y - self.view_height + self.margin_y)
+        self.clamp()
+        return (self.x, self.y) != old
+
+    def visible_cells(self, block_size, pad=1):
+        # Dải ô (x0, y0, x1, y1) phủ khung nhìn, nới thêm `pad` ô mỗi phía
+        # cho các đốt đang trượt vào và phần tràn của sprite.
+        x0 = max(0, self.x // block_size - pad)
+        y0 = max(0, self.y // block_size - pad)
+        x1 = min(self.world_width // block_size,
+                 math.ceil((self.x + self.view_width) / block_size) + pad)
+        y1 = min(self.world_height // block_size,
+                 math.ceil((self.y + self.view_height) / block_size) + pad)
+        return x0, y0, x1, y1
@@ -0,0 +1,287 @@
+import random
+from array import array
+from collections import deque
+
+# Lõi mô phỏng không phụ thuộc pygame: chỉ làm việc với ô lưới (x, y).
+# game.py đổi sang pixel bằng cách nhân với BLOCK_SIZE khi vẽ.
+
+DIRECTIONS = {
+    'UP': (0, -1),
+    'DOWN': (0, 1),
+    'LEFT': (-1, 0),
+    'RIGHT': (1, 0),
+}
+OPPOSITE = {'UP': 'DOWN', 'DOWN': 'UP', 'LEFT': 'RIGHT', 'RIGHT': 'LEFT'}
+# Mã hướng 1 byte cho các mảng liên kết giữa các đốt (0 = không có).
+LINK_CODES = {'UP': 1, 'DOWN': 2, 'LEFT': 3, 'RIGHT': 4}
+LINK_VECTORS = ((0, 0), (0, -1), (0, 1), (-1, 0), (1, 0))
+OPPOSITE_LINK = (0, 2, 1, 4, 3)
+
+FOOD_SCORE = 10
+GOLDEN_APPLE_SCORE = 50
+GOLDEN_APPLE_LIFESPAN = 150
+GOLDEN_APPLE_CHANCE = 400
+SPEED_UP_EVERY = 50
+INPUT_QUEUE_SIZE = 3
+
+
+def direction_between(a, b):
+    for direction, (dx, dy) in DIRECTIONS.items():
+        if (a[0] + dx, a[1] + dy) == b:
+            return direction
+    raise ValueError(f"Cells {a} and {b} are not adjacent")
+
+
+class StepResult:
+    __slots__ = ('ate_food', 'ate_golden', 'eat_pos', 'golden_spawned',
+                 'golden_expired', 'speed_up', 'reversed', 'death', 'won', 'turn_time')
+
+    def __init__(self):
+        self.ate_food = False
+        self.ate_golden = False
+        self.eat_pos = None
+        self.golden_spawned = False
+        self.golden_expired = False
+        self.speed_up = False
+        self.reversed = False
+        self.death = None  # None, 'wall' hoặc 'self'
+        self.won = False
+        self.turn_time = None # timestamp của lệnh rẽ trong hàng đợi được áp dụng ở bước này
+
+
+class SnakeEngine:
+    def __init__(self, grid_width=32, grid_height=18, top_row=2,
+                 wrap_mode=False, seed=None, base_speed=10, record_inputs=False):
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.top_row = top_row
+        self.wrap_mode = wrap_mode
+        self.base_speed = base_speed
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.record_inputs = record_inputs
+        self.reset()
+
+    def reset(self):
+        row = self.top_row
+        self.place_snake([(3, row), (2, row), (1, row)], 'RIGHT')
+        self.golden_apple_pos = None
+        self.golden_apple_timer = 0
+        self.score = 0
+        self.speed = self.base_speed
+        self.ticks = 0
+        self.alive = True
+        self.won = False
+        self.death_cause = None
+        # (tick, hướng) của mỗi lần đổi hướng được chấp nhận; tick là số
+        # bước đã chạy, tức lệnh được áp dụng ngay trước bước tick + 1.
+        self.input_log = [] if self.record_inputs else None
+        self.food_pos = self.spawn_food()
+
+    def place_snake(self, cells, direction):
+        # Thân rắn là deque + lưới đếm số đốt trên mỗi ô (occupancy),
+        # nên di chuyển đầu, bỏ đuôi và kiểm tra va chạm đều là O(1).
+        # Khi đảo chiều (wrap mode) chỉ lật cờ _head_left thay vì reverse.
+        # Các ô trống được giữ trong _free_cells (xoá bằng cách hoán đổi với
+        # phần tử cuối) để chọn chỗ đặt táo ngẫu nhiên trong O(1). Dùng
+        # array('i') thay list để bàn lớn (500x500 trở lên) chỉ tốn 4 byte/ô.
+        # _left_links/_right_links: với mỗi ô của thân, hướng tới đốt kề về
+        # phía đầu trái/phải của deque. Thứ tự trong deque không đổi khi đảo
+        # chiều nên hai mảng này cũng không phải cập nhật; renderer dùng
+        # chúng để biết mỗi đốt đi tới từ ô nào mà không phải duyệt cả thân.
+        width = self.grid_width
+        size = width * self.grid_height
+        top = self.top_row * width
+        self._body = deque(cells)
+        self._head_left = True
+        self.occupancy = bytearray(size)
+        self._free_cells = array('i', range(top, size))
+        self._free_index = array('i', [-1]) * top + array('i', range(size - top))
+        self._left_links = bytearray(size)
+        self._right_links = bytearray(size)
+        for x, y in cells:
+            self._occupy(y * width + x)
+        for (ax, ay), (bx, by) in zip(cells, cells[1:]):
+            code = LINK_CODES[direction_between((bx, by), (ax, ay))]
+            self._left_links[by * width + bx] = code
+            self._right_links[ay * width + ax] = OPPOSITE_LINK[code]
+        self.direction = direction
+        self.change_to = direction
+        self.turn_queue = deque()
+
+    def _occupy(self, index):
+        self.occupancy[index] += 1
+        if self.occupancy[index] == 1:
+            free_cells = self._free_cells
+            free_index = self._free_index
+            pos = free_index[index]
+            last = free_cells.pop()
+            if last != index:
+                free_cells[pos] = last
+                free_index[last] = pos
+            free_index[index] = -1
+
+    def _vacate(self, index):
+        self.occupancy[index] -= 1
+        if self.occupancy[index] == 0:
+            self._free_index[index] = len(self._free_cells)
+            self._free_cells.append(index)
+
+    @property
+    def snake_body(self):
+        if self._head_left:
+            return list(self._body)
+        return list(reversed(self._body))
+
+    @property
+    def head(self):
+        return self._body[0] if self._head_left else self._body[-1]
+
+    @property
+    def tail(self):
+        return self._body[-1] if self._head_left else self._body[0]
+
+    @property
+    def tail_links(self):
+        # Mảng hướng từ mỗi ô của thân tới đốt kề phía đuôi.
+        return self._right_links if self._head_left else self._left_links
+
+    @property
+    def head_links(self):
+        # Mảng hướng từ mỗi ô của thân tới đốt kề phía đầu.
+        return self._left_links if self._head_left else self._right_links
+
+    @property
+    def length(self):
+        return len(self._body)
+
+    def is_occupied(self, cell):
+        return self.occupancy[cell[1] * self.grid_width + cell[0]] != 0
+
+    @property
+    def free_cell_count(self):
+        return len(self._free_cells)
+
+    def spawn_food(self):
+        free_cells = self._free_cells
+        if not free_cells:
+            return None
+        index = free_cells[self.rng.randrange(len(free_cells))]
+        return (index % self.grid_width, index // self.grid_width)
+
+    def turn(self, direction):
+        if direction in DIRECTIONS and direction != OPPOSITE[self.direction]:
+            if self.input_log is not None and direction != self.change_to:
+                self.input_log.append((self.ticks, direction))
+            self.change_to = direction
+
+    def queue_turn(self, direction, timestamp=None):
+        # Hàng đợi lệnh rẽ có giới hạn: mỗi bước chỉ lấy một lệnh, nên hai
+        # phím bấm nhanh trong cùng một tick (vd. UP rồi LEFT để quay đầu)
+        # không bị mất. Lệnh được kiểm tra với hướng cuối cùng trong hàng
+        # đợi chứ không phải hướng đang đi. Trả về False nếu bị bỏ qua.
+        queue = self.turn_queue
+        last = queue[-1][0] if queue else self.change_to
+        if (direction not in DIRECTIONS or direction == last or
+                direction == OPPOSITE[last] or len(queue) >= INPUT_QUEUE_SIZE):
+            return False
+        queue.append((direction, timestamp))
+        return True
+
+    def _apply_queued_turn(self, result):
+        queue = self.turn_queue
+        while queue:
+            direction, timestamp = queue.popleft()
+            # Sau khi đảo chiều (wrap mode) lệnh cũ có thể đã thành ngược hướng.
+            if direction != self.change_to and direction != OPPOSITE[self.direction]:
+                self.turn(direction)
+                result.turn_time = timestamp
+                return
+
+    def step(self, action=None):
+        result = StepResult()
+        if not self.alive:
+            result.death = self.death_cause
+            result.won = self.won
+            return result
+        if action is not None:
+            self.turn(action)
+        elif self.turn_queue:
+            self._apply_queued_turn(result)
+
+        self.ticks += 1
+        self.direction = self.change_to
+        dx, dy = DIRECTIONS[self.direction]
+        body = self._body
+        head_left = self._head_left
+        head_x, head_y = body[0] if head_left else body[-1]
+        head = (head_x + dx, head_y + dy)
+
+        if not (0 <= head[0] < self.grid_width and
+                self.top_row <= head[1] < self.grid_height):
+            return self._die(result, 'wall')
+
+        width = self.grid_width
+        code = LINK_CODES[self.direction]
+        if head_left:
+            body.appendleft(head)
+            self._left_links[head_y * width + head_x] = code
+            self._right_links[head[1] * width + head[0]] = OPPOSITE_LINK[code]
+        else:
+            body.append(head)
+            self._right_links[head_y * width + head_x] = code
+            self._left_links[head[1] * width + head[0]] = OPPOSITE_LINK[code]
+        self._occupy(head[1] * width + head[0])
+
+        if head == self.food_pos:
+            result.ate_food = True
+            result.eat_pos = self.food_pos
+            self.score += FOOD_SCORE
+            if self.score % SPEED_UP_EVERY == 0:
+                self.speed += 1
+                result.speed_up = True
+            self.food_pos = self.spawn_food()
+
+        if self.golden_apple_pos and head == self.golden_apple_pos:
+            result.ate_golden = True
+            result.eat_pos = self.golden_apple_pos
+            self.score += GOLDEN_APPLE_SCORE
+            self.golden_apple_pos = None
+            self.golden_apple_timer = 0
+
+        if not (result.ate_food or result.ate_golden):
+            tail = body.pop() if head_left else body.popleft()
+            self._vacate(tail[1] * width + tail[0])
+        elif self.wrap_mode:
+            self._head_left = head_left = not head_left
+            head = body[0] if head_left else body[-1]
+            self.direction = OPPOSITE[self.direction]
+            self.change_to = self.direction
+            result.reversed = True
+
+        if self.golden_apple_pos:
+            self.golden_apple_timer -= 1
+            if self.golden_apple_timer <= 0:
+                self.golden_apple_pos = None
+                result.golden_expired = True
+        elif self.rng.randrange(0, GOLDEN_APPLE_CHANCE) == 1:
+            self.golden_apple_pos = self.spawn_food()
+            if self.golden_apple_pos:
+                self.golden_apple_timer = GOLDEN_APPLE_LIFESPAN
+                result.golden_spawned = True
+
+        if self.occupancy[head[1] * width + head[0]] > 1:
+            return self._die(result, 'self')
+
+        # Rắn đã lấp kín bàn: không còn chỗ đặt táo -> thắng.
+        if self.food_pos is None and not self._free_cells:
+            self.alive = False
+            self.won = True
+            result.won = True
+        return result
+
+    def _die(self, result, cause):
+        self.alive = False
+        self.death_cause = cause
+        result.death = cause
+        return result
@@ -1,9 +1,31 @@
+import time
+STARTUP_MARKS = [('start', time.perf_counter())]
+
 import pygame
 import random
 import sys
 import os
 import math
 import argparse
+import json
+import atexit
+import socket
+import sqlite3
+from collections import OrderedDict
+
+from engine import SnakeEngine, LINK_VECTORS
+import replay as replay_io
+from profiler import FrameProfiler, TimingHistogram
+from particles import ParticlePool
+from scheduler import FixedStepScheduler
+from autopilot import Autopilot
+from camera import Camera
+from arena import ArenaEngine, ArenaBot, arena_size, arena_food_count
+from net import ClientWorld, encode, start_server_thread, NET_HOST, NET_PORT
+from leaderboard import open_leaderboard, game_mode
+from telemetry import TelemetryBus, session_path, DROP_POLICIES, QUEUE_SIZE
+
+STARTUP_MARKS.append(('import pygame + modules', time.perf_counter()))
 
 try:
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
@@ -22,14 +44,6 @@ if sys.platform == "win32":
             pass
 
 
-
-pygame.init()
-try:
-    pygame.mixer.init()
-except Exception as e:
-    print("Warning: Could not initialize mixer:", e)
-
-
 COLOR_BLACK = (0, 0, 0)
 COLOR_WHITE = (255, 255, 255)
 COLOR_TONGUE = (255, 0, 0)
@@ -43,6 +57,7 @@ COLOR_SNAKE_EYE = (255, 255, 255)
 COLOR_FOOD_APPLE = (223, 75, 61)
 COLOR_FOOD_GOLDEN = (239, 187, 83)
 COLOR_GAME_OVER = (200, 0, 0)
+COLOR_WIN = (239, 187, 83)
 COLOR_BUTTON_PLAY = (76, 119, 219)
 COLOR_BUTTON_OTHER = (130, 130, 130)
 COLOR_GLASS_BG = (255, 255, 255, 40)
@@ -69,23 +84,34 @@ TARGET_FPS = 120
 BASE_SPEED = 10
 
 # --- Canvas and Screen ---
-game_canvas = pygame.Surface((GAME_WIDTH, GAME_HEIGHT))
-shadow_canvas = pygame.Surface((GAME_WIDTH, GAME_HEIGHT), pygame.SRCALPHA)
-screen = pygame.display.set_mode((DEFAULT_WINDOW_WIDTH, DEFAULT_WINDOW_HEIGHT), pygame.RESIZABLE)
-pygame.display.set_caption('Snake Game (720p Sharp)')
+# Được tạo trong init_display() (gọi từ main), để import game.py không mở
+# cửa sổ hay khởi tạo mixer.
+game_canvas = None
+screen = None
 clock = pygame.time.Clock()
-HIGHSCORE_FILE = "highscore.txt"
 
 # Global variables
 ASSETS = {}
 PULSE_COUNTER = 0
 fullscreen = False
-EFFECT_LIST = []
+PARTICLES = ParticlePool(capacity=4096)
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # --- FONTS ---
 PREFERRED_SYSFONTS = ["dejavusans", "noto sans", "segoeui", "tahoma", "arial"]
 CUSTOM_FONT_FILENAME = "font.ttf"
+FONT_TITLE_SIZE = 120
+FONT_BUTTON_SIZE = 45
+FONT_INFO_SIZE = 35
+FONT_SCORE_SIZE = 32
+FONT_GAME_OVER_SIZE = 150
+FONT_PAUSE_SIZE = 100
+
+# Đường dẫn font chỉ được dò một lần (match_font rất chậm), còn từng cỡ
+# chữ được tạo khi dùng lần đầu rồi giữ trong FONT_CACHE.
+FONT_PATH_UNRESOLVED = object()
+FONT_PATH = FONT_PATH_UNRESOLVED
+FONT_CACHE = {}
 
 def find_system_font():
     for name in PREFERRED_SYSFONTS:
@@ -94,29 +120,281 @@ def find_system_font():
             return path
     return None
 
+def resolve_font_path():
+    global FONT_PATH
+    if FONT_PATH is FONT_PATH_UNRESOLVED:
+        custom_font_path = os.path.join(SCRIPT_DIR, CUSTOM_FONT_FILENAME)
+        if os.path.exists(custom_font_path):
+            FONT_PATH = custom_font_path
+        else:
+            FONT_PATH = find_system_font()
+    return FONT_PATH
+
 def get_font_obj(size):
+    global FONT_PATH
+    font = FONT_CACHE.get(size)
+    if font is not None:
+        return font
+
     custom_font_path = os.path.join(SCRIPT_DIR, CUSTOM_FONT_FILENAME)
-    if os.path.exists(custom_font_path):
+    while font is None:
+        path = resolve_font_path()
+        if path is None:
+            font = pygame.font.Font(None, size)
+            break
         try:
-            return pygame.font.Font(custom_font_path, size)
+            font = pygame.font.Font(path, size)
         except Exception as e:
-            print(f"Lỗi tải font tùy chỉnh '{CUSTOM_FONT_FILENAME}': {e}")
-
-    sys_font_path = find_system_font()
-    if sys_font_path:
-        try:
-            return pygame.font.Font(sys_font_path, size)
-        except Exception:
-            pass
-
-    return pygame.font.Font(None, size)
-
-font_title = get_font_obj(120)
-font_button = get_font_obj(45)
-font_info = get_font_obj(35)
-font_score = get_font_obj(32)
-font_game_over = get_font_obj(150)
-font_pause = get_font_obj(100)
+            if path == custom_font_path:
+                print(f"Lỗi tải font tùy chỉnh '{CUSTOM_FONT_FILENAME}': {e}")
+                FONT_PATH = find_system_font()
+            else:
+                FONT_PATH = None
+    FONT_CACHE[size] = font
+    return font
+
+# --- SESSION STATS ---
+# Thống kê của một phiên (từ lúc bấm START tới khi về launcher), gửi về
+# launcher trong tin nhắn session_end. Thời gian khung hình và độ trễ phím
+# giữ trong TimingHistogram nên phiên chạy lâu không tốn thêm bộ nhớ.
+def new_session_stats(high_score=0):
+    return {'start': time.perf_counter(), 'rounds': 0, 'final_score': 0,
+            'best_score': 0, 'high_score': high_score, 'ticks': 0, 'frame_times': TimingHistogram(),
+            'input_latency': TimingHistogram(), 'dropped_ticks': 0, 'late_ticks': 0,
+            'autopilot_decisions': 0, 'autopilot_seconds': 0.0}
+
+SESSION_STATS = new_session_stats()
+
+def summarize_frame_times(frame_times):
+    if not frame_times:
+        return {'frames': 0, 'fps': 0.0, 'mean_ms': 0.0, 'p50_ms': 0.0,
+                'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    mean = frame_times.mean
+    return {
+        'frames': frame_times.count,
+        'fps': round(1.0 / mean, 1) if mean > 0 else 0.0,
+        'mean_ms': round(mean * 1000, 2),
+        'p50_ms': round(frame_times.percentile(0.50) * 1000, 2),
+        'p95_ms': round(frame_times.percentile(0.95) * 1000, 2),
+        'p99_ms': round(frame_times.percentile(0.99) * 1000, 2),
+        'max_ms': round(frame_times.max * 1000, 2),
+    }
+
+# pygame 2 không cho biết thời điểm SDL nhận phím, nên độ trễ tính từ lúc
+# lấy sự kiện ra khỏi hàng đợi (đầu vòng event của khung hình). Phím đã
+# chờ trong hàng đợi tối đa một khung trước đó, không được tính vào đây.
+def summarize_input_latency(latencies):
+    return {
+        'turns': latencies.count,
+        'measured_from': 'poll',
+        'p50_ms': round(latencies.percentile(0.50) * 1000, 1),
+        'p95_ms': round(latencies.percentile(0.95) * 1000, 1),
+        'max_ms': round(latencies.max * 1000, 1),
+    }
+
+def summarize_autopilot(decisions, seconds):
+    return {
+        'decisions': decisions,
+        'decisions_per_second': round(decisions / seconds) if seconds else 0,
+        'mean_us': round(seconds / decisions * 1e6, 1) if decisions else 0.0,
+    }
+
+def session_summary():
+    stats = SESSION_STATS
+    return {
+        'final_score': stats['final_score'],
+        'best_score': stats['best_score'],
+        'high_score': stats['high_score'],
+        'rounds': stats['rounds'],
+        'duration': round(time.perf_counter() - stats['start'], 2),
+        'ticks': stats['ticks'],
+        'dropped_ticks': stats['dropped_ticks'],
+        'late_ticks': stats['late_ticks'],
+        'frame_time': summarize_frame_times(stats['frame_times']),
+        'input_latency': summarize_input_latency(stats['input_latency']),
+        'autopilot': summarize_autopilot(stats['autopilot_decisions'], stats['autopilot_seconds']),
+        'telemetry': TELEMETRY.metrics() if TELEMETRY else None,
+    }
+
+def record_round(score):
+    SESSION_STATS['rounds'] += 1
+    SESSION_STATS['final_score'] = score
+    SESSION_STATS['best_score'] = max(SESSION_STATS['best_score'], score)
+
+# --- STARTUP ---
+STARTUP_TRACE_ENABLED = False
+startup_reported = False
+
+def startup_mark(phase):
+    STARTUP_MARKS.append((phase, time.perf_counter()))
+
+def report_startup_trace():
+    global startup_reported
+    if not STARTUP_TRACE_ENABLED or startup_reported:
+        return
+    startup_reported = True
+    startup_mark('first frame')
+    print("Startup trace:")
+    for (_, prev_t), (phase, t) in zip(STARTUP_MARKS, STARTUP_MARKS[1:]):
+        print(f"  {phase:<36} {(t - prev_t) * 1000:8.1f} ms")
+    total = STARTUP_MARKS[-1][1] - STARTUP_MARKS[0][1]
+    print(f"  {'total (module start -> first frame)':<36} {total * 1000:8.1f} ms")
+
+def init_display(hidden=False):
+    global screen, game_canvas
+    pygame.init()
+    startup_mark('pygame.init')
+    try:
+        pygame.mixer.init()
+    except Exception as e:
+        print("Warning: Could not initialize mixer:", e)
+    startup_mark('mixer.init')
+    flags = pygame.RESIZABLE | (pygame.HIDDEN if hidden else 0)
+    screen = pygame.display.set_mode((DEFAULT_WINDOW_WIDTH, DEFAULT_WINDOW_HEIGHT), flags)
+    pygame.display.set_caption('Snake Game (720p Sharp)')
+    game_canvas = pygame.Surface((GAME_WIDTH, GAME_HEIGHT))
+    startup_mark('display.set_mode')
+
+# --- FRAME PROFILER ---
+# Với --profile, mỗi khung hình của game_loop được đo theo từng công đoạn
+# (xem profiler.PROFILE_STAGES). F2 bật/tắt overlay phân vị p50/p95/p99 và
+# biểu đồ thời gian khung gần nhất; khi thoát, toàn bộ số liệu được ghi ra
+# CSV. Khi không bật, vòng lặp chỉ tốn một phép kiểm tra None mỗi công đoạn.
+PROFILER = None
+PROFILE_CSV = None
+PROFILE_OVERLAY_VISIBLE = False
+PROFILE_OVERLAY_RECT = pygame.Rect(10, INFO_BAR_HEIGHT + 10, 440, 300)
+PROFILE_FONT_SIZE = 18
+PROFILE_GRAPH_HEIGHT = 60
+PROFILE_REFRESH_FRAMES = 15 # Tính lại phân vị sau mỗi chừng này khung
+profile_overlay_cache = {'frame': None, 'table': None, 'graph': None, 'graph_frame': 0}
+
+def enable_profiler(csv_path):
+    global PROFILER, PROFILE_CSV
+    PROFILER = FrameProfiler()
+    PROFILE_CSV = csv_path
+    atexit.register(write_profile_csv)
+
+def write_profile_csv():
+    if PROFILER is None or not PROFILER.frames:
+        return
+    try:
+        PROFILER.write_csv(PROFILE_CSV)
+        print(f"Frame profile: {PROFILER.frames} frames -> {PROFILE_CSV}")
+    except OSError as e:
+        print("Warning: Could not write frame profile:", e)
+
+def toggle_profile_overlay():
+    global PROFILE_OVERLAY_VISIBLE
+    PROFILE_OVERLAY_VISIBLE = not PROFILE_OVERLAY_VISIBLE
+    request_full_redraw()
+
+def render_profile_table(size):
+    # Nền mờ + bảng phân vị gộp vào một surface, chỉ làm mới sau
+    # PROFILE_REFRESH_FRAMES khung để overlay không tự làm chậm khung.
+    table = pygame.Surface(size, pygame.SRCALPHA)
+    table.fill((0, 0, 0, 170))
+    font = get_font_obj(PROFILE_FONT_SIZE)
+    stats = PROFILER.percentiles()
+    rows = [('ms', 'p50', 'p95', 'p99')]
+    for name in PROFILER.stages + ('frame',):
+        rows.append((name,) + tuple(f"{value:.2f}" for value in stats[name]))
+    y = 6
+    for row in rows:
+        table.blit(font.render(row[0], True, COLOR_WHITE), (10, y))
+        for cell, right in zip(row[1:], (270, 350, 430)):
+            text = font.render(cell, True, COLOR_WHITE)
+            table.blit(text, text.get_rect(topright=(right, y)))
+        y += PROFILE_FONT_SIZE + 2
+    return table
+
+def update_profile_graph(graph):
+    # Biểu đồ cuộn: mỗi khung mới dịch sang trái 2px và vẽ thêm một cột.
+    # Vạch vàng là ngân sách 1/TARGET_FPS, cột đỏ là khung vượt ngân sách.
+    cache = profile_overlay_cache
+    new_frames = min(PROFILER.frames - cache['graph_frame'], graph.get_width() // 2)
+    cache['graph_frame'] = PROFILER.frames
+    if new_frames <= 0:
+        return
+    width, height = graph.get_size()
+    budget_ms = 1000.0 / TARGET_FPS
+    scale = height / (budget_ms * 2)
+    graph.scroll(-2 * new_frames, 0)
+    graph.fill((0, 0, 0, 0), (width - 2 * new_frames, 0, 2 * new_frames, height))
+    totals = PROFILER.totals
+    for i in range(new_frames):
+        total = totals[len(totals) - new_frames + i]
+        x = width - 2 * (new_frames - i)
+        bar = min(height, max(1, int(total * scale)))
+        color = COLOR_SNAKE if total <= budget_ms else COLOR_FOOD_APPLE
+        graph.fill(color, (x, height - bar, 1, bar))
+    budget_y = height - int(budget_ms * scale)
+    graph.fill(COLOR_FOOD_GOLDEN, (width - 2 * new_frames, budget_y, 2 * new_frames, 1))
+
+def draw_profile_overlay():
+    cache = profile_overlay_cache
+    rect = PROFILE_OVERLAY_RECT
+    if cache['frame'] is None or PROFILER.frames - cache['frame'] >= PROFILE_REFRESH_FRAMES:
+        cache['frame'] = PROFILER.frames
+        cache['table'] = render_profile_table(rect.size)
+    if cache['graph'] is None:
+        cache['graph'] = pygame.Surface((rect.width - 20, PROFILE_GRAPH_HEIGHT), pygame.SRCALPHA)
+        cache['graph_frame'] = max(0, PROFILER.frames - cache['graph'].get_width() // 2)
+    update_profile_graph(cache['graph'])
+    game_canvas.blit(cache['table'], rect.topleft)
+    game_canvas.blit(cache['graph'], (rect.x + 10, rect.bottom - 8 - PROFILE_GRAPH_HEIGHT))
+    mark_dirty(rect)
+
+# --- TELEMETRY ---
+# --telemetry [DIR]: ghi các sự kiện của ván (ăn táo, táo vàng xuất hiện /
+# hết hạn, tăng tốc, chết) và tổng kết mỗi ván / phiên vào
+# DIR/session-*.jsonl.gz. Vòng lặp game chỉ đẩy sự kiện vào hàng đợi của
+# telemetry.TelemetryBus, luồng nền lo mã hoá, nén và ghi đĩa; hàng đợi đầy
+# thì bỏ sự kiện theo --telemetry-policy. Khi tắt, mỗi chỗ phát sự kiện chỉ
+# tốn một phép kiểm tra None.
+TELEMETRY = None
+
+def enable_telemetry(directory, queue_size, policy):
+    global TELEMETRY
+    try:
+        path = session_path(directory)
+    except OSError as e:
+        print("Warning: Could not enable telemetry. Error:", e)
+        return
+    TELEMETRY = TelemetryBus(path, queue_size, policy)
+    atexit.register(TELEMETRY.close)
+
+def emit_round_end(engine, cause, counters, round_frames):
+    TELEMETRY.emit('round_end', score=engine.score, ticks=engine.ticks, length=engine.length,
+                   speed=engine.speed, cause=cause, apples=counters['apples'], golden=counters['golden'],
+                   keys=counters['keys'], turns=counters['turns'],
+                   frame_time=summarize_frame_times(round_frames))
+
+def emit_tick_events(bus, engine, result, counters):
+    ticks = engine.ticks
+    if result.turn_time is not None:
+        counters['turns'] += 1
+    if result.ate_food:
+        counters['apples'] += 1
+        bus.emit('eat', tick=ticks, golden=False, pos=result.eat_pos, score=engine.score,
+                 length=engine.length)
+    if result.ate_golden:
+        counters['golden'] += 1
+        bus.emit('eat', tick=ticks, golden=True, pos=result.eat_pos, score=engine.score,
+                 length=engine.length)
+    if result.golden_spawned:
+        bus.emit('golden_spawn', tick=ticks, pos=engine.golden_apple_pos)
+    if result.golden_expired:
+        bus.emit('golden_expire', tick=ticks)
+    if result.speed_up:
+        bus.emit('speed_up', tick=ticks, speed=engine.speed, score=engine.score)
+    if result.death:
+        bus.emit('death', tick=ticks, cause=result.death, score=engine.score,
+                 length=engine.length, speed=engine.speed)
+
+def emit_session_end(summary):
+    if TELEMETRY:
+        TELEMETRY.emit('session_end', **{key: value for key, value in summary.items() if key != 'telemetry'})
 
 # --- ASSET LOADING ---
 def load_assets():
@@ -180,33 +458,308 @@ def load_assets():
 def lerp(a, b, t):
     return a + (b - a) * t
 
+# --- STATIC LAYER CACHE ---
+# Các lớp tĩnh (nền caro, thanh thông tin, kính của thanh điểm) được vẽ
+# một lần rồi chỉ blit lại. Khoá gồm kích thước và màu sắc hiện tại nên
+# khi BLOCK_SIZE, kích thước lưới hay màu thay đổi thì lớp tự vẽ lại.
+LAYER_CACHE = {}
+
+def get_cached_layer(name, key, render):
+    entry = LAYER_CACHE.get(name)
+    if entry is None or entry[0] != key:
+        entry = (key, render())
+        LAYER_CACHE[name] = entry
+    return entry[1]
+
 # --- DRAWING FUNCTIONS ---
-def draw_checkerboard_bg():
-    game_canvas.fill(COLOR_BG_LIGHT)
+def render_checkerboard_layer():
+    layer = pygame.Surface(game_canvas.get_size())
+    layer.fill(COLOR_BG_LIGHT)
     for y in range(INFO_BAR_GRID_HEIGHT, GRID_HEIGHT):
         for x in range(0, GRID_WIDTH):
             if (x + y) % 2 == 0:
-                pygame.draw.rect(game_canvas, COLOR_BG_DARK,
+                pygame.draw.rect(layer, COLOR_BG_DARK,
                                  (x * BLOCK_SIZE, y * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE))
     info_bar_rect = pygame.Rect(0, 0, GAME_WIDTH, INFO_BAR_HEIGHT)
-    pygame.draw.rect(game_canvas, COLOR_BG_LIGHT, info_bar_rect,
+    pygame.draw.rect(layer, COLOR_BG_LIGHT, info_bar_rect,
                      border_bottom_left_radius=20, border_bottom_right_radius=20)
+    return layer
+
+def get_checkerboard_layer():
+    key = (game_canvas.get_size(), BLOCK_SIZE, GRID_WIDTH, GRID_HEIGHT, INFO_BAR_HEIGHT,
+           COLOR_BG_LIGHT, COLOR_BG_DARK)
+    return get_cached_layer('checkerboard', key, render_checkerboard_layer)
 
-def draw_to_screen(canvas_to_draw):
+def draw_checkerboard_bg():
+    if CAMERA is None:
+        game_canvas.blit(get_checkerboard_layer(), (0, 0))
+    else:
+        draw_board_view_bg(game_canvas)
+
+# --- LARGE BOARD ---
+# --board WxH: bàn lớn hơn khung nhìn (vd. 500x500). Toạ độ pixel của ô là
+# toạ độ thế giới (ô * BLOCK_SIZE); khi vẽ trừ đi VIEW_OFFSET của camera
+# (bàn cổ điển: camera None, offset (0, 0), không đổi gì). Chỉ các ô, đốt,
+# táo và hạt trong khung nhìn được vẽ: thân rắn lấy bằng cách quét lưới
+# occupancy trong khung nhìn (không dựng list cả thân mỗi tick), nền caro
+# là một mẫu cỡ khung nhìn + 2 ô được blit lệch theo camera. Không có
+# surface nào cỡ cả bàn.
+BOARD_SIZE = None # (rộng, cao) theo ô, None = bàn cổ điển
+CAMERA = None
+VIEW_OFFSET = (0, 0)
+VIEW_RECT = pygame.Rect(0, INFO_BAR_HEIGHT, GAME_WIDTH, GAME_HEIGHT - INFO_BAR_HEIGHT)
+VIEW_GRID_SIZE = (GRID_WIDTH, GRID_HEIGHT - INFO_BAR_GRID_HEIGHT)
+
+def parse_board_size(text):
+    try:
+        width, height = (int(part) for part in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected WIDTHxHEIGHT, got '{text}'")
+    if width < VIEW_GRID_SIZE[0] or height < VIEW_GRID_SIZE[1]:
+        raise argparse.ArgumentTypeError(
+            f"board must be at least {VIEW_GRID_SIZE[0]}x{VIEW_GRID_SIZE[1]} cells")
+    return width, height
+
+def new_engine(wrap_mode, record_inputs=False):
+    if BOARD_SIZE is None:
+        grid = (GRID_WIDTH, GRID_HEIGHT, INFO_BAR_GRID_HEIGHT)
+    else:
+        grid = (BOARD_SIZE[0], BOARD_SIZE[1], 0)
+    return SnakeEngine(*grid, wrap_mode=wrap_mode, seed=random.randrange(2 ** 32),
+                       base_speed=BASE_SPEED, record_inputs=record_inputs)
+
+def setup_view(engine):
+    # Camera chỉ dùng khi bàn khác bàn cổ điển (kể cả khi chiếu lại replay).
+    global CAMERA, VIEW_OFFSET
+    if (engine.grid_width, engine.grid_height, engine.top_row) == (GRID_WIDTH, GRID_HEIGHT, INFO_BAR_GRID_HEIGHT):
+        CAMERA = None
+        VIEW_OFFSET = (0, 0)
+        return
+    setup_camera(engine.grid_width, engine.grid_height, engine.head)
+
+def setup_camera(grid_width, grid_height, head):
+    global CAMERA, VIEW_OFFSET
+    CAMERA = Camera(grid_width * BLOCK_SIZE, grid_height * BLOCK_SIZE,
+                    VIEW_RECT.width, VIEW_RECT.height, VIEW_RECT.top)
+    head_x, head_y = head
+    CAMERA.center_on((head_x + 0.5) * BLOCK_SIZE, (head_y + 0.5) * BLOCK_SIZE)
+    VIEW_OFFSET = CAMERA.offset
+
+def in_view(pos):
+    if CAMERA is None:
+        return True
+    return VIEW_RECT.colliderect((pos[0] - VIEW_OFFSET[0] - BLOCK_SIZE, pos[1] - VIEW_OFFSET[1] - BLOCK_SIZE,
+                                  BLOCK_SIZE * 3, BLOCK_SIZE * 3))
+
+def render_checker_pattern():
+    # Mẫu caro chu kỳ 2 ô, đủ lớn để cắt ra một khung nhìn ở mọi độ lệch.
+    pattern = pygame.Surface((VIEW_RECT.width + BLOCK_SIZE * 2, VIEW_RECT.height + BLOCK_SIZE * 2))
+    pattern.fill(COLOR_BG_LIGHT)
+    for y in range(pattern.get_height() // BLOCK_SIZE + 1):
+        for x in range(pattern.get_width() // BLOCK_SIZE + 1):
+            if (x + y) % 2 == 0:
+                pygame.draw.rect(pattern, COLOR_BG_DARK,
+                                 (x * BLOCK_SIZE, y * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE))
+    return pattern
+
+def draw_board_view_bg(target):
+    key = (VIEW_RECT.size, BLOCK_SIZE, COLOR_BG_LIGHT, COLOR_BG_DARK)
+    pattern = get_cached_layer('checker_pattern', key, render_checker_pattern)
+    period = BLOCK_SIZE * 2
+    target.blit(get_checkerboard_layer(), (0, 0), (0, 0, GAME_WIDTH, VIEW_RECT.top))
+    target.blit(pattern, VIEW_RECT.topleft,
+                (CAMERA.x % period, CAMERA.y % period, VIEW_RECT.width, VIEW_RECT.height))
+
+def get_background_layer():
+    # Nền khớp với canvas hiện tại, dùng để khôi phục các vùng dirty-rect.
+    if CAMERA is None:
+        return get_checkerboard_layer()
+
+    def render():
+        layer = pygame.Surface(game_canvas.get_size())
+        draw_board_view_bg(layer)
+        return layer
+
+    key = (game_canvas.get_size(), VIEW_RECT.size, BLOCK_SIZE, COLOR_BG_LIGHT, COLOR_BG_DARK, VIEW_OFFSET)
+    return get_cached_layer('board_view', key, render)
+
+def view_snake(engine, t, tail_still, all_still):
+    # Các đốt trong khung nhìn (đầu luôn đứng đầu list) và vị trí ở tick
+    # trước của chúng, theo toạ độ thế giới. Vị trí cũ của một đốt là ô kề
+    # phía đuôi (engine.tail_links), trừ đuôi vừa dài thêm (tail_still) và
+    # tick vừa đảo chiều (all_still). Đồng thời cho camera đi theo đầu rắn.
+    global VIEW_OFFSET
+    width = engine.grid_width
+    occupancy = engine.occupancy
+    links = engine.tail_links
+    tail_x, tail_y = engine.tail
+    tail_index = tail_y * width + tail_x
+
+    def segment(x, y, index):
+        if all_still or (tail_still and index == tail_index):
+            dx = dy = 0
+        else:
+            dx, dy = LINK_VECTORS[links[index]]
+        return [x * BLOCK_SIZE, y * BLOCK_SIZE], [(x + dx) * BLOCK_SIZE, (y + dy) * BLOCK_SIZE]
+
+    head_x, head_y = engine.head
+    head_index = head_y * width + head_x
+    head, prev_head = segment(head_x, head_y, head_index)
+    half = BLOCK_SIZE / 2
+    if CAMERA.follow(lerp(prev_head[0], head[0], t) + half, lerp(prev_head[1], head[1], t) + half):
+        VIEW_OFFSET = CAMERA.offset
+        request_full_redraw()
+
+    snake_body = [head]
+    prev_snake_body = [prev_head]
+    x0, y0, x1, y1 = CAMERA.visible_cells(BLOCK_SIZE)
+    for y in range(y0, y1):
+        row = y * width
+        for x, occupied in enumerate(occupancy[row + x0:row + x1], x0):
+            if occupied and row + x != head_index:
+                cell, prev_cell = segment(x, y, row + x)
+                snake_body.append(cell)
+                prev_snake_body.append(prev_cell)
+    return snake_body, prev_snake_body
+
+# --- DIRTY RECT RENDERING ---
+# Khi bật (--dirty-rects hoặc phím F3), game_loop không vẽ lại toàn bộ
+# canvas mỗi khung: chỉ các vùng đã vẽ ở khung trước được khôi phục từ lớp
+# nền cache, rồi chỉ các vùng thay đổi được đưa lên màn hình bằng
+# pygame.display.update(rects).
+DIRTY_RECTS_ENABLED = False
+dirty_rects = []
+prev_dirty_rects = []
+full_redraw_needed = True
+score_bar_state = None
+
+def mark_dirty(rect):
+    if DIRTY_RECTS_ENABLED:
+        dirty_rects.append(rect.clip(game_canvas.get_rect()))
+
+def request_full_redraw():
+    global full_redraw_needed
+    full_redraw_needed = True
+
+def toggle_dirty_rects():
+    global DIRTY_RECTS_ENABLED
+    DIRTY_RECTS_ENABLED = not DIRTY_RECTS_ENABLED
+    request_full_redraw()
+
+def begin_frame():
+    global dirty_rects, prev_dirty_rects, score_bar_state
+    if not DIRTY_RECTS_ENABLED or full_redraw_needed:
+        draw_checkerboard_bg()
+        dirty_rects = []
+        prev_dirty_rects = []
+        score_bar_state = None
+        return
+    background = get_background_layer()
+    for rect in dirty_rects:
+        game_canvas.blit(background, rect, rect)
+    prev_dirty_rects = dirty_rects
+    dirty_rects = []
+    # Lưỡi rắn có thể chạm vào thanh điểm: khôi phục và vẽ lại cả thanh.
+    bar_rect = get_score_bar_rect()
+    if bar_rect.collidelist(prev_dirty_rects) != -1:
+        game_canvas.blit(background, bar_rect, bar_rect)
+        score_bar_state = None
+
+def end_frame():
+    global full_redraw_needed
+    if not DIRTY_RECTS_ENABLED or full_redraw_needed:
+        full_redraw_needed = False
+        draw_to_screen(game_canvas)
+    else:
+        draw_to_screen(game_canvas, prev_dirty_rects + dirty_rects)
+
+# --- WINDOW SCALING ---
+# stretch:   smoothscale kéo giãn toàn cửa sổ (như trước đây)
+# letterbox: smoothscale giữ tỉ lệ, viền đen hai bên
+# integer:   phóng to theo bội số nguyên, nearest-neighbour (nhanh nhất)
+# Bố cục (vùng đích, viền, surface đích dùng lại) chỉ tính lại khi kích
+# thước cửa sổ, canvas hoặc chế độ thay đổi.
+SCALE_MODES = ('stretch', 'letterbox', 'integer')
+SCALE_MODE = 'stretch'
+SCALE_LAYOUT = {}
+
+def compute_scale_rect(window_size, canvas_size, mode):
+    win_w, win_h = window_size
+    canvas_w, canvas_h = canvas_size
+    if mode == 'stretch':
+        return pygame.Rect(0, 0, win_w, win_h)
+    if mode == 'integer':
+        factor = min(win_w // canvas_w, win_h // canvas_h)
+        if factor >= 1:
+            w, h = canvas_w * factor, canvas_h * factor
+            return pygame.Rect((win_w - w) // 2, (win_h - h) // 2, w, h)
+    scale = min(win_w / canvas_w, win_h / canvas_h)
+    w, h = max(1, round(canvas_w * scale)), max(1, round(canvas_h * scale))
+    return pygame.Rect((win_w - w) // 2, (win_h - h) // 2, w, h)
+
+def get_scale_layout(canvas_to_draw):
+    key = (screen.get_size(), canvas_to_draw.get_size(), SCALE_MODE)
+    if SCALE_LAYOUT.get('key') != key:
+        dest = compute_scale_rect(key[0], key[1], SCALE_MODE)
+        win_rect = screen.get_rect()
+        bars = [pygame.Rect(0, 0, win_rect.w, dest.top),
+                pygame.Rect(0, dest.bottom, win_rect.w, win_rect.h - dest.bottom),
+                pygame.Rect(0, dest.top, dest.left, dest.h),
+                pygame.Rect(dest.right, dest.top, win_rect.w - dest.right, dest.h)]
+        SCALE_LAYOUT.clear()
+        SCALE_LAYOUT.update({
+            'key': key,
+            'dest': dest,
+            'bars': [bar for bar in bars if bar.w > 0 and bar.h > 0],
+            'identity': dest.size == key[1],
+            'surface': None if dest.size == key[1] else pygame.Surface(dest.size, 0, canvas_to_draw),
+        })
+    return SCALE_LAYOUT
+
+def window_to_canvas(pos):
+    layout = SCALE_LAYOUT
+    if not layout or screen.get_size() != layout['key'][0]:
+        layout = get_scale_layout(game_canvas)
+    dest = layout['dest']
+    if dest.w == 0 or dest.h == 0:
+        return (-1, -1)
+    canvas_w, canvas_h = layout['key'][1]
+    return ((pos[0] - dest.x) * canvas_w / dest.w,
+            (pos[1] - dest.y) * canvas_h / dest.h)
+
+def get_canvas_mouse_pos():
+    return window_to_canvas(pygame.mouse.get_pos())
+
+def draw_to_screen(canvas_to_draw, rects=None):
     global screen
     screen_size = screen.get_size()
     if screen_size[0] == 0 or screen_size[1] == 0:
         return
-    if screen_size != (GAME_WIDTH, GAME_HEIGHT):
-        scaled_canvas = pygame.transform.smoothscale(canvas_to_draw, screen_size)
-        screen.blit(scaled_canvas, (0, 0))
+    layout = get_scale_layout(canvas_to_draw)
+    dest = layout['dest']
+    for bar in layout['bars']:
+        screen.fill(COLOR_BLACK, bar)
+    if layout['identity']:
+        if rects is not None:
+            screen_rects = [rect.move(dest.topleft) for rect in rects]
+            for rect, screen_rect in zip(rects, screen_rects):
+                screen.blit(canvas_to_draw, screen_rect, rect)
+            pygame.display.update(screen_rects + layout['bars'])
+            return
+        screen.blit(canvas_to_draw, dest)
     else:
-        screen.blit(canvas_to_draw, (0, 0))
+        scaled = layout['surface']
+        if SCALE_MODE == 'integer':
+            pygame.transform.scale(canvas_to_draw, dest.size, scaled)
+        else:
+            pygame.transform.smoothscale(canvas_to_draw, dest.size, scaled)
+        screen.blit(scaled, dest)
     pygame.display.flip()
 
 def toggle_fullscreen():
     global fullscreen, screen
     fullscreen = not fullscreen
+    request_full_redraw()
     if fullscreen:
         screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
     else:
@@ -219,92 +772,144 @@ def play_flash_effect():
     draw_to_screen(game_canvas)
     pygame.time.wait(75)
 
-def draw_text_with_outline(surface, text_str, font, pos, text_color, outline_color, outline_px=2):
+# --- TEXT CACHE ---
+# Chữ có viền được ghép sẵn thành một surface (8 lần blit viền + chữ) và
+# giữ trong một LRU có giới hạn, nên vẽ lại cùng một chuỗi chỉ tốn 1 blit.
+TEXT_CACHE_SIZE = 256
+TEXT_CACHE = OrderedDict()
+TEXT_CACHE_STATS = {'hits': 0, 'misses': 0}
+
+def render_outlined_text(text_str, font, text_color, outline_color, outline_px=2):
+    key = (text_str, font, text_color, outline_color, outline_px)
+    cached = TEXT_CACHE.get(key)
+    if cached is not None:
+        TEXT_CACHE.move_to_end(key)
+        TEXT_CACHE_STATS['hits'] += 1
+        return cached
+    TEXT_CACHE_STATS['misses'] += 1
+
     text_surface = font.render(text_str, True, text_color)
     outline_surface = font.render(text_str, True, outline_color)
-    x, y = pos
+    w, h = text_surface.get_size()
+    p = outline_px
+    composite = pygame.Surface((w + p * 2, h + p * 2), pygame.SRCALPHA)
+    # Nền trong suốt mang sẵn màu viền để phép trộn alpha không làm tối mép chữ.
+    composite.fill((*outline_color[:3], 0))
     outline_positions = [
-        (x - outline_px, y - outline_px), (x + outline_px, y - outline_px),
-        (x - outline_px, y + outline_px), (x + outline_px, y + outline_px),
-        (x - outline_px, y), (x + outline_px, y),
-        (x, y - outline_px), (x, y + outline_px),
+        (0, 0), (2 * p, 0), (0, 2 * p), (2 * p, 2 * p),
+        (0, p), (2 * p, p), (p, 0), (p, 2 * p),
     ]
     for outline_pos in outline_positions:
-        surface.blit(outline_surface, outline_pos)
-    surface.blit(text_surface, pos)
+        composite.blit(outline_surface, outline_pos)
+    composite.blit(text_surface, (p, p))
+
+    TEXT_CACHE[key] = composite
+    if len(TEXT_CACHE) > TEXT_CACHE_SIZE:
+        TEXT_CACHE.popitem(last=False)
+    return composite
+
+def draw_text_with_outline(surface, text_str, font, pos, text_color, outline_color, outline_px=2):
+    composite = render_outlined_text(text_str, font, text_color, outline_color, outline_px)
+    x, y = pos
+    return surface.blit(composite, (x - outline_px, y - outline_px))
 
 def draw_button(text, x, y, width, height, bg_color, text_color):
     button_rect = pygame.Rect(x, y, width, height)
-    mouse_x, mouse_y = pygame.mouse.get_pos()
-    win_w, win_h = screen.get_size()
-    if win_w == 0 or win_h == 0:
-        canvas_x, canvas_y = -1, -1
-    else:
-        canvas_x = mouse_x * (GAME_WIDTH / win_w)
-        canvas_y = mouse_y * (GAME_HEIGHT / win_h)
-    is_hovered = button_rect.collidepoint((canvas_x, canvas_y))
+    is_hovered = button_rect.collidepoint(get_canvas_mouse_pos())
     current_color = bg_color
     if is_hovered:
         current_color = (min(255, bg_color[0] + 20), min(255, bg_color[1] + 20), min(255, bg_color[2] + 20))
     pygame.draw.rect(game_canvas, current_color, button_rect, border_radius=10)
 
-    text_obj = font_button.render(text, True, text_color)
-    text_pos = (x + (width - text_obj.get_width()) / 2, y + (height - text_obj.get_height()) / 2)
-    draw_text_with_outline(game_canvas, text, font_button, text_pos,
-                           text_color, COLOR_OUTLINE_DARK, 2)
+    text_obj = render_outlined_text(text, get_font_obj(FONT_BUTTON_SIZE), text_color, COLOR_OUTLINE_DARK, 2)
+    game_canvas.blit(text_obj, (x + (width - text_obj.get_width()) / 2, y + (height - text_obj.get_height()) / 2))
     return button_rect
 
-def _draw_snake_internal(surface, visual_body, color, radius, direction, tongue=False):
-    if not visual_body:
-        return
-    for pos in visual_body:
-        body_rect = pygame.Rect(pos[0], pos[1], BLOCK_SIZE, BLOCK_SIZE)
-        pygame.draw.rect(surface, color, body_rect, border_radius=radius)
-    if len(visual_body) > 0:
-        head_pos = visual_body[0]
-        head_rect = pygame.Rect(head_pos[0], head_pos[1], BLOCK_SIZE, BLOCK_SIZE)
-        pygame.draw.rect(surface, color, head_rect, border_radius=radius)
-        if tongue:
-            eye_size = max(3, BLOCK_SIZE // 6)
-            pupil_size = max(1, BLOCK_SIZE // 15)
-            eye_offset = BLOCK_SIZE // 4
-            center_x = head_pos[0] + BLOCK_SIZE // 2
-            center_y = head_pos[1] + BLOCK_SIZE // 2
-            if direction == 'UP':
-                eye1_pos = (center_x - eye_offset, center_y - eye_offset)
-                eye2_pos = (center_x + eye_offset, center_y - eye_offset)
-            elif direction == 'DOWN':
-                eye1_pos = (center_x - eye_offset, center_y + eye_offset)
-                eye2_pos = (center_x + eye_offset, center_y + eye_offset)
-            elif direction == 'LEFT':
-                eye1_pos = (center_x - eye_offset, center_y - eye_offset)
-                eye2_pos = (center_x - eye_offset, center_y + eye_offset)
-            else:  # RIGHT
-                eye1_pos = (center_x + eye_offset, center_y - eye_offset)
-                eye2_pos = (center_x + eye_offset, center_y + eye_offset)
-            pygame.draw.circle(surface, COLOR_SNAKE_EYE, eye1_pos, eye_size)
-            pygame.draw.circle(surface, COLOR_SNAKE_EYE, eye2_pos, eye_size)
-            pygame.draw.circle(surface, COLOR_BLACK, eye1_pos, pupil_size)
-            pygame.draw.circle(surface, COLOR_BLACK, eye2_pos, pupil_size)
-            if PULSE_COUNTER % 100 < 8:
-                tongue_length = BLOCK_SIZE // 2
-                tongue_width = max(2, BLOCK_SIZE // 10)
-                tongue_rect = None
-                if direction == 'UP':
-                    tongue_rect = pygame.Rect(center_x - tongue_width // 2, head_pos[1] - tongue_length, tongue_width, tongue_length)
-                elif direction == 'DOWN':
-                    tongue_rect = pygame.Rect(center_x - tongue_width // 2, head_pos[1] + BLOCK_SIZE, tongue_width, tongue_length)
-                elif direction == 'LEFT':
-                    tongue_rect = pygame.Rect(head_pos[0] - tongue_length, center_y - tongue_width // 2, tongue_length, tongue_width)
-                elif direction == 'RIGHT':
-                    tongue_rect = pygame.Rect(head_pos[0] + BLOCK_SIZE, center_y - tongue_width // 2, tongue_length, tongue_width)
-                if tongue_rect:
-                    pygame.draw.rect(surface, COLOR_TONGUE, tongue_rect, border_radius=2)
-
-def draw_snake_smooth(snake_body, prev_snake_body, t, direction):
-    global shadow_canvas
+# --- SNAKE SPRITES ---
+# Đốt thân, đầu (theo từng hướng, đã có mắt) và mặt nạ bóng được vẽ sẵn
+# một lần (colorkey + RLE); mỗi khung chỉ còn một lệnh Surface.blits cho cả
+# con rắn. Bóng đen alpha a tương đương nhân màu nền với (255 - a), nên bóng
+# được ghép (hợp các đốt) trên một surface trắng cỡ khung bao quanh rắn rồi
+# blit một lần với BLEND_RGB_MULT, thay vì một canvas SRCALPHA 1280x720.
+SNAKE_SPRITE_CACHE = {}
+SPRITE_COLORKEY = (255, 0, 255)
+snake_shadow_surf = None
+
+def render_segment_sprite(color):
+    sprite = pygame.Surface((BLOCK_SIZE, BLOCK_SIZE)).convert()
+    sprite.fill(SPRITE_COLORKEY)
+    pygame.draw.rect(sprite, color, sprite.get_rect(), border_radius=SNAKE_CORNER_RADIUS)
+    sprite.set_colorkey(SPRITE_COLORKEY, pygame.RLEACCEL)
+    return sprite
+
+def get_shadow_shade():
+    shade = 255 - COLOR_SHADOW[3]
+    return (shade, shade, shade)
+
+def get_eye_positions(center_x, center_y, direction):
+    eye_offset = BLOCK_SIZE // 4
+    if direction == 'UP':
+        return (center_x - eye_offset, center_y - eye_offset), (center_x + eye_offset, center_y - eye_offset)
+    if direction == 'DOWN':
+        return (center_x - eye_offset, center_y + eye_offset), (center_x + eye_offset, center_y + eye_offset)
+    if direction == 'LEFT':
+        return (center_x - eye_offset, center_y - eye_offset), (center_x - eye_offset, center_y + eye_offset)
+    return (center_x + eye_offset, center_y - eye_offset), (center_x + eye_offset, center_y + eye_offset)
+
+def render_head_sprite(direction, color=COLOR_SNAKE):
+    sprite = render_segment_sprite(color)
+    eye_size = max(3, BLOCK_SIZE // 6)
+    pupil_size = max(1, BLOCK_SIZE // 15)
+    for eye_pos in get_eye_positions(BLOCK_SIZE // 2, BLOCK_SIZE // 2, direction):
+        pygame.draw.circle(sprite, COLOR_SNAKE_EYE, eye_pos, eye_size)
+    for eye_pos in get_eye_positions(BLOCK_SIZE // 2, BLOCK_SIZE // 2, direction):
+        pygame.draw.circle(sprite, COLOR_BLACK, eye_pos, pupil_size)
+    return sprite
+
+def get_snake_sprites(color=COLOR_SNAKE):
+    # Mỗi màu rắn (đấu trường có nhiều màu) có một bộ sprite riêng.
+    key = (BLOCK_SIZE, SNAKE_CORNER_RADIUS, COLOR_SNAKE_EYE, COLOR_BLACK, COLOR_SHADOW)
+    if SNAKE_SPRITE_CACHE.get('key') != key:
+        SNAKE_SPRITE_CACHE.clear()
+        SNAKE_SPRITE_CACHE['key'] = key
+    sprites = SNAKE_SPRITE_CACHE.get(color)
+    if sprites is None:
+        sprites = {'body': render_segment_sprite(color), 'shadow': render_segment_sprite(get_shadow_shade())}
+        for direction in ('UP', 'DOWN', 'LEFT', 'RIGHT'):
+            sprites[direction] = render_head_sprite(direction, color)
+        SNAKE_SPRITE_CACHE[color] = sprites
+    return sprites
+
+def get_snake_shadow_surface(width, height):
+    global snake_shadow_surf
+    if (snake_shadow_surf is None or snake_shadow_surf.get_width() < width
+            or snake_shadow_surf.get_height() < height):
+        size = (max(width, snake_shadow_surf.get_width() if snake_shadow_surf else 0),
+                max(height, snake_shadow_surf.get_height() if snake_shadow_surf else 0))
+        snake_shadow_surf = pygame.Surface(size).convert()
+    return snake_shadow_surf
+
+def draw_snake_tongue(head_pos, direction):
+    center_x = head_pos[0] + BLOCK_SIZE // 2
+    center_y = head_pos[1] + BLOCK_SIZE // 2
+    tongue_length = BLOCK_SIZE // 2
+    tongue_width = max(2, BLOCK_SIZE // 10)
+    if direction == 'UP':
+        tongue_rect = pygame.Rect(center_x - tongue_width // 2, head_pos[1] - tongue_length, tongue_width, tongue_length)
+    elif direction == 'DOWN':
+        tongue_rect = pygame.Rect(center_x - tongue_width // 2, head_pos[1] + BLOCK_SIZE, tongue_width, tongue_length)
+    elif direction == 'LEFT':
+        tongue_rect = pygame.Rect(head_pos[0] - tongue_length, center_y - tongue_width // 2, tongue_length, tongue_width)
+    else:
+        tongue_rect = pygame.Rect(head_pos[0] + BLOCK_SIZE, center_y - tongue_width // 2, tongue_length, tongue_width)
+    pygame.draw.rect(game_canvas, COLOR_TONGUE, tongue_rect, border_radius=2)
+
+def draw_snake_smooth(snake_body, prev_snake_body, t, direction, color=COLOR_SNAKE, head=True):
+    # Toạ độ vào là toạ độ thế giới; trên bàn lớn list chỉ gồm các đốt trong
+    # khung nhìn (view_snake), đốt nằm hẳn ngoài khung nhìn bị bỏ qua.
+    # head=False: đầu rắn nằm ngoài khung nhìn, mọi phần tử đều là đốt thân.
     visual_body = []
-    play_height = GAME_HEIGHT - INFO_BAR_HEIGHT
+    offset_x, offset_y = VIEW_OFFSET
 
     for i in range(len(snake_body)):
         current_grid_pos = snake_body[i]
@@ -319,25 +924,115 @@ def draw_snake_smooth(snake_body, prev_snake_body, t, direction):
 
         vis_y = lerp(prev_grid_pos[1], current_grid_pos[1], t)
 
-        visual_body.append((vis_x, vis_y))
+        visual_body.append((int(vis_x) - offset_x, int(vis_y) - offset_y))
+
+    if CAMERA is not None:
+        view = VIEW_RECT.inflate(BLOCK_SIZE * 2, BLOCK_SIZE * 2)
+        keep = 1 if head else 0
+        visual_body = visual_body[:keep] + [pos for pos in visual_body[keep:] if view.collidepoint(pos)]
+    if not visual_body:
+        return
+
+    if DIRTY_RECTS_ENABLED:
+        margin = SHADOW_OFFSET + 2
+        for vis_x, vis_y in visual_body:
+            mark_dirty(pygame.Rect(vis_x - 1, vis_y - 1, BLOCK_SIZE + margin, BLOCK_SIZE + margin))
+        if head:
+            head_x, head_y = visual_body[0]
+            mark_dirty(pygame.Rect(head_x, head_y, BLOCK_SIZE, BLOCK_SIZE).inflate(BLOCK_SIZE + 4, BLOCK_SIZE + 4))
+
+    sprites = get_snake_sprites(color)
+    min_x = min(pos[0] for pos in visual_body)
+    min_y = min(pos[1] for pos in visual_body)
+    max_x = max(pos[0] for pos in visual_body) + BLOCK_SIZE
+    max_y = max(pos[1] for pos in visual_body) + BLOCK_SIZE
+
+    # Bóng: hợp các đốt trên nền trắng, rồi nhân vào canvas một lần.
+    shadow_surf = get_snake_shadow_surface(max_x - min_x, max_y - min_y)
+    shadow_area = pygame.Rect(0, 0, max_x - min_x, max_y - min_y)
+    shadow_surf.fill(COLOR_WHITE, shadow_area)
+    shadow_sprite = sprites['shadow']
+    shadow_surf.blits([(shadow_sprite, (x - min_x, y - min_y)) for x, y in visual_body], doreturn=False)
+    game_canvas.blit(shadow_surf, (min_x + SHADOW_OFFSET, min_y + SHADOW_OFFSET), shadow_area,
+                     special_flags=pygame.BLEND_RGB_MULT)
+
+    body_sprite = sprites['body']
+    if not head:
+        game_canvas.blits([(body_sprite, pos) for pos in visual_body], doreturn=False)
+        return
+    game_canvas.blits([(body_sprite, pos) for pos in visual_body[1:]], doreturn=False)
+    head_pos = visual_body[0]
+    game_canvas.blit(sprites[direction], head_pos)
+    if PULSE_COUNTER % 100 < 8:
+        draw_snake_tongue(head_pos, direction)
+
+# --- FOOD SPRITE CACHE ---
+# Sprite táo đã scale sẵn và táo vẽ tay (kèm bóng) được render một lần
+# vào surface nhỏ, sau đó mỗi khung chỉ còn một lần blit. Nhịp đập của
+# táo vàng được lượng tử hoá thành GOLDEN_PULSE_FRAMES mức.
+FOOD_SPRITE_CACHE = {}
+GOLDEN_PULSE_FRAMES = 8
+FOOD_SPRITE_SCALE = 1.8
+
+def get_scaled_food_sprite(sprite_key, sprite):
+    scaled_size = int(BLOCK_SIZE * FOOD_SPRITE_SCALE)
+    key = ('sprite', sprite_key, id(sprite), scaled_size)
+    scaled = FOOD_SPRITE_CACHE.get(key)
+    if scaled is None:
+        scaled = pygame.transform.smoothscale(sprite, (scaled_size, scaled_size))
+        FOOD_SPRITE_CACHE[key] = scaled
+    return scaled
+
+def render_apple_sprite(color, apple_radius):
+    # Gốc toạ độ của ô nằm tại (margin, margin) để chừa chỗ cho bóng,
+    # cuống và lá tràn ra ngoài ô.
+    margin = BLOCK_SIZE // 2
+    surf = pygame.Surface((BLOCK_SIZE + margin * 2, BLOCK_SIZE + margin * 2), pygame.SRCALPHA)
+
+    shadow_center_x = margin + BLOCK_SIZE // 2 + SHADOW_OFFSET
+    shadow_center_y = margin + BLOCK_SIZE // 2 + SHADOW_OFFSET + 2
+    pygame.draw.circle(surf, COLOR_SHADOW, (shadow_center_x, shadow_center_y), apple_radius)
+
+    apple_center_x = margin + BLOCK_SIZE // 2
+    apple_center_y = margin + BLOCK_SIZE // 2 + 2
+    pygame.draw.circle(surf, color, (apple_center_x, apple_center_y), apple_radius)
+
+    stem_width = max(3, int(BLOCK_SIZE * 0.1))
+    stem_height = max(5, int(BLOCK_SIZE * 0.2))
+    stem_x = apple_center_x - stem_width // 2
+    stem_y = apple_center_y - apple_radius - stem_height + 2
+    stem_rect = pygame.Rect(stem_x, stem_y, stem_width, stem_height)
+    pygame.draw.rect(surf, COLOR_STEM, stem_rect)
+
+    leaf_width = max(8, int(BLOCK_SIZE * 0.3))
+    leaf_height = max(5, int(BLOCK_SIZE * 0.2))
+    leaf_x = apple_center_x - leaf_width - 2
+    leaf_y = apple_center_y - apple_radius
+    leaf_rect = pygame.Rect(leaf_x, leaf_y, leaf_width, leaf_height)
+    pygame.draw.ellipse(surf, COLOR_LEAF, leaf_rect)
+    return surf
 
-    shadow_canvas.fill((0, 0, 0, 0))
-    _draw_snake_internal(shadow_canvas, visual_body, COLOR_SHADOW, SNAKE_CORNER_RADIUS, direction, tongue=False)
-    game_canvas.blit(shadow_canvas, (SHADOW_OFFSET, SHADOW_OFFSET))
-    _draw_snake_internal(game_canvas, visual_body, COLOR_SNAKE, SNAKE_CORNER_RADIUS, direction, tongue=True)
+def get_apple_sprite(color, apple_radius):
+    key = ('apple', color, apple_radius, BLOCK_SIZE, SHADOW_OFFSET, COLOR_SHADOW, COLOR_STEM, COLOR_LEAF)
+    surf = FOOD_SPRITE_CACHE.get(key)
+    if surf is None:
+        surf = render_apple_sprite(color, apple_radius)
+        FOOD_SPRITE_CACHE[key] = surf
+    return surf
 
 def draw_food(food_pos, sprite_key):
     global PULSE_COUNTER
     if not food_pos:
         return
-    draw_x, draw_y = food_pos[0], food_pos[1]
+    if not in_view(food_pos):
+        return
+    draw_x, draw_y = food_pos[0] - VIEW_OFFSET[0], food_pos[1] - VIEW_OFFSET[1]
     sprite = ASSETS.get(sprite_key)
+    mark_dirty(pygame.Rect(draw_x, draw_y, BLOCK_SIZE, BLOCK_SIZE).inflate(BLOCK_SIZE, BLOCK_SIZE))
 
     if sprite:
-           scale_factor = 1.8
-           scaled_size = int(BLOCK_SIZE * scale_factor)
-           sprite_scaled = pygame.transform.smoothscale(sprite, (scaled_size, scaled_size))
-           offset = (scaled_size - BLOCK_SIZE) // 2
+           sprite_scaled = get_scaled_food_sprite(sprite_key, sprite)
+           offset = (sprite_scaled.get_width() - BLOCK_SIZE) // 2
            game_canvas.blit(sprite_scaled, (draw_x - offset, draw_y - offset))
            return
 
@@ -345,102 +1040,184 @@ def draw_food(food_pos, sprite_key):
     if sprite_key == 'golden_apple':
         color = COLOR_FOOD_GOLDEN
         pulse_amplitude = 0.1
-        scale_factor = 1 + abs(math.sin(PULSE_COUNTER * 0.15)) * pulse_amplitude
+        steps = GOLDEN_PULSE_FRAMES - 1
+        pulse = round(abs(math.sin(PULSE_COUNTER * 0.15)) * steps) / steps
+        scale_factor = 1 + pulse * pulse_amplitude
         apple_radius = int(BLOCK_SIZE * 0.4 * scale_factor)
     else:
         apple_radius = int(BLOCK_SIZE * 0.4)
 
-    shadow_radius = apple_radius
-    shadow_center_x = draw_x + BLOCK_SIZE // 2 + SHADOW_OFFSET
-    shadow_center_y = draw_y + BLOCK_SIZE // 2 + SHADOW_OFFSET + 2
-
-    shadow_surf = pygame.Surface(game_canvas.get_size(), pygame.SRCALPHA)
-    pygame.draw.circle(shadow_surf, COLOR_SHADOW, (shadow_center_x, shadow_center_y), shadow_radius)
-    game_canvas.blit(shadow_surf, (0,0))
+    margin = BLOCK_SIZE // 2
+    game_canvas.blit(get_apple_sprite(color, apple_radius), (draw_x - margin, draw_y - margin))
+
+# --- EFFECTS ---
+COLOR_SPARKLE = (255, 255, 100)
+GOLDEN_GLOW_EVERY = 3 # Số khung giữa hai đốm sáng quanh táo vàng
+DEATH_BURST_MS = 500
+DEATH_BURST_PARTICLES = 6 # Số hạt cho mỗi đốt thân khi rắn chết
+
+def emit_eat_effect(pos, golden):
+    center_x = pos[0] + BLOCK_SIZE // 2
+    center_y = pos[1] + BLOCK_SIZE // 2
+    PARTICLES.sparkle(center_x, center_y, BLOCK_SIZE * 0.8, COLOR_SPARKLE)
+    if golden:
+        PARTICLES.burst(center_x, center_y, 24, COLOR_FOOD_GOLDEN, speed=6.0, life=30, radius=5.0)
+    else:
+        PARTICLES.burst(center_x, center_y, 10, COLOR_SPARKLE, speed=4.0, life=20, radius=3.0)
 
-    apple_center_x = draw_x + BLOCK_SIZE // 2
-    apple_center_y = draw_y + BLOCK_SIZE // 2 + 2
+def emit_trail(pos):
+    # Hạt ngoài khung nhìn không thấy được nhưng sẽ kéo giãn vùng dirty-rect.
+    if not in_view(pos):
+        return
+    PARTICLES.trail(pos[0] + BLOCK_SIZE // 2, pos[1] + BLOCK_SIZE // 2, COLOR_SNAKE)
 
-    pygame.draw.circle(game_canvas, color, (apple_center_x, apple_center_y), apple_radius)
+def emit_golden_glow(pos):
+    if pos and PULSE_COUNTER % GOLDEN_GLOW_EVERY == 0 and in_view(pos):
+        PARTICLES.glow(pos[0] + BLOCK_SIZE // 2, pos[1] + BLOCK_SIZE // 2, COLOR_FOOD_GOLDEN, BLOCK_SIZE * 0.4)
 
-    stem_width = max(3, int(BLOCK_SIZE * 0.1))
-    stem_height = max(5, int(BLOCK_SIZE * 0.2))
-    stem_x = apple_center_x - stem_width // 2
-    stem_y = apple_center_y - apple_radius - stem_height + 2
-    stem_rect = pygame.Rect(stem_x, stem_y, stem_width, stem_height)
-    pygame.draw.rect(game_canvas, COLOR_STEM, stem_rect)
+def draw_effects():
+    PARTICLES.update()
+    rect = PARTICLES.draw(game_canvas, bounds=DIRTY_RECTS_ENABLED, offset=VIEW_OFFSET)
+    if rect:
+        mark_dirty(rect)
+
+def play_death_burst(snake_body, food_pos, golden_apple_pos, score, high_score):
+    # Thân rắn vỡ thành hạt, chạy trong DEATH_BURST_MS trước khi sang màn thua.
+    half = BLOCK_SIZE // 2
+    for x, y in snake_body:
+        PARTICLES.burst(x + half, y + half, DEATH_BURST_PARTICLES, COLOR_SNAKE, speed=5.0,
+                        life=50, radius=7.0, gravity=0.15, spread=half / 2)
+    request_full_redraw()
+    end_time = pygame.time.get_ticks() + DEATH_BURST_MS
+    while pygame.time.get_ticks() < end_time:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                quit_game()
+        begin_frame()
+        if CAMERA is not None:
+            game_canvas.set_clip(VIEW_RECT)
+        draw_food(food_pos, 'apple')
+        draw_food(golden_apple_pos, 'golden_apple')
+        draw_effects()
+        game_canvas.set_clip(None)
+        display_score(score, high_score)
+        end_frame()
+        clock.tick(TARGET_FPS)
 
-    leaf_width = max(8, int(BLOCK_SIZE * 0.3))
-    leaf_height = max(5, int(BLOCK_SIZE * 0.2))
-    leaf_x = apple_center_x - leaf_width - 2
-    leaf_y = apple_center_y - apple_radius
-    leaf_rect = pygame.Rect(leaf_x, leaf_y, leaf_width, leaf_height)
-    pygame.draw.ellipse(game_canvas, COLOR_LEAF, leaf_rect)
+SCORE_BAR_HEIGHT = INFO_BAR_HEIGHT - 20
+SCORE_BAR_PADDING_X = 20
 
-def draw_effects():
-    global EFFECT_LIST
-    for i in range(len(EFFECT_LIST) - 1, -1, -1):
-        effect = EFFECT_LIST[i]
-        effect['timer'] -= 1
-        if effect['timer'] <= 0:
-            EFFECT_LIST.pop(i)
-            continue
-        if effect['type'] == 'sparkle':
-            MAX_FRAMES_SPARKLE = 10
-            progress = (MAX_FRAMES_SPARKLE - effect['timer']) / MAX_FRAMES_SPARKLE
-            radius = int(progress * BLOCK_SIZE * 0.8)
-            alpha = int((1.0 - progress) * 200)
-            if alpha > 0 and radius > 0:
-                center_x = effect['pos'][0] + BLOCK_SIZE // 2
-                center_y = effect['pos'][1] + BLOCK_SIZE // 2
-                glow_surf = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
-                pygame.draw.circle(glow_surf, (255, 255, 100, alpha), (radius, radius), radius)
-                game_canvas.blit(glow_surf, (center_x - radius, center_y - radius))
+def get_score_bar_rect():
+    bar_width = GAME_WIDTH - (SCORE_BAR_PADDING_X * 2)
+    bar_y = (INFO_BAR_HEIGHT - SCORE_BAR_HEIGHT) // 2
+    return pygame.Rect(SCORE_BAR_PADDING_X, bar_y, bar_width, SCORE_BAR_HEIGHT)
 
 def display_score(score, high_score):
-    BAR_HEIGHT = INFO_BAR_HEIGHT - 20
+    global score_bar_state
+    BAR_HEIGHT = SCORE_BAR_HEIGHT
     BAR_RADIUS = 15
-    BAR_PADDING_X = 20
-    BAR_WIDTH = GAME_WIDTH - (BAR_PADDING_X * 2)
-    bar_x = BAR_PADDING_X
-    bar_y = (INFO_BAR_HEIGHT - BAR_HEIGHT) // 2
-    score_bar_rect = pygame.Rect(bar_x, bar_y, BAR_WIDTH, BAR_HEIGHT)
-
-    glass_surf = pygame.Surface(score_bar_rect.size, pygame.SRCALPHA)
-    pygame.draw.rect(glass_surf, COLOR_GLASS_BG, glass_surf.get_rect(), border_radius=BAR_RADIUS)
-    pygame.draw.rect(glass_surf, COLOR_GLASS_BORDER, glass_surf.get_rect(), width=2, border_radius=BAR_RADIUS)
-    game_canvas.blit(glass_surf, score_bar_rect.topleft)
-
-    score_text_obj = font_score.render(f"Score: {score}", True, COLOR_SCORE_TEXT)
-    high_score_text_obj = font_score.render(f"High: {high_score}", True, COLOR_SCORE_TEXT)
-
-    score_text_x = bar_x + 30
+    score_bar_rect = get_score_bar_rect()
+    bar_x, bar_y = score_bar_rect.topleft
+    BAR_WIDTH = score_bar_rect.width
+
+    if DIRTY_RECTS_ENABLED and not full_redraw_needed:
+        # Thanh điểm chỉ vẽ lại khi điểm đổi (hoặc bị lưỡi rắn đè lên).
+        if score_bar_state == (score, high_score):
+            return
+        if score_bar_state is not None:
+            game_canvas.blit(get_checkerboard_layer(), score_bar_rect, score_bar_rect)
+        mark_dirty(score_bar_rect)
+    score_bar_state = (score, high_score)
+
+    def render_glass():
+        glass_surf = pygame.Surface(score_bar_rect.size, pygame.SRCALPHA)
+        pygame.draw.rect(glass_surf, COLOR_GLASS_BG, glass_surf.get_rect(), border_radius=BAR_RADIUS)
+        pygame.draw.rect(glass_surf, COLOR_GLASS_BORDER, glass_surf.get_rect(), width=2, border_radius=BAR_RADIUS)
+        return glass_surf
+
+    glass_key = (score_bar_rect.size, BAR_RADIUS, COLOR_GLASS_BG, COLOR_GLASS_BORDER)
+    game_canvas.blit(get_cached_layer('glass_bar', glass_key, render_glass), score_bar_rect.topleft)
+
+    score_text_obj = render_outlined_text(f"Score: {score}", get_font_obj(FONT_SCORE_SIZE),
+                                          COLOR_SCORE_TEXT, COLOR_OUTLINE_LIGHT, 2)
+    high_score_text_obj = render_outlined_text(f"High: {high_score}", get_font_obj(FONT_SCORE_SIZE),
+                                               COLOR_SCORE_TEXT, COLOR_OUTLINE_LIGHT, 2)
+
+    score_text_x = bar_x + 30 - 2
     score_text_y = bar_y + (BAR_HEIGHT - score_text_obj.get_height()) // 2
 
-    high_score_text_x = bar_x + BAR_WIDTH - high_score_text_obj.get_width() - 30
+    high_score_text_x = bar_x + BAR_WIDTH - high_score_text_obj.get_width() - 30 + 2
     high_score_text_y = bar_y + (BAR_HEIGHT - high_score_text_obj.get_height()) // 2
 
-    draw_text_with_outline(game_canvas, f"Score: {score}", font_score,
-                          (score_text_x, score_text_y),
-                          COLOR_SCORE_TEXT, COLOR_OUTLINE_LIGHT, 2)
-
-    draw_text_with_outline(game_canvas, f"High: {high_score}", font_score,
-                          (high_score_text_x, high_score_text_y),
-                          COLOR_SCORE_TEXT, COLOR_OUTLINE_LIGHT, 2)
-
-def load_high_score():
+    game_canvas.blit(score_text_obj, (score_text_x, score_text_y))
+    game_canvas.blit(high_score_text_obj, (high_score_text_x, high_score_text_y))
+
+# --- LEADERBOARD ---
+# Điểm lưu trong leaderboard.db (leaderboard.py, SQLite WAL, dùng chung với
+# launcher), mỗi ván một dòng theo chế độ chơi. Mở một lần cho cả tiến
+# trình (worker giữ kết nối giữa các phiên); lỗi cơ sở dữ liệu chỉ làm mất
+# điểm của ván đó chứ không dừng game.
+LEADERBOARD_UNOPENED = object()
+LEADERBOARD = LEADERBOARD_UNOPENED
+
+def get_leaderboard():
+    global LEADERBOARD
+    if LEADERBOARD is LEADERBOARD_UNOPENED:
+        LEADERBOARD = open_leaderboard(SCRIPT_DIR)
+    return LEADERBOARD
+
+def current_mode(wrap_mode):
+    if NET_ADDRESS:
+        return 'net'
+    if ARENA_SNAKES:
+        return 'arena'
+    return game_mode(wrap_mode, BOARD_SIZE)
+
+def load_high_score(mode):
+    board = get_leaderboard()
+    if board is None:
+        return 0
     try:
-        with open(os.path.join(SCRIPT_DIR, HIGHSCORE_FILE), "r", encoding="utf-8") as f:
-            return int(f.read())
-    except (FileNotFoundError, ValueError):
+        return board.high_score(mode)
+    except sqlite3.Error as e:
+        print("Warning: Could not read high score. Error:", e)
         return 0
 
-def save_high_score(score):
+def load_top_scores(mode):
+    board = get_leaderboard()
+    if board is None:
+        return []
     try:
-        with open(os.path.join(SCRIPT_DIR, HIGHSCORE_FILE), "w", encoding="utf-8") as f:
-            f.write(str(score))
-    except Exception as e:
-        print("Warning: Could not save high score. Error:", e)
+        return board.top(mode)
+    except sqlite3.Error as e:
+        print("Warning: Could not read leaderboard. Error:", e)
+        return []
+
+def save_round_score(mode, score, ticks, duration):
+    board = get_leaderboard()
+    if board is None:
+        return
+    try:
+        board.record(mode, score, ticks, round(duration, 2))
+    except sqlite3.Error as e:
+        print("Warning: Could not save score. Error:", e)
+
+# --- IDLE SCREENS ---
+# Màn hình tĩnh (thua, điểm cao, tạm dừng) chặn ở pygame.event.wait thay vì
+# vẽ lại liên tục, và chỉ vẽ lại khi trạng thái hover, kích thước cửa sổ
+# hoặc nội dung đổi. Timeout để vòng lặp vẫn kiểm tra lại định kỳ.
+IDLE_WAIT_MS = 500
+REDRAW_EVENTS = (pygame.VIDEORESIZE, pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED)
+
+def wait_for_events(timeout=IDLE_WAIT_MS):
+    event = pygame.event.wait(timeout)
+    if event.type == pygame.NOEVENT:
+        return []
+    return [event] + pygame.event.get()
+
+def screen_state(buttons):
+    mouse_pos = get_canvas_mouse_pos()
+    return (screen.get_size(), fullscreen, tuple(rect.collidepoint(mouse_pos) for rect in buttons))
 
 def pause_game():
     global screen
@@ -449,190 +1226,547 @@ def pause_game():
     overlay.fill((0, 0, 0, 150))
     game_canvas.blit(overlay, (0, 0))
 
-    pause_text_obj = font_pause.render("PAUSED", True, COLOR_WHITE)
-    pause_pos = (GAME_WIDTH / 2 - pause_text_obj.get_width() / 2, GAME_HEIGHT / 2 - pause_text_obj.get_height() / 2)
-    draw_text_with_outline(game_canvas, "PAUSED", font_pause,
+    pause_w, pause_h = get_font_obj(FONT_PAUSE_SIZE).size("PAUSED")
+    pause_pos = (GAME_WIDTH / 2 - pause_w / 2, GAME_HEIGHT / 2 - pause_h / 2)
+    draw_text_with_outline(game_canvas, "PAUSED", get_font_obj(FONT_PAUSE_SIZE),
                            pause_pos, COLOR_WHITE, COLOR_OUTLINE_DARK, 3)
 
-    info_text_obj = font_info.render("Press 'P' to continue", True, COLOR_WHITE)
-    info_pos = (GAME_WIDTH / 2 - info_text_obj.get_width() / 2, GAME_HEIGHT / 2 + 100)
-    draw_text_with_outline(game_canvas, "Press 'P' to continue", font_info,
+    info_w = get_font_obj(FONT_INFO_SIZE).size("Press 'P' to continue")[0]
+    info_pos = (GAME_WIDTH / 2 - info_w / 2, GAME_HEIGHT / 2 + 100)
+    draw_text_with_outline(game_canvas, "Press 'P' to continue", get_font_obj(FONT_INFO_SIZE),
                            info_pos, COLOR_WHITE, COLOR_OUTLINE_DARK, 2)
 
     draw_to_screen(game_canvas)
 
+    # Canvas không đổi trong lúc tạm dừng: chỉ đưa lại lên màn hình khi
+    # cửa sổ đổi kích thước / bật tắt toàn màn hình / cần vẽ lại.
     while paused:
-        for event in pygame.event.get():
+        for event in wait_for_events():
             if event.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
+                quit_game()
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_p:
                     paused = False
                 if event.key == pygame.K_F11:
                     toggle_fullscreen()
-                    game_canvas.blit(overlay, (0, 0))
-                    draw_text_with_outline(game_canvas, "PAUSED", font_pause,
-                                           pause_pos, COLOR_WHITE, COLOR_OUTLINE_DARK, 3)
-                    draw_text_with_outline(game_canvas, "Press 'P' to continue", font_info,
-                                           info_pos, COLOR_WHITE, COLOR_OUTLINE_DARK, 2)
                     draw_to_screen(game_canvas)
-            elif event.type == pygame.VIDEORESIZE:
-                game_canvas.blit(overlay, (0, 0))
-                draw_text_with_outline(game_canvas, "PAUSED", font_pause,
-                                        pause_pos, COLOR_WHITE, COLOR_OUTLINE_DARK, 3)
-                draw_text_with_outline(game_canvas, "Press 'P' to continue", font_info,
-                                        info_pos, COLOR_WHITE, COLOR_OUTLINE_DARK, 2)
+            elif event.type in REDRAW_EVENTS:
                 draw_to_screen(game_canvas)
-        clock.tick(15)
-
-def game_loop(high_score, wrap_mode):
-    global PULSE_COUNTER, EFFECT_LIST, screen
-    snake_pos = [120, INFO_BAR_HEIGHT]
-    snake_body = [[120, INFO_BAR_HEIGHT], [80, INFO_BAR_HEIGHT], [40, INFO_BAR_HEIGHT]]
-    prev_snake_body = list(snake_body)
-    direction = 'RIGHT'
-    change_to = direction
-
-    def spawn_food():
-        while True:
-            new_pos = [random.randrange(0, GRID_WIDTH) * BLOCK_SIZE,
-                       random.randrange(INFO_BAR_GRID_HEIGHT, GRID_HEIGHT) * BLOCK_SIZE]
-            if new_pos not in snake_body:
-                return new_pos
-
-    food_pos = spawn_food()
-    golden_apple_pos = None
-    golden_apple_timer = 0
-    GOLDEN_APPLE_LIFESPAN = 150
-    score = 0
-    current_speed = BASE_SPEED
-    logic_timer = 0.0
+    request_full_redraw()
+
+def cells_to_pixels(cells):
+    return [[x * BLOCK_SIZE, y * BLOCK_SIZE] for x, y in cells]
+
+def cell_to_pixel(cell):
+    if cell is None:
+        return None
+    return [cell[0] * BLOCK_SIZE, cell[1] * BLOCK_SIZE]
+
+# --- REPLAYS ---
+# --record [DIR] lưu mỗi ván vào DIR dưới dạng replay (seed + lệnh theo tick);
+# --replay FILE chiếu lại ván đó ở tốc độ thật (thêm --headless để chỉ
+# kiểm tra kết quả, chạy nhanh nhất có thể, không mở cửa sổ).
+RECORD_DIR = None
+
+# --- AUTOPILOT ---
+# --autopilot: AI (autopilot.py) chơi thay người, dùng cho demo, chạy thử lâu
+# và màn hình chờ. Phím hướng bị bỏ qua, hết ván thì chơi lại ngay; số quyết
+# định/giây được cộng vào thống kê phiên.
+AUTOPILOT_ENABLED = False
+
+def flush_autopilot_stats(autopilot):
+    SESSION_STATS['autopilot_decisions'] += autopilot.decisions
+    SESSION_STATS['autopilot_seconds'] += autopilot.decide_seconds
+    autopilot.decisions = 0
+    autopilot.decide_seconds = 0.0
+
+def save_round_replay(engine):
+    try:
+        os.makedirs(RECORD_DIR, exist_ok=True)
+        name = time.strftime("snake-%Y%m%d-%H%M%S") + f"-{engine.seed}.json.gz"
+        replay_io.save_replay(os.path.join(RECORD_DIR, name), engine)
+    except Exception as e:
+        print("Warning: Could not save replay. Error:", e)
+
+def end_round(engine, autopilot=None):
+    record_round(engine.score)
+    if autopilot is not None:
+        flush_autopilot_stats(autopilot)
+    if RECORD_DIR and engine.input_log is not None:
+        save_round_replay(engine)
+    # (điểm, thắng): rắn lấp kín bàn thì màn hình kết thúc hiện WIN thay vì LOSE.
+    return engine.score, engine.won
+
+def draw_frame(food_pos, golden_apple_pos, snake_body, prev_snake_body, t,
+               direction, score, high_score, prof=None):
+    begin_frame()
+    if prof: prof.mark('background')
+    if CAMERA is not None:
+        # Bàn lớn: đồ vật sát mép trên không được tràn lên thanh thông tin.
+        game_canvas.set_clip(VIEW_RECT)
+    draw_food(food_pos, 'apple')
+    draw_food(golden_apple_pos, 'golden_apple')
+    if prof: prof.mark('food')
+    if len(prev_snake_body) == len(snake_body):
+        draw_snake_smooth(snake_body, prev_snake_body, t, direction)
+    else:
+        draw_snake_smooth(snake_body, snake_body, 1.0, direction)
+    if prof: prof.mark('snake')
+    draw_effects()
+    game_canvas.set_clip(None)
+    if prof: prof.mark('effects')
+    display_score(score, high_score)
+    if prof:
+        prof.mark('score')
+        if PROFILE_OVERLAY_VISIBLE:
+            draw_profile_overlay()
+        prof.mark('overlay')
+    end_frame()
+    if prof:
+        prof.mark('present')
+        prof.end_frame()
+
+TURN_KEYS = {pygame.K_UP: 'UP', pygame.K_DOWN: 'DOWN', pygame.K_LEFT: 'LEFT', pygame.K_RIGHT: 'RIGHT'}
+
+def game_loop(high_score, wrap_mode, replay=None):
+    global PULSE_COUNTER, screen
+    if replay is not None:
+        engine = replay_io.engine_from_replay(replay)
+        replay_inputs = list(replay_io.iter_inputs(replay))
+        replay_end = replay['result']['ticks']
+    else:
+        engine = new_engine(wrap_mode, record_inputs=RECORD_DIR is not None)
+        replay_inputs = []
+        replay_end = None
+    replay_index = 0
+    autopilot = Autopilot(engine) if AUTOPILOT_ENABLED and replay is None else None
+    setup_view(engine)
+    if CAMERA is None:
+        snake_body = cells_to_pixels(engine.snake_body)
+        prev_snake_body = list(snake_body)
+    else:
+        snake_body, prev_snake_body = view_snake(engine, 1.0, False, True)
+    tail_still = False
+    all_still = True
+    scheduler = FixedStepScheduler(engine.speed, TARGET_FPS)
+    PARTICLES.clear()
+    request_full_redraw()
+
+    frame_times = SESSION_STATS['frame_times']
+    input_latency = SESSION_STATS['input_latency']
+    pending_turns = [] # Thời điểm bấm phím của các lệnh rẽ đã áp dụng, chờ khung hình hiện ra
+    prof = PROFILER
+    bus = TELEMETRY
+    round_frames = TimingHistogram() if bus else None # Chỉ riêng ván này, cho sự kiện round_end
+    if bus:
+        counters = {'apples': 0, 'golden': 0, 'keys': 0, 'turns': 0}
+        bus.emit('round_start', mode=current_mode(engine.wrap_mode), seed=engine.seed,
+                 board=[engine.grid_width, engine.grid_height], autopilot=autopilot is not None,
+                 replay=replay is not None)
 
     while True:
         dt = clock.tick(TARGET_FPS) / 1000.0
-        logic_timer += dt
+        if prof: prof.begin_frame()
+        frame_times.add(dt)
+        if round_frames is not None: round_frames.add(dt)
+        scheduler.add_time(dt)
         PULSE_COUNTER += 1
 
+        # Mốc thời gian của mọi phím trong khung này: sớm nhất có thể trong
+        # vòng event, trước khi xử lý phím nào (xem summarize_input_latency).
+        polled = time.perf_counter()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
+                quit_game()
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_F11:
                     toggle_fullscreen()
+                if event.key == pygame.K_F3:
+                    toggle_dirty_rects()
+                if event.key == pygame.K_F2 and prof:
+                    toggle_profile_overlay()
                 if event.key == pygame.K_p:
                     pause_game()
-                if event.key == pygame.K_UP and direction != 'DOWN':
-                    change_to = 'UP'
-                if event.key == pygame.K_DOWN and direction != 'UP':
-                    change_to = 'DOWN'
-                if event.key == pygame.K_LEFT and direction != 'RIGHT':
-                    change_to = 'LEFT'
-                if event.key == pygame.K_RIGHT and direction != 'LEFT':
-                    change_to = 'RIGHT'
+                    clock.tick() # Không tính thời gian tạm dừng vào khung kế tiếp
+                    if prof: prof.begin_frame()
+                    polled = time.perf_counter()
+                if replay is not None or autopilot is not None:
+                    continue
+                if event.key in TURN_KEYS:
+                    engine.queue_turn(TURN_KEYS[event.key], polled)
+                    if bus: counters['keys'] += 1
             elif event.type == pygame.VIDEORESIZE:
-                pass
-
-        time_per_step = 1.0 / current_speed
-        while logic_timer >= time_per_step:
-            logic_timer -= time_per_step
-            prev_snake_body = list(snake_body)
-            direction = change_to
-
-            if direction == 'UP':
-                snake_pos[1] -= BLOCK_SIZE
-            if direction == 'DOWN':
-                snake_pos[1] += BLOCK_SIZE
-            if direction == 'LEFT':
-                snake_pos[0] -= BLOCK_SIZE
-            if direction == 'RIGHT':
-                snake_pos[0] += BLOCK_SIZE
-
-            if (snake_pos[0] < 0 or snake_pos[0] >= GAME_WIDTH or
-                snake_pos[1] < INFO_BAR_HEIGHT or snake_pos[1] >= GAME_HEIGHT):
+                request_full_redraw()
+        if prof: prof.mark('events')
+
+        while scheduler.next_tick():
+            if replay_end is not None and engine.ticks >= replay_end:
+                if bus: emit_round_end(engine, 'replay_end', counters, round_frames)
+                return end_round(engine)
+            while replay_index < len(replay_inputs) and replay_inputs[replay_index][0] <= engine.ticks:
+                engine.turn(replay_inputs[replay_index][1])
+                replay_index += 1
+            if CAMERA is None:
+                prev_snake_body = snake_body
+            tail = engine.tail
+            result = engine.step(autopilot.decide() if autopilot else None)
+            SESSION_STATS['ticks'] += 1
+            if result.speed_up:
+                scheduler.set_rate(engine.speed)
+            if result.turn_time is not None:
+                pending_turns.append(result.turn_time)
+            if bus:
+                emit_tick_events(bus, engine, result, counters)
+                if result.death or result.won:
+                    emit_round_end(engine, result.death or 'won', counters, round_frames)
+
+            if result.ate_food:
+                sound_eat.play()
+            if result.ate_golden:
+                sound_eat.play()
+
+            if result.death:
                 sound_game_over.play()
                 play_flash_effect()
+                play_death_burst(snake_body, cell_to_pixel(engine.food_pos),
+                                 cell_to_pixel(engine.golden_apple_pos), engine.score, high_score)
+                return end_round(engine, autopilot)
+            if result.won:
                 pygame.time.wait(500)
-                return score
-
-            snake_body.insert(0, list(snake_pos))
-            ate_something = False
-            eat_pos = None
-
-            if snake_pos[0] == food_pos[0] and snake_pos[1] == food_pos[1]:
-                ate_something = True
-                eat_pos = list(food_pos)
-                score += 10
-                sound_eat.play()
-                if score % 50 == 0:
-                    current_speed += 1
-                food_pos = spawn_food()
-
-            if golden_apple_pos and snake_pos[0] == golden_apple_pos[0] and snake_pos[1] == golden_apple_pos[1]:
-                ate_something = True
-                eat_pos = list(golden_apple_pos)
-                score += 50
-                sound_eat.play()
-                golden_apple_pos = None
-                golden_apple_timer = 0
+                return end_round(engine, autopilot)
 
-            if not ate_something:
-                snake_body.pop()
+            tail_still = result.eat_pos is not None
+            all_still = result.reversed
+            if result.eat_pos:
+                emit_eat_effect(cell_to_pixel(result.eat_pos), result.ate_golden)
             else:
-                if prev_snake_body:
+                emit_trail(cell_to_pixel(tail))
+            if CAMERA is None:
+                snake_body = cells_to_pixels(engine.snake_body)
+                if result.eat_pos and prev_snake_body:
                     prev_snake_body.append(prev_snake_body[-1])
-                if eat_pos:
-                    EFFECT_LIST.append({'type': 'sparkle', 'pos': eat_pos, 'timer': 10})
-
-                if wrap_mode:
-                    snake_body.reverse()
-                    snake_pos[:] = snake_body[0]
-
-                    if direction == 'UP': direction = 'DOWN'
-                    elif direction == 'DOWN': direction = 'UP'
-                    elif direction == 'LEFT': direction = 'RIGHT'
-                    elif direction == 'RIGHT': direction = 'LEFT'
-
-                    change_to = direction
-
-            if golden_apple_pos:
-                golden_apple_timer -= 1
-                if golden_apple_timer <= 0:
-                    golden_apple_pos = None
-            elif random.randrange(0, 400) == 1:
-                golden_apple_pos = spawn_food()
-                golden_apple_timer = GOLDEN_APPLE_LIFESPAN
-
-            for block in snake_body[1:]:
-                if snake_pos[0] == block[0] and snake_pos[1] == block[1]:
-                    sound_game_over.play()
-                    play_flash_effect()
-                    pygame.time.wait(500)
-                    return score
 
-        # DRAW
-        t = logic_timer / time_per_step if time_per_step > 0 else 1.0
-        draw_checkerboard_bg()
-        draw_food(food_pos, 'apple')
-        draw_food(golden_apple_pos, 'golden_apple')
-        if len(prev_snake_body) == len(snake_body):
-            draw_snake_smooth(snake_body, prev_snake_body, t, direction)
+        if CAMERA is not None:
+            snake_body, prev_snake_body = view_snake(engine, scheduler.alpha, tail_still, all_still)
+        if prof: prof.mark('logic')
+        food_pos = cell_to_pixel(engine.food_pos)
+        golden_apple_pos = cell_to_pixel(engine.golden_apple_pos)
+        emit_golden_glow(golden_apple_pos)
+        direction = engine.direction
+        score = engine.score
+
+        SESSION_STATS['dropped_ticks'] += scheduler.dropped
+        SESSION_STATS['late_ticks'] += scheduler.late
+        scheduler.dropped = scheduler.late = 0
+        if autopilot:
+            flush_autopilot_stats(autopilot)
+
+        # DRAW (nội suy giữa hai tick theo scheduler.alpha)
+        draw_frame(food_pos, golden_apple_pos, snake_body, prev_snake_body, scheduler.alpha,
+                   direction, score, high_score, prof)
+        if pending_turns:
+            # Độ trễ phím -> khung hình đầu tiên (đã flip) vẽ rắn đi theo hướng mới.
+            presented = time.perf_counter()
+            for pressed in pending_turns:
+                input_latency.add(presented - pressed)
+            pending_turns.clear()
+        report_startup_trace()
+
+# --- ARENA ---
+# --arena N: đấu trường cục bộ, người chơi là rắn số 0 (phím hướng), N - 1
+# rắn còn lại do ArenaBot (arena.py) điều khiển và được spawn lại khi chết.
+# Bàn cỡ arena_size(N) (hoặc --board), camera đi theo người chơi như bàn
+# lớn; các đốt trong khung nhìn được lấy bằng cách quét lưới occupancy /
+# owner / tail_links của ArenaEngine rồi gom theo rắn.
+ARENA_SNAKES = 0
+ARENA_PLAYER_COLOR = COLOR_SNAKE
+ARENA_BOT_COLORS = [(219, 112, 76), (150, 90, 200), (60, 170, 160), (220, 160, 40),
+                    (200, 80, 150), (90, 90, 90), (40, 120, 60), (120, 70, 40)]
+
+def arena_color(snake_id):
+    if snake_id == 0:
+        return ARENA_PLAYER_COLOR
+    return ARENA_BOT_COLORS[snake_id % len(ARENA_BOT_COLORS)]
+
+def view_arena(arena, player, t):
+    # {id: (đốt, vị trí tick trước, đầu có trong khung nhìn)} theo toạ độ
+    # thế giới; đầu (nếu thấy) đứng đầu list. Cho camera đi theo người chơi.
+    global VIEW_OFFSET
+    width = arena.grid_width
+    occupancy, owner, links, snakes = arena.occupancy, arena.owner, arena.tail_links, arena.snakes
+
+    def segment(snake, x, y, index):
+        if snake.grew and (x, y) == snake.body[-1]:
+            dx = dy = 0
         else:
-            draw_snake_smooth(snake_body, snake_body, 1.0, direction)
-        draw_effects()
-        display_score(score, high_score)
-        draw_to_screen(game_canvas)
+            dx, dy = LINK_VECTORS[links[index]]
+        return [x * BLOCK_SIZE, y * BLOCK_SIZE], [(x + dx) * BLOCK_SIZE, (y + dy) * BLOCK_SIZE]
+
+    me = snakes[player]
+    head_x, head_y = me.head
+    head, prev_head = segment(me, head_x, head_y, head_y * width + head_x)
+    half = BLOCK_SIZE / 2
+    if CAMERA.follow(lerp(prev_head[0], head[0], t) + half, lerp(prev_head[1], head[1], t) + half):
+        VIEW_OFFSET = CAMERA.offset
+        request_full_redraw()
+
+    groups = {}
+    x0, y0, x1, y1 = CAMERA.visible_cells(BLOCK_SIZE)
+    for y in range(y0, y1):
+        row = y * width
+        for x, occupied in enumerate(occupancy[row + x0:row + x1], x0):
+            if not occupied:
+                continue
+            snake = snakes[owner[row + x]]
+            group = groups.get(snake.id)
+            if group is None:
+                group = groups[snake.id] = ([], [], [False])
+            cell, prev_cell = segment(snake, x, y, row + x)
+            if (x, y) == snake.body[0]:
+                group[0].insert(0, cell)
+                group[1].insert(0, prev_cell)
+                group[2][0] = True
+            else:
+                group[0].append(cell)
+                group[1].append(prev_cell)
+    return groups
+
+def draw_arena_frame(arena, groups, t, score, high_score):
+    begin_frame()
+    game_canvas.set_clip(VIEW_RECT)
+    width = arena.grid_width
+    for index in arena.food_cells:
+        draw_food([index % width * BLOCK_SIZE, index // width * BLOCK_SIZE], 'apple')
+    for snake_id, (body, prev_body, has_head) in groups.items():
+        draw_snake_smooth(body, prev_body, t, arena.snakes[snake_id].direction,
+                          arena_color(snake_id), has_head[0])
+    draw_effects()
+    game_canvas.set_clip(None)
+    display_score(score, high_score)
+    end_frame()
+
+def arena_loop(high_score):
+    global PULSE_COUNTER
+    size = BOARD_SIZE or arena_size(ARENA_SNAKES, *VIEW_GRID_SIZE)
+    arena = ArenaEngine(*size, food_count=arena_food_count(ARENA_SNAKES),
+                        seed=random.randrange(2 ** 32), base_speed=BASE_SPEED)
+    player = arena.spawn_snake()
+    bot = ArenaBot(arena.seed)
+    for _ in range(ARENA_SNAKES - 1):
+        arena.spawn_snake()
+    setup_camera(arena.grid_width, arena.grid_height, arena.snakes[player].head)
+    scheduler = FixedStepScheduler(arena.speed, TARGET_FPS)
+    PARTICLES.clear()
+    request_full_redraw()
+    frame_times = SESSION_STATS['frame_times']
+
+    while True:
+        dt = clock.tick(TARGET_FPS) / 1000.0
+        frame_times.add(dt)
+        scheduler.add_time(dt)
+        PULSE_COUNTER += 1
 
-def game_over_screen(score, high_score):
+        polled = time.perf_counter()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                quit_game()
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_F11:
+                    toggle_fullscreen()
+                if event.key == pygame.K_F3:
+                    toggle_dirty_rects()
+                if event.key == pygame.K_p:
+                    pause_game()
+                    clock.tick()
+                    polled = time.perf_counter()
+                if event.key in TURN_KEYS:
+                    arena.queue_turn(player, TURN_KEYS[event.key], polled)
+            elif event.type == pygame.VIDEORESIZE:
+                request_full_redraw()
+
+        while scheduler.next_tick():
+            me = arena.snakes[player]
+            tail = me.tail
+            result = arena.step(bot.actions(arena, skip=(player,)))
+            SESSION_STATS['ticks'] += 1
+            for snake_id, pos in result.eaten:
+                if snake_id == player:
+                    sound_eat.play()
+                pixel = cell_to_pixel(pos)
+                if in_view(pixel):
+                    emit_eat_effect(pixel, False)
+            for snake_id, cause in result.deaths:
+                if snake_id == player:
+                    continue
+                for cell in arena.snakes[snake_id].body:
+                    pixel = cell_to_pixel(cell)
+                    if in_view(pixel):
+                        PARTICLES.burst(pixel[0] + BLOCK_SIZE // 2, pixel[1] + BLOCK_SIZE // 2, 2,
+                                        arena_color(snake_id), speed=4.0, life=30, radius=5.0)
+            if not me.alive:
+                sound_game_over.play()
+                play_flash_effect()
+                play_death_burst(cells_to_pixels(me.body), None, None, me.score, high_score)
+                record_round(me.score)
+                return me.score
+            if not me.grew:
+                emit_trail(cell_to_pixel(tail))
+            # Giữ đủ số rắn: slot của rắn chết được dùng lại (không bao giờ là
+            # slot của người chơi vì người chơi còn sống).
+            for _ in range(ARENA_SNAKES - len(arena.alive_snakes)):
+                if arena.spawn_snake() is None:
+                    break
+
+        groups = view_arena(arena, player, scheduler.alpha)
+        SESSION_STATS['dropped_ticks'] += scheduler.dropped
+        SESSION_STATS['late_ticks'] += scheduler.late
+        scheduler.dropped = scheduler.late = 0
+        draw_arena_frame(arena, groups, scheduler.alpha, arena.snakes[player].score, high_score)
+
+# --- NETWORK ---
+# --host [PORT]: chạy server đấu trường (net.py) trong luồng nền rồi vào
+# trận như một client; --join HOST:PORT vào server của người khác. Client
+# đọc socket không chặn mỗi khung, dựng lại trạng thái từ delta của server
+# (ClientWorld) và vẽ như --arena; nội suy theo thời gian kể từ delta cuối,
+# giống scheduler.alpha ở chế độ chơi đơn.
+NET_ADDRESS = None
+NET_DEFAULT_PLAYERS = 8 # Cỡ bàn cho server --host khi không có --arena
+
+def parse_address(text):
+    host, _, port = text.rpartition(':')
+    try:
+        return host or NET_HOST, int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected HOST:PORT, got '{text}'")
+
+def host_server(port):
+    players = ARENA_SNAKES or NET_DEFAULT_PLAYERS
+    size = BOARD_SIZE or arena_size(players, *VIEW_GRID_SIZE)
+    return start_server_thread(NET_HOST, port, width=size[0], height=size[1],
+                               bots=max(0, ARENA_SNAKES - 1), food_count=arena_food_count(players),
+                               rate=BASE_SPEED)
+
+def net_loop(high_score, address):
+    global PULSE_COUNTER, CAMERA
+    try:
+        sock = socket.create_connection(address, timeout=3)
+    except OSError as e:
+        print(f"Warning: Could not connect to {address[0]}:{address[1]}. Error: {e}")
+        return 0
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setblocking(False)
+
+    def send(message):
+        try:
+            sock.sendall(encode(message))
+        except OSError:
+            pass
+
+    world = ClientWorld()
+    send({'t': 'join'})
+    player = None
+    score = 0
+    last_delta = time.perf_counter()
+    CAMERA = None
+    PARTICLES.clear()
+    request_full_redraw()
+    frame_times = SESSION_STATS['frame_times']
+
+    try:
+        while True:
+            dt = clock.tick(TARGET_FPS) / 1000.0
+            frame_times.add(dt)
+            PULSE_COUNTER += 1
+
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    quit_game()
+                elif event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_F11:
+                        toggle_fullscreen()
+                    if event.key == pygame.K_F3:
+                        toggle_dirty_rects()
+                    if event.key in TURN_KEYS and player is not None:
+                        send({'t': 'turn', 'd': TURN_KEYS[event.key]})
+                elif event.type == pygame.VIDEORESIZE:
+                    request_full_redraw()
+
+            # Trận không dừng theo người chơi: không có phím tạm dừng.
+            # Giữ đối tượng rắn trước khi áp delta: slot của rắn chết có thể
+            # được dùng lại cho rắn mới ngay trong cùng delta.
+            # Đang chờ ảnh 'full' sau khi lỡ delta: bản sao cũ có thể chưa có rắn này.
+            me = world.arena.snakes[player] if player is not None and not world.waiting else None
+            tail = me.tail if me is not None else None
+            messages = []
+            while True:
+                try:
+                    data = sock.recv(65536)
+                except BlockingIOError:
+                    break
+                except OSError:
+                    data = b''
+                if not data:
+                    print("Warning: Lost connection to server")
+                    return score
+                messages += world.feed(data)
+            if world.want_full:
+                world.want_full = False
+                send({'t': 'full'})
+
+            for message in messages:
+                if message['t'] == 'you':
+                    player = world.player
+                if message['t'] != 'd':
+                    continue
+                last_delta = time.perf_counter()
+                SESSION_STATS['ticks'] += 1
+                moves = message['m']
+                for i in range(0, len(moves), 4):
+                    if moves[i + 3] and CAMERA is not None:
+                        pixel = cell_to_pixel((moves[i + 1], moves[i + 2]))
+                        if moves[i] == player:
+                            sound_eat.play()
+                        if in_view(pixel):
+                            emit_eat_effect(pixel, False)
+            if me is None:
+                if player is not None and world.player is None:
+                    # Rắn chết trong các delta bị lỡ (biết được khi nhận ảnh 'full').
+                    record_round(score)
+                    return score
+                if player is not None:
+                    request_full_redraw()
+                continue
+            if CAMERA is None:
+                setup_camera(world.width, world.height, me.head)
+            if not me.alive:
+                sound_game_over.play()
+                play_flash_effect()
+                play_death_burst(cells_to_pixels(me.body), None, None, me.score, high_score)
+                record_round(me.score)
+                return me.score
+            score = me.score
+            if messages and not me.grew and tail != me.tail:
+                emit_trail(cell_to_pixel(tail))
+
+            t = min(1.0, (time.perf_counter() - last_delta) / world.step_time)
+            groups = view_arena(world.arena, player, t)
+            draw_arena_frame(world.arena, groups, t, score, high_score)
+    finally:
+        sock.close()
+
+def game_over_screen(score, high_score, won=False):
     global screen
 
-    lose_text_obj = font_game_over.render("LOSE", True, COLOR_GAME_OVER)
-    lose_pos = (GAME_WIDTH / 2 - lose_text_obj.get_width() / 2, GAME_HEIGHT * 0.1)
+    title = "WIN" if won else "LOSE"
+    title_color = COLOR_WIN if won else COLOR_GAME_OVER
+    title_w = get_font_obj(FONT_GAME_OVER_SIZE).size(title)[0]
+    title_pos = (GAME_WIDTH / 2 - title_w / 2, GAME_HEIGHT * 0.1)
 
-    score_text_obj = font_button.render(f"Your Score: {score}", True, COLOR_SCORE_TEXT)
-    score_pos = (GAME_WIDTH / 2 - score_text_obj.get_width() / 2, GAME_HEIGHT * 0.35)
+    score_w = get_font_obj(FONT_BUTTON_SIZE).size(f"Your Score: {score}")[0]
+    score_pos = (GAME_WIDTH / 2 - score_w / 2, GAME_HEIGHT * 0.35)
 
-    high_score_text_obj = font_button.render(f"High Score: {high_score}", True, COLOR_SCORE_TEXT)
-    high_score_pos = (GAME_WIDTH / 2 - high_score_text_obj.get_width() / 2, GAME_HEIGHT * 0.45)
+    high_score_w = get_font_obj(FONT_BUTTON_SIZE).size(f"High Score: {high_score}")[0]
+    high_score_pos = (GAME_WIDTH / 2 - high_score_w / 2, GAME_HEIGHT * 0.45)
 
     btn_w = 500
     btn_h = 70
@@ -644,50 +1778,52 @@ def game_over_screen(score, high_score):
     btn_high_scores = pygame.Rect(btn_x, btn_y_start + btn_h + btn_spacing, btn_w, btn_h)
     btn_home = pygame.Rect(btn_x, btn_y_start + 2 * (btn_h + btn_spacing), btn_w, btn_h)
     
+    buttons = (btn_play_again, btn_high_scores, btn_home)
+    drawn_state = None
+
     while True:
+        state = screen_state(buttons)
+        if state != drawn_state:
+            drawn_state = state
+            lose_bg_img = None if won else ASSETS.get("background_lose")
+            if lose_bg_img:
+                game_canvas.blit(lose_bg_img, (0, 0))
+            else:
+                draw_checkerboard_bg()
+
+            draw_text_with_outline(game_canvas, title, get_font_obj(FONT_GAME_OVER_SIZE),
+                                   title_pos, title_color, COLOR_OUTLINE_DARK, 4)
+
+            draw_text_with_outline(game_canvas, f"Your Score: {score}", get_font_obj(FONT_BUTTON_SIZE),
+                                   score_pos, COLOR_SCORE_TEXT, COLOR_OUTLINE_LIGHT, 2)
+            draw_text_with_outline(game_canvas, f"High Score: {high_score}", get_font_obj(FONT_BUTTON_SIZE),
+                                   high_score_pos, COLOR_SCORE_TEXT, COLOR_OUTLINE_LIGHT, 2)
+            draw_button("Play Again", btn_play_again.x, btn_play_again.y, btn_play_again.w, btn_play_again.h,
+                        COLOR_BUTTON_PLAY, COLOR_WHITE)
+            draw_button("High Scores", btn_high_scores.x, btn_high_scores.y, btn_high_scores.w, btn_high_scores.h,
+                        COLOR_BUTTON_OTHER, COLOR_WHITE)
+            draw_button("Home", btn_home.x, btn_home.y, btn_home.w, btn_home.h,
+                        COLOR_BUTTON_OTHER, COLOR_WHITE)
+
+            draw_to_screen(game_canvas)
+
         clicked = False
-        for event in pygame.event.get():
+        for event in wait_for_events():
             if event.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
+                quit_game()
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:
                     clicked = True
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_F11:
                     toggle_fullscreen() # Cho phép F11
-
-        lose_bg_img = ASSETS.get("background_lose")
-        if lose_bg_img:
-            game_canvas.blit(lose_bg_img, (0, 0))
-        else:
-            draw_checkerboard_bg() 
-
-        draw_text_with_outline(game_canvas, "LOSE", font_game_over,
-                               lose_pos, COLOR_GAME_OVER, COLOR_OUTLINE_DARK, 4)
-        
-        draw_text_with_outline(game_canvas, f"Your Score: {score}", font_button,
-                               score_pos, COLOR_SCORE_TEXT, COLOR_OUTLINE_LIGHT, 2)
-        draw_text_with_outline(game_canvas, f"High Score: {high_score}", font_button,
-                               high_score_pos, COLOR_SCORE_TEXT, COLOR_OUTLINE_LIGHT, 2)
-        draw_button("Play Again", btn_play_again.x, btn_play_again.y, btn_play_again.w, btn_play_again.h,
-                    COLOR_BUTTON_PLAY, COLOR_WHITE)
-        draw_button("High Scores", btn_high_scores.x, btn_high_scores.y, btn_high_scores.w, btn_high_scores.h,
-                    COLOR_BUTTON_OTHER, COLOR_WHITE)
-        draw_button("Home", btn_home.x, btn_home.y, btn_home.w, btn_home.h,
-                    COLOR_BUTTON_OTHER, COLOR_WHITE)
-
-        draw_to_screen(game_canvas)
-
+            if event.type in REDRAW_EVENTS:
+                drawn_state = None
 
         if clicked:
 
-            mouse_x, mouse_y = pygame.mouse.get_pos()
-            win_w, win_h = screen.get_size()
-            if win_w == 0 or win_h == 0: continue
-            
-            canvas_x = mouse_x * (GAME_WIDTH / win_w)
-            canvas_y = mouse_y * (GAME_HEIGHT / win_h)
-            
+            canvas_x, canvas_y = get_canvas_mouse_pos()
+
             if btn_play_again.collidepoint((canvas_x, canvas_y)):
                 return "PLAY_AGAIN" 
                 
@@ -695,19 +1831,29 @@ def game_over_screen(score, high_score):
                 return "HIGH_SCORES" 
                 
             if btn_home.collidepoint((canvas_x, canvas_y)):
-                pygame.quit() 
-                sys.exit()
+                quit_game()
 
-        clock.tick(60)
+def format_top_row(rank, row):
+    score, _, duration, played_at = row
+    minutes, seconds = divmod(int(duration), 60)
+    return f"{rank}.  {score:>5}   {minutes}:{seconds:02d}   {time.strftime('%d/%m/%Y', time.localtime(played_at))}"
 
-def high_score_screen(high_score):
+def high_score_screen(high_score, top=()):
     global screen
     
-    title_text_obj = font_title.render("High Score", True, COLOR_SCORE_TEXT)
-    title_pos = (GAME_WIDTH / 2 - title_text_obj.get_width() / 2, GAME_HEIGHT * 0.2)
-    
-    score_text_obj = font_game_over.render(f"{high_score}", True, COLOR_FOOD_GOLDEN)
-    score_pos = (GAME_WIDTH / 2 - score_text_obj.get_width() / 2, GAME_HEIGHT * 0.4)
+    title_w = get_font_obj(FONT_TITLE_SIZE).size("High Score")[0]
+    title_pos = (GAME_WIDTH / 2 - title_w / 2, GAME_HEIGHT * (0.12 if top else 0.2))
+
+    # Bảng top N (điểm, thời lượng, ngày) của chế độ đang chơi
+    top_lines = [format_top_row(rank, row) for rank, row in enumerate(top, 1)]
+    top_font = get_font_obj(FONT_INFO_SIZE)
+    top_w = max((top_font.size(line)[0] for line in top_lines), default=0)
+    top_x = GAME_WIDTH / 2 - top_w / 2
+    top_y = GAME_HEIGHT * 0.32
+    top_line_h = top_font.get_linesize() + 12
+
+    score_w = get_font_obj(FONT_GAME_OVER_SIZE).size(f"{high_score}")[0]
+    score_pos = (GAME_WIDTH / 2 - score_w / 2, GAME_HEIGHT * 0.4)
 
     btn_w = 300
     btn_h = 70
@@ -715,65 +1861,167 @@ def high_score_screen(high_score):
     btn_y = GAME_HEIGHT * 0.75
     btn_back_rect = pygame.Rect(btn_x, btn_y, btn_w, btn_h)
 
+    drawn_state = None
+
     while True:
+        # --- Vẽ (chỉ khi hover/cửa sổ đổi) ---
+        state = screen_state((btn_back_rect,))
+        if state != drawn_state:
+            drawn_state = state
+            draw_checkerboard_bg()
+
+            # Vẽ tiêu đề
+            draw_text_with_outline(game_canvas, "High Score", get_font_obj(FONT_TITLE_SIZE),
+                                   title_pos, COLOR_SCORE_TEXT, COLOR_OUTLINE_LIGHT, 3)
+
+            # Vẽ điểm số (hoặc bảng top N nếu đã có ván nào được lưu)
+            if top_lines:
+                for i, line in enumerate(top_lines):
+                    color = COLOR_FOOD_GOLDEN if i == 0 else COLOR_WHITE
+                    draw_text_with_outline(game_canvas, line, top_font, (top_x, top_y + i * top_line_h),
+                                           color, COLOR_OUTLINE_DARK, 2)
+            else:
+                draw_text_with_outline(game_canvas, f"{high_score}", get_font_obj(FONT_GAME_OVER_SIZE),
+                                       score_pos, COLOR_FOOD_GOLDEN, COLOR_OUTLINE_DARK, 4)
+
+            # Vẽ nút "Back"
+            draw_button("Back", btn_back_rect.x, btn_back_rect.y, btn_back_rect.w, btn_back_rect.h,
+                        COLOR_BUTTON_OTHER, COLOR_WHITE)
+
+            draw_to_screen(game_canvas)
+
         clicked = False
-        for event in pygame.event.get():
+        for event in wait_for_events():
             if event.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
+                quit_game()
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:
                     clicked = True
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_F11:
                     toggle_fullscreen()
-
-        # --- Vẽ ---
-        draw_checkerboard_bg()
-        
-        # Vẽ tiêu đề
-        draw_text_with_outline(game_canvas, "High Score", font_title,
-                               title_pos, COLOR_SCORE_TEXT, COLOR_OUTLINE_LIGHT, 3)
-        
-        # Vẽ điểm số
-        draw_text_with_outline(game_canvas, f"{high_score}", font_game_over,
-                               score_pos, COLOR_FOOD_GOLDEN, COLOR_OUTLINE_DARK, 4)
-        
-        # Vẽ nút "Back"
-        draw_button("Back", btn_back_rect.x, btn_back_rect.y, btn_back_rect.w, btn_back_rect.h,
-                    COLOR_BUTTON_OTHER, COLOR_WHITE)
-        
-        draw_to_screen(game_canvas)
+            if event.type in REDRAW_EVENTS:
+                drawn_state = None
 
         # --- Xử lý Click ---
         if clicked:
-            mouse_x, mouse_y = pygame.mouse.get_pos()
-            win_w, win_h = screen.get_size()
-            if win_w == 0 or win_h == 0: continue
-            
-            canvas_x = mouse_x * (GAME_WIDTH / win_w)
-            canvas_y = mouse_y * (GAME_HEIGHT / win_h)
+            canvas_x, canvas_y = get_canvas_mouse_pos()
 
             if btn_back_rect.collidepoint((canvas_x, canvas_y)):
                 return "GAME_OVER" # Quay lại màn hình thua
 
-        clock.tick(60)
-
 def main():
+    global DIRTY_RECTS_ENABLED, SCALE_MODE, STARTUP_TRACE_ENABLED, IPC_ENABLED, RECORD_DIR, PROFILE_OVERLAY_VISIBLE
+    global AUTOPILOT_ENABLED, BOARD_SIZE, ARENA_SNAKES, NET_ADDRESS
     parser = argparse.ArgumentParser(description='Snake Game (Pygame instance)')
     parser.add_argument('--wrap', action='store_true', help='Enable special mode')
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help='Only redraw and present changed regions (toggle in game with F3)')
+    parser.add_argument('--scale', choices=SCALE_MODES, default=SCALE_MODE,
+                        help='How the 1280x720 canvas is scaled to the window')
+    parser.add_argument('--startup-trace', action='store_true',
+                        help='Print a per-phase timing breakdown up to the first frame')
+    parser.add_argument('--profile', nargs='?', const='profile.csv', metavar='CSV',
+                        help='Time each frame stage (overlay on F2) and dump per-frame timings to CSV on exit')
+    parser.add_argument('--worker', action='store_true',
+                        help='Stay resident and run rounds on request from the launcher (stdin/stdout)')
+    parser.add_argument('--ipc', action='store_true',
+                        help='Report session stats to the launcher on stdout before exiting')
+    parser.add_argument('--record', nargs='?', const='replays', metavar='DIR',
+                        help='Save a replay of every round to DIR (default: replays)')
+    parser.add_argument('--replay', metavar='FILE', help='Play back a recorded replay and check its score')
+    parser.add_argument('--headless', action='store_true',
+                        help='With --replay: verify as fast as possible without opening a window')
+    parser.add_argument('--board', type=parse_board_size, metavar='WxH',
+                        help='Play on a larger board (e.g. 500x500) with a camera that follows the snake')
+    parser.add_argument('--autopilot', action='store_true',
+                        help='Let the built-in AI play (demo / attract mode); rounds restart automatically')
+    parser.add_argument('--arena', type=int, metavar='N',
+                        help='Local arena: you plus N-1 AI snakes on a shared board')
+    parser.add_argument('--host', type=int, nargs='?', const=NET_PORT, metavar='PORT',
+                        help='Host a networked arena on localhost and join it (with --arena N: N-1 AI snakes)')
+    parser.add_argument('--join', type=parse_address, metavar='HOST:PORT',
+                        help='Join a networked arena')
+    parser.add_argument('--telemetry', nargs='?', const='telemetry', metavar='DIR',
+                        help='Log gameplay events and per-round stats to DIR as gzipped JSONL (default: telemetry)')
+    parser.add_argument('--telemetry-queue', type=int, default=QUEUE_SIZE, metavar='N',
+                        help='Telemetry queue capacity before events are dropped')
+    parser.add_argument('--telemetry-policy', choices=DROP_POLICIES, default=DROP_POLICIES[0],
+                        help='Which events to drop when the telemetry queue is full')
     args = parser.parse_args()
 
     wrap_mode = args.wrap
+    DIRTY_RECTS_ENABLED = args.dirty_rects
+    SCALE_MODE = args.scale
+    STARTUP_TRACE_ENABLED = args.startup_trace
+    IPC_ENABLED = args.ipc
+    RECORD_DIR = args.record
+    AUTOPILOT_ENABLED = args.autopilot
+    BOARD_SIZE = args.board
+    ARENA_SNAKES = max(1, args.arena) if args.arena else 0
+    if args.profile:
+        enable_profiler(args.profile)
+        PROFILE_OVERLAY_VISIBLE = True
+    if args.telemetry:
+        enable_telemetry(args.telemetry, max(1, args.telemetry_queue), args.telemetry_policy)
+    startup_mark('parse args')
+
+    if args.replay:
+        run_replay(args.replay, args.headless)
+        return
+
+    if args.worker:
+        run_worker()
+        return
+
+    init_display()
+    resolve_font_path()
+    startup_mark('resolve font')
 
     load_assets()
-    
+    startup_mark('load assets')
+
+    if args.host is not None:
+        port = host_server(args.host)
+        if port is None:
+            sys.exit(1)
+        NET_ADDRESS = (NET_HOST, port)
+        print(f"Hosting arena on {NET_HOST}:{port}")
+    elif args.join:
+        NET_ADDRESS = args.join
+
+    run_session(wrap_mode)
+
+def run_replay(path, headless):
+    try:
+        replay = replay_io.load_replay(path)
+    except replay_io.ReplayError as e:
+        print(e)
+        sys.exit(1)
+    if headless:
+        sys.exit(0 if replay_io.verify_files([path]) else 1)
+
+    init_display()
+    load_assets()
+    pygame.display.set_caption('Snake Game (Replay)')
+    game_loop(0, replay['wrap'], replay=replay)
+    pygame.quit()
+    # Kết quả chiếu lại được kiểm tra bằng engine chạy ẩn cùng replay.
+    sys.exit(0 if replay_io.verify_files([path]) else 1)
+
+def run_session(wrap_mode):
+    global SESSION_STATS
     try:
         pygame.mixer.music.set_volume(0.4)
         pygame.mixer.music.play(loops=-1)
     except Exception as e:
         print(f"Warning: Không thể phát nhạc nền. Error: {e}")
         
-    high_score = load_high_score()
+    mode = current_mode(wrap_mode)
+    high_score = load_high_score(mode)
+    SESSION_STATS = new_session_stats(high_score)
+    if TELEMETRY:
+        TELEMETRY.emit('session_start', mode=mode, high_score=high_score, pid=os.getpid())
     
     game_state = "PLAYING" # Bắt đầu game luôn
     final_score = 0
@@ -782,12 +2030,25 @@ def main():
         
         if game_state == "PLAYING":
             # Chạy game
-            final_score = game_loop(high_score, wrap_mode)
-            
-            # Cập nhật high score nếu cần
+            round_start = time.perf_counter()
+            round_ticks = SESSION_STATS['ticks']
+            won = False
+            if NET_ADDRESS:
+                final_score = net_loop(high_score, NET_ADDRESS)
+            elif ARENA_SNAKES:
+                final_score = arena_loop(high_score)
+            else:
+                final_score, won = game_loop(high_score, wrap_mode)
+                if AUTOPILOT_ENABLED:
+                    # Attract mode: điểm của AI không vào bảng điểm, chơi lại ngay.
+                    continue
+
+            # Mỗi ván một dòng trong bảng điểm (thời lượng tính cả lúc tạm dừng)
+            save_round_score(mode, final_score, SESSION_STATS['ticks'] - round_ticks,
+                             time.perf_counter() - round_start)
             if final_score > high_score:
                 high_score = final_score
-                save_high_score(high_score)
+                SESSION_STATS['high_score'] = high_score
                 
             # Tự động chuyển trạng thái
             game_state = "GAME_OVER" 
@@ -795,7 +2056,7 @@ def main():
         elif game_state == "GAME_OVER":
             # Hiển thị màn hình thua và lấy lựa chọn
             # Hàm này sẽ chạy 1 vòng lặp riêng cho đến khi có click
-            next_action = game_over_screen(final_score, high_score)
+            next_action = game_over_screen(final_score, high_score, won)
             
             if next_action == "PLAY_AGAIN":
                 game_state = "PLAYING" # Quay lại chơi
@@ -806,11 +2067,90 @@ def main():
         elif game_state == "HIGH_SCORES":
             # Hiển thị màn hình điểm cao
             # Hàm này cũng chạy 1 vòng lặp riêng
-            next_action = high_score_screen(high_score)
+            next_action = high_score_screen(high_score, load_top_scores(mode))
             
             if next_action == "GAME_OVER":
                 game_state = "GAME_OVER" # Quay lại màn hình thua
 
+# --- WARM WORKER ---
+# Với --worker, game.py khởi tạo pygame, font và asset một lần với cửa sổ
+# ẩn, rồi chờ lệnh từ launcher qua stdin (mỗi dòng một JSON). Mỗi lệnh
+# "start" chạy một phiên chơi; nút Home hoặc đóng cửa sổ chỉ kết thúc
+# phiên (ẩn cửa sổ) thay vì thoát tiến trình. Tin nhắn gửi về launcher
+# là các dòng stdout bắt đầu bằng IPC_PREFIX. Khi chạy từng ván (--ipc),
+# game cũng gửi session_end trước khi thoát.
+IPC_PREFIX = "SNAKE_IPC "
+WORKER_MODE = False
+IPC_ENABLED = False
+
+class SessionExit(Exception):
+    pass
+
+def quit_game():
+    if WORKER_MODE:
+        raise SessionExit()
+    summary = session_summary()
+    emit_session_end(summary)
+    if IPC_ENABLED:
+        send_ipc("session_end", **summary)
+    pygame.quit(); sys.exit()
+
+def send_ipc(event, **data):
+    data['event'] = event
+    sys.stdout.write(IPC_PREFIX + json.dumps(data) + "\n")
+    sys.stdout.flush()
+
+def set_window_visible(visible):
+    global screen, fullscreen
+    fullscreen = False
+    flags = pygame.RESIZABLE | (pygame.SHOWN if visible else pygame.HIDDEN)
+    screen = pygame.display.set_mode((DEFAULT_WINDOW_WIDTH, DEFAULT_WINDOW_HEIGHT), flags)
+    SCALE_LAYOUT.clear()
+    request_full_redraw()
+
+def run_worker():
+    global WORKER_MODE, IPC_ENABLED
+    WORKER_MODE = True
+    IPC_ENABLED = True
+    init_display(hidden=True)
+    resolve_font_path()
+    for size in (FONT_TITLE_SIZE, FONT_BUTTON_SIZE, FONT_INFO_SIZE,
+                 FONT_SCORE_SIZE, FONT_GAME_OVER_SIZE, FONT_PAUSE_SIZE):
+        get_font_obj(size)
+    load_assets()
+    get_checkerboard_layer()
+    send_ipc("ready")
+
+    for line in sys.stdin:
+        try:
+            command = json.loads(line)
+        except ValueError:
+            print("Warning: Bad worker command:", line.strip())
+            continue
+        cmd = command.get('cmd')
+        if cmd == 'quit':
+            break
+        if cmd != 'start':
+            print("Warning: Unknown worker command:", cmd)
+            continue
+
+        set_window_visible(True)
+        pygame.event.clear()
+        try:
+            run_session(bool(command.get('wrap', False)))
+        except SessionExit:
+            pass
+        try:
+            pygame.mixer.music.stop()
+        except Exception:
+            pass
+        set_window_visible(False)
+        summary = session_summary()
+        emit_session_end(summary)
+        send_ipc("session_end", **summary)
+
+    pygame.quit()
+
 
 # (Đảm bảo dòng này vẫn ở cuối cùng)
 if __name__ == '__main__':
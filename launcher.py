@@ -1,6 +1,7 @@
 import sys
-import subprocess
 import os
+import json
+import sqlite3
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout,
     QPushButton, QLabel, QCheckBox, QSpacerItem,
@@ -11,7 +12,8 @@ from PySide6.QtGui import (
     QFont, QPalette, QColor, QBrush, QPixmap, QIcon, QLinearGradient,
     QFontDatabase  
 )
-from PySide6.QtCore import Qt, QTimer, QSize
+from PySide6.QtCore import Qt, QTimer, QSize, QProcess
+from leaderboard import open_leaderboard, game_mode
 if sys.platform == "win32":
     try:
         sys.stdout.reconfigure(encoding="utf-8")
@@ -27,10 +29,14 @@ if sys.platform == "win32":
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-HIGHSCORE_FILE = os.path.join(SCRIPT_DIR, "highscore.txt")
 GAME_SCRIPT_FILE = os.path.join(SCRIPT_DIR, "game.py")
 BACKGROUND_IMAGE_FILE = os.path.join(SCRIPT_DIR, "background.png")
 
+# Tiến trình game "ấm" (game.py --worker) được khởi chạy sẵn: pygame, font
+# và asset đã nạp xong, launcher chỉ gửi lệnh JSON qua stdin để bắt đầu ván.
+IPC_PREFIX = "SNAKE_IPC "
+WORKER_MAX_FAILURES = 3
+
 
 CUSTOM_FONT_FILENAME = "font.ttf"
 CUSTOM_FONT_PATH = os.path.join(SCRIPT_DIR, CUSTOM_FONT_FILENAME)
@@ -70,13 +76,79 @@ class SnakeLauncher(QMainWindow):
     def __init__(self, font_family): # Thêm 'font_family' làm tham số
         super().__init__()
         self.game_process = None
-        self.check_process_timer = QTimer(self)
-        self.check_process_timer.timeout.connect(self.check_game_status)
-        
+        self.session_reported = False
+
+        self.worker = None
+        self.worker_ready = False
+        self.worker_in_session = False
+        self.worker_failures = 0
+        self.closing = False
+        # Đọc cùng bảng điểm SQLite với game (WAL: đọc được khi game đang ghi).
+        self.leaderboard = open_leaderboard(SCRIPT_DIR)
+
         self.font_family = font_family 
         
         self.init_ui()
         self.update_background() 
+        self.spawn_worker()
+
+    def spawn_worker(self):
+        if self.closing or not os.path.exists(GAME_SCRIPT_FILE):
+            return
+        self.worker_ready = False
+        self.worker = QProcess(self)
+        self.worker.setProgram(sys.executable)
+        self.worker.setArguments([GAME_SCRIPT_FILE, '--worker'])
+        self.worker.setWorkingDirectory(SCRIPT_DIR)
+        self.worker.setProcessChannelMode(QProcess.ForwardedErrorChannel)
+        worker = self.worker
+        worker.readyReadStandardOutput.connect(lambda: self.read_game_output(worker))
+        worker.finished.connect(self.on_worker_finished)
+        worker.start()
+
+    def send_worker_command(self, **command):
+        self.worker.write((json.dumps(command) + "\n").encode("utf-8"))
+
+    def read_game_output(self, process):
+        # stdout của game: dòng có IPC_PREFIX là tin nhắn JSON, còn lại in ra.
+        while process.canReadLine():
+            line = bytes(process.readLine()).decode("utf-8", errors="replace").rstrip()
+            if not line.startswith(IPC_PREFIX):
+                print(line)
+                continue
+            try:
+                message = json.loads(line[len(IPC_PREFIX):])
+            except ValueError:
+                print(f"Lỗi: Tin nhắn không hợp lệ từ game: {line}")
+                continue
+            self.handle_game_message(message)
+
+    def handle_game_message(self, message):
+        event = message.get('event')
+        if event == 'ready':
+            self.worker_ready = True
+            self.worker_failures = 0
+        elif event == 'session_end':
+            self.worker_in_session = False
+            self.session_reported = True
+            self.on_game_finished(message)
+
+    def on_worker_finished(self, exit_code, exit_status):
+        was_in_session = self.worker_in_session
+        was_ready = self.worker_ready
+        self.worker_ready = False
+        self.worker_in_session = False
+        self.worker.deleteLater()
+        self.worker = None
+        if was_in_session:
+            self.on_game_finished(None)
+        if self.closing:
+            return
+        self.worker_failures = 0 if was_ready else self.worker_failures + 1
+        if self.worker_failures < WORKER_MAX_FAILURES:
+            QTimer.singleShot(1000, self.spawn_worker)
+        else:
+            print("Lưu ý: Tiến trình game nền liên tục lỗi, chuyển sang khởi chạy từng ván.")
 
     def add_shadow_effect(self, widget, blur_radius=15, offset_y=3):
         shadow = QGraphicsDropShadowEffect(self)
@@ -104,7 +176,13 @@ class SnakeLauncher(QMainWindow):
         self.high_score_label.setObjectName("HighScoreLabel")
         self.high_score_label.setAlignment(Qt.AlignCenter)
         self.add_shadow_effect(self.high_score_label, blur_radius=10, offset_y=2)
-        self.update_high_score()
+
+        # --- Thống kê phiên vừa chơi ---
+        self.session_stats_label = QLabel()
+        self.session_stats_label.setObjectName("SessionStatsLabel")
+        self.session_stats_label.setAlignment(Qt.AlignCenter)
+        self.add_shadow_effect(self.session_stats_label, blur_radius=10, offset_y=2)
+        self.session_stats_label.hide()
 
         # --- Nút Bắt đầu (Liquid Glass) ---
         self.start_button = QPushButton("START GAME")
@@ -119,12 +197,16 @@ class SnakeLauncher(QMainWindow):
         self.wrap_checkbox = QCheckBox("Special Mode")
         self.wrap_checkbox.setObjectName("WrapCheckbox")
         self.add_shadow_effect(self.wrap_checkbox, blur_radius=10, offset_y=2)
+        # Điểm cao được lưu riêng cho từng chế độ.
+        self.wrap_checkbox.toggled.connect(lambda: self.update_high_score())
+        self.update_high_score()
 
         # --- Thêm các widget vào layout ---
         main_layout.addSpacerItem(QSpacerItem(20, 20, QSizePolicy.Minimum, QSizePolicy.Expanding))
         main_layout.addWidget(self.title_label)
         main_layout.addSpacerItem(QSpacerItem(20, 20, QSizePolicy.Minimum, QSizePolicy.Fixed))
         main_layout.addWidget(self.high_score_label)
+        main_layout.addWidget(self.session_stats_label)
         main_layout.addSpacerItem(QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Fixed))
         main_layout.addWidget(self.start_button)
         main_layout.addSpacerItem(QSpacerItem(20, 20, QSizePolicy.Minimum, QSizePolicy.Fixed))
@@ -140,6 +222,7 @@ class SnakeLauncher(QMainWindow):
 
         title_font_size = 80
         ui_font_size = 18
+        stats_font_size = 14
         checkbox_font_size = 20
         button_font_size = 22
 
@@ -167,6 +250,14 @@ class SnakeLauncher(QMainWindow):
                 border-radius: 5px;
             }}
 
+            #SessionStatsLabel {{
+                font-family: {font_family_default};
+                font-size: {stats_font_size}px;
+                font-weight: bold;
+                color: #FFFFFF;
+                background-color: transparent;
+            }}
+
             #StartButton {{
                 font-family: {font_family_default}; /* <-- Sử dụng font từ tham số */
                 font-size: {button_font_size}px;
@@ -213,16 +304,33 @@ class SnakeLauncher(QMainWindow):
 
 
     def load_high_score(self):
+        if self.leaderboard is None:
+            return 0
         try:
-            with open(HIGHSCORE_FILE, "r", encoding="utf-8") as f:
-                return int(f.read())
-        except (FileNotFoundError, ValueError):
+            return self.leaderboard.high_score(game_mode(self.wrap_checkbox.isChecked()))
+        except sqlite3.Error as e:
+            print(f"Lỗi: Không đọc được bảng điểm: {e}")
             return 0
 
-    def update_high_score(self):
-        score = self.load_high_score()
+    def update_high_score(self, score=None):
+        if score is None:
+            score = self.load_high_score()
         self.high_score_label.setText(f"HIGH SCORE: {score}")
 
+    def show_session_stats(self, stats):
+        minutes, seconds = divmod(int(stats.get('duration', 0)), 60)
+        frame_time = stats.get('frame_time', {})
+        input_latency = stats.get('input_latency', {})
+        self.session_stats_label.setText(
+            f"LAST SESSION: {stats.get('rounds', 0)} round(s) · best {stats.get('best_score', 0)} · "
+            f"final {stats.get('final_score', 0)} · {minutes}m {seconds:02d}s · {stats.get('ticks', 0)} ticks "
+            f"({stats.get('dropped_ticks', 0)} dropped, {stats.get('late_ticks', 0)} late)\n"
+            f"{frame_time.get('fps', 0)} FPS avg · frame p50 {frame_time.get('p50_ms', 0)} ms · "
+            f"p95 {frame_time.get('p95_ms', 0)} ms · max {frame_time.get('max_ms', 0)} ms\n"
+            f"{input_latency.get('turns', 0)} turns · input→screen p50 {input_latency.get('p50_ms', 0)} ms · "
+            f"p95 {input_latency.get('p95_ms', 0)} ms (from event poll)")
+        self.session_stats_label.show()
+
     def start_game(self):
         if not os.path.exists(GAME_SCRIPT_FILE):
             QMessageBox.critical(self, "Lỗi",
@@ -232,18 +340,32 @@ class SnakeLauncher(QMainWindow):
             return
 
         wrap_enabled = self.wrap_checkbox.isChecked()
-        command = [sys.executable, GAME_SCRIPT_FILE]
-        if wrap_enabled:
-            command.append('--wrap')
 
-        try:
-            self.game_process = subprocess.Popen(command)
-            self.start_button.setEnabled(False)
-            self.start_button.setText("GAME IS RUNNING...")
-            self.hide()
-            self.check_process_timer.start(1000)
-        except Exception as e:
-            QMessageBox.critical(self, "Lỗi", f"Không thể khởi chạy {os.path.basename(GAME_SCRIPT_FILE)}: {e}")
+        if self.worker is not None and self.worker_ready:
+            self.send_worker_command(cmd='start', wrap=wrap_enabled)
+            self.worker_in_session = True
+            self.set_game_running_ui()
+            return
+
+        arguments = [GAME_SCRIPT_FILE, '--ipc']
+        if wrap_enabled:
+            arguments.append('--wrap')
+
+        process = QProcess(self)
+        process.setProgram(sys.executable)
+        process.setArguments(arguments)
+        process.setWorkingDirectory(SCRIPT_DIR)
+        process.setProcessChannelMode(QProcess.ForwardedErrorChannel)
+        process.readyReadStandardOutput.connect(lambda: self.read_game_output(process))
+        process.finished.connect(self.on_game_process_finished)
+        process.start()
+        if not process.waitForStarted(5000):
+            QMessageBox.critical(self, "Lỗi", f"Không thể khởi chạy {os.path.basename(GAME_SCRIPT_FILE)}: {process.errorString()}")
+            process.deleteLater()
+            return
+        self.game_process = process
+        self.session_reported = False
+        self.set_game_running_ui()
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_F11:
@@ -274,14 +396,40 @@ class SnakeLauncher(QMainWindow):
             
         self.setPalette(palette)
 
-    def check_game_status(self):
-        if self.game_process and self.game_process.poll() is not None:
-            self.game_process = None
-            self.check_process_timer.stop()
-            self.start_button.setEnabled(True)
-            self.start_button.setText("START GAME")
+    def set_game_running_ui(self):
+        self.start_button.setEnabled(False)
+        self.start_button.setText("GAME IS RUNNING...")
+        self.hide()
+
+    def on_game_finished(self, stats):
+        self.start_button.setEnabled(True)
+        self.start_button.setText("START GAME")
+        if stats:
+            self.update_high_score(stats.get('high_score'))
+            self.show_session_stats(stats)
+        else:
             self.update_high_score()
-            self.show()
+        self.show()
+
+    def on_game_process_finished(self, exit_code, exit_status):
+        process = self.game_process
+        if process is None:
+            return
+        self.read_game_output(process)
+        self.game_process = None
+        process.deleteLater()
+        if not self.session_reported:
+            self.on_game_finished(None)
+
+    def closeEvent(self, event):
+        self.closing = True
+        if self.worker is not None:
+            if self.worker.state() == QProcess.Running:
+                self.send_worker_command(cmd='quit')
+                if not self.worker.waitForFinished(2000):
+                    self.worker.kill()
+                    self.worker.waitForFinished(1000)
+        super().closeEvent(event)
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
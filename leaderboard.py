@@ -0,0 +1,127 @@
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+# Bảng điểm (SQLite, chế độ WAL) thay cho highscore.txt.
+# - Mỗi ván là một dòng games(mode, score, ticks, duration, played_at),
+#   ghi trong một transaction: tiến trình chết giữa chừng không để lại
+#   file rỗng (highscore.txt cũ khi đó đọc ra 0) hay dòng dở dang.
+# - WAL: game, worker và launcher đọc được trong khi một tiến trình khác
+#   đang ghi; hai tiến trình cùng ghi thì tiến trình sau chờ (busy timeout)
+#   thay vì ghi đè điểm của nhau. synchronous=NORMAL: mất điện có thể mất
+#   ván cuối cùng nhưng không làm hỏng cơ sở dữ liệu.
+# - Chỉ mục (mode, score DESC, played_at): điểm cao nhất và top N chỉ đọc
+#   N mục đầu của chỉ mục, không quét bảng, nên vẫn nhanh sau hàng trăm
+#   nghìn ván.
+# - Lần mở đầu tiên, điểm trong highscore.txt (nếu có) được nhập vào mode
+#   'normal' (file cũ không phân biệt mode).
+
+LEADERBOARD_FILE = "leaderboard.db"
+LEGACY_HIGHSCORE_FILE = "highscore.txt"
+BUSY_TIMEOUT = 5.0
+SCHEMA_VERSION = 1
+TOP_LIMIT = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    mode TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    ticks INTEGER NOT NULL DEFAULT 0,
+    duration REAL NOT NULL DEFAULT 0,
+    played_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_mode_score ON games (mode, score DESC, played_at);
+"""
+
+
+def game_mode(wrap_mode, board_size=None):
+    # Bàn --board WxH xếp hạng riêng theo cỡ bàn, không chung với bàn cổ điển.
+    mode = 'wrap' if wrap_mode else 'normal'
+    if board_size is not None:
+        mode += f"-{board_size[0]}x{board_size[1]}"
+    return mode
+
+
+class Leaderboard:
+    def __init__(self, path, legacy_path=None):
+        self.path = path
+        # isolation_level=None: tự quản lý transaction bằng BEGIN/COMMIT.
+        self.db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        if self.db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self.create_schema(legacy_path)
+
+    @contextmanager
+    def transaction(self):
+        # BEGIN IMMEDIATE giữ khoá ghi ngay từ đầu, nên hai tiến trình cùng
+        # ghi sẽ xếp hàng theo busy timeout thay vì lỗi giữa transaction.
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield self.db
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        self.db.execute("COMMIT")
+
+    def create_schema(self, legacy_path):
+        with self.transaction() as db:
+            # Kiểm tra lại sau khi giữ khoá ghi: tiến trình khác có thể vừa tạo xong.
+            if db.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+                return
+            for statement in SCHEMA.split(';'):
+                if statement.strip():
+                    db.execute(statement)
+            legacy = read_legacy_high_score(legacy_path)
+            if legacy:
+                db.execute("INSERT INTO games (mode, score, played_at) VALUES ('normal', ?, ?)",
+                           (legacy, os.path.getmtime(legacy_path)))
+            db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def record(self, mode, score, ticks=0, duration=0.0, played_at=None):
+        self.record_many([(mode, score, ticks, duration, time.time() if played_at is None else played_at)])
+
+    def record_many(self, rows):
+        # rows: (mode, score, ticks, duration, played_at); một transaction cho cả lô.
+        with self.transaction() as db:
+            db.executemany("INSERT INTO games (mode, score, ticks, duration, played_at) VALUES (?, ?, ?, ?, ?)",
+                           rows)
+
+    def high_score(self, mode):
+        row = self.db.execute("SELECT score FROM games WHERE mode = ? ORDER BY score DESC LIMIT 1",
+                              (mode,)).fetchone()
+        return row[0] if row else 0
+
+    def top(self, mode, limit=TOP_LIMIT):
+        # [(score, ticks, duration, played_at)], điểm cao trước, bằng điểm thì ván sớm hơn trước.
+        return self.db.execute("SELECT score, ticks, duration, played_at FROM games WHERE mode = ? "
+                               "ORDER BY score DESC, played_at LIMIT ?", (mode, limit)).fetchall()
+
+    def count(self, mode):
+        return self.db.execute("SELECT COUNT(*) FROM games WHERE mode = ?", (mode,)).fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+
+def read_legacy_high_score(path):
+    if not path:
+        return 0
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return max(0, int(f.read()))
+    except (OSError, ValueError):
+        return 0
+
+
+def open_leaderboard(directory):
+    # None nếu không mở được (thư mục chỉ đọc, file hỏng...): game vẫn chơi
+    # được, chỉ không lưu điểm.
+    try:
+        return Leaderboard(os.path.join(directory, LEADERBOARD_FILE),
+                           os.path.join(directory, LEGACY_HIGHSCORE_FILE))
+    except sqlite3.Error as e:
+        print("Warning: Could not open leaderboard. Error:", e)
+        return None
@@ -0,0 +1,399 @@
+import asyncio
+import json
+import threading
+
+from arena import ArenaEngine, ArenaBot, arena_size, arena_food_count
+from profiler import percentile
+
+# Trận nhiều người qua mạng (không phụ thuộc pygame).
+# - Server (asyncio TCP) giữ ArenaEngine gốc và chạy tick theo lịch cố
+#   định; client chỉ gửi lệnh ('join', 'turn'). Mỗi dòng là một JSON.
+# - Khi kết nối, client nhận 'welcome' (cỡ bàn, tốc độ) và một ảnh 'full'
+#   của toàn bộ trạng thái. Sau đó mỗi tick chỉ có một delta 'd':
+#     m: [id, x, y, ăn, ...] đầu mới của mọi rắn còn sống (đuôi bị bỏ
+#        trừ khi ăn = 1; táo ở ô đầu mới bị ăn),
+#     x: [[id, nguyên nhân], ...] rắn chết hoặc rời trận,
+#     s: [[id, hướng, [x, y, ...]], ...] rắn mới (đầu -> đuôi),
+#     f: [x, y, ...] táo mới.
+#   Delta được mã hoá một lần rồi gửi cho mọi client, cỡ tỉ lệ với số rắn
+#   chứ không với tổng độ dài thân.
+# - ClientWorld dựng lại trạng thái vào một ArenaEngine bản sao (qua
+#   add_snake / advance_snake / ...), nên renderer và ArenaBot dùng được
+#   nguyên như đấu trường cục bộ. 'full' gửi lại giữa trận (client yêu cầu)
+#   được so với bản sao để phát hiện lệch trạng thái. Delta không nối tiếp
+#   tick của bản sao (bị mất hoặc sai thứ tự) không áp được: bỏ qua các delta
+#   tới khi nhận ảnh 'full' mới, client xin ngay khi thấy want_full.
+# - Client không đọc kịp (bộ đệm gửi > MAX_WRITE_BUFFER) bị ngắt thay vì
+#   làm phình bộ nhớ server; tick trễ hơn một bước bị bỏ, không chạy dồn.
+
+NET_HOST = '127.0.0.1'
+NET_PORT = 47800
+NET_TICK_RATE = 10
+MAX_WRITE_BUFFER = 256 * 1024
+
+
+def encode(message):
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode()
+
+
+def flatten(cells):
+    return [c for cell in cells for c in cell]
+
+
+def pairs(values):
+    return [(values[i], values[i + 1]) for i in range(0, len(values), 2)]
+
+
+def snapshot(arena):
+    width = arena.grid_width
+    return {'t': 'full', 'k': arena.ticks,
+            'snakes': [[s.id, s.direction, flatten(s.body)] for s in arena.alive_snakes],
+            'food': flatten((index % width, index // width) for index in arena.food_cells)}
+
+
+def world_signature(arena):
+    return (sorted((s.id, tuple(s.body)) for s in arena.alive_snakes), sorted(arena.food_cells))
+
+
+# --- SERVER ---
+class NetServer:
+    def __init__(self, width, height, bots=0, food_count=None, rate=NET_TICK_RATE, seed=None):
+        self.arena = ArenaEngine(width, height, food_count or arena_food_count(max(1, bots)),
+                                 seed=seed, base_speed=rate)
+        self.bot = ArenaBot(seed)
+        self.bots = bots
+        self.rate = rate
+        self.clients = {} # writer -> id rắn của client (None: chưa vào / đã chết)
+        self.players = {} # id rắn -> writer
+        self.joining = []
+        self.left = []
+        self.handlers = set()
+        self.server = None
+        self.running = False
+        self.jitter = []
+        self.dropped = 0
+        self.bytes_sent = 0
+        self.delta_bytes = 0
+        self.full_bytes = [] # Cỡ một ảnh 'full', lấy mẫu mỗi giây để so với delta
+        self.disconnects = 0
+        for _ in range(bots):
+            self.arena.spawn_snake()
+
+    async def start(self, host=NET_HOST, port=NET_PORT):
+        self.server = await asyncio.start_server(self.handle_client, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    def send(self, writer, data):
+        if writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            print("Warning: Dropping client that cannot keep up")
+            writer.close()
+            return
+        writer.write(data)
+        self.bytes_sent += len(data)
+
+    async def handle_client(self, reader, writer):
+        self.handlers.add(asyncio.current_task())
+        self.clients[writer] = None
+        arena = self.arena
+        self.send(writer, encode({'t': 'welcome', 'w': arena.grid_width, 'h': arena.grid_height,
+                                  'rate': self.rate}))
+        self.send(writer, encode(snapshot(arena)))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                kind = message.get('t')
+                snake_id = self.clients.get(writer)
+                if kind == 'turn' and snake_id is not None:
+                    arena.queue_turn(snake_id, message.get('d'))
+                elif kind == 'join' and snake_id is None and writer not in self.joining:
+                    self.joining.append(writer)
+                elif kind == 'full':
+                    self.send(writer, encode(snapshot(arena)))
+        except ConnectionError:
+            pass
+        finally:
+            self.drop_client(writer)
+            self.handlers.discard(asyncio.current_task())
+
+    def drop_client(self, writer):
+        snake_id = self.clients.pop(writer, None)
+        if writer in self.joining:
+            self.joining.remove(writer)
+        if snake_id is not None:
+            # Rắn được bỏ ở tick kế tiếp cùng với delta báo rời trận, để ảnh
+            # 'full' gửi trước đó vẫn khớp với các delta client đã nhận.
+            self.left.append(snake_id)
+        self.disconnects += 1
+        writer.close()
+
+    def tick(self):
+        arena = self.arena
+        for snake_id in self.left:
+            del self.players[snake_id]
+            arena.remove_snake(snake_id)
+        result = arena.step(self.bot.actions(arena, skip=self.players))
+        deaths = [[snake_id, 'left'] for snake_id in self.left]
+        deaths += [[snake_id, cause] for snake_id, cause in result.deaths]
+        self.left = []
+        for snake_id, _ in result.deaths:
+            writer = self.players.pop(snake_id, None)
+            if writer is not None:
+                self.clients[writer] = None
+
+        moves = []
+        for snake in arena.snakes:
+            if snake.alive:
+                x, y = snake.body[0]
+                moves.extend((snake.id, x, y, 1 if snake.grew else 0))
+
+        spawned = []
+        for _ in range(self.bots - (len(arena.alive_snakes) - len(self.players))):
+            snake_id = arena.spawn_snake()
+            if snake_id is None:
+                break
+            spawned.append(snake_id)
+        joined = []
+        while self.joining:
+            snake_id = arena.spawn_snake()
+            if snake_id is None:
+                break
+            writer = self.joining.pop(0)
+            self.clients[writer] = snake_id
+            self.players[snake_id] = writer
+            spawned.append(snake_id)
+            joined.append((writer, snake_id))
+
+        delta = {'t': 'd', 'k': arena.ticks, 'm': moves}
+        if deaths:
+            delta['x'] = deaths
+        if spawned:
+            delta['s'] = [[i, arena.snakes[i].direction, flatten(arena.snakes[i].body)] for i in spawned]
+        if result.food_added:
+            delta['f'] = flatten(result.food_added)
+        data = encode(delta)
+        self.delta_bytes += len(data)
+        if arena.ticks % self.rate == 0:
+            self.full_bytes.append(len(encode(snapshot(arena))))
+        for writer in list(self.clients):
+            self.send(writer, data)
+        for writer, snake_id in joined:
+            self.send(writer, encode({'t': 'you', 'id': snake_id}))
+
+    async def run(self, duration=None):
+        loop = asyncio.get_running_loop()
+        step_time = 1.0 / self.rate
+        next_time = loop.time() + step_time
+        end_time = None if duration is None else loop.time() + duration
+        self.running = True
+        while self.running and (end_time is None or next_time < end_time):
+            delay = next_time - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            now = loop.time()
+            self.jitter.append(now - next_time)
+            self.tick()
+            next_time += step_time
+            if now - next_time > step_time:
+                # Bị chặn quá một bước: bỏ các tick còn nợ, không chạy dồn.
+                owed = int((now - next_time) / step_time)
+                self.dropped += owed
+                next_time += owed * step_time
+        self.server.close()
+        for writer in list(self.clients):
+            writer.close()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+
+    def stop(self):
+        self.running = False
+
+    def stats(self):
+        jitter = sorted(self.jitter)
+        ticks = max(1, len(jitter))
+        return {
+            'ticks': len(jitter),
+            'jitter_p50_ms': percentile(jitter, 0.50) * 1000,
+            'jitter_p99_ms': percentile(jitter, 0.99) * 1000,
+            'jitter_max_ms': (jitter[-1] if jitter else 0.0) * 1000,
+            'dropped_ticks': self.dropped,
+            'bytes_sent': self.bytes_sent,
+            'delta_bytes_per_tick': self.delta_bytes / ticks,
+            'full_bytes': sum(self.full_bytes) / max(1, len(self.full_bytes)),
+            'disconnects': self.disconnects,
+        }
+
+
+def start_server_thread(host=NET_HOST, port=NET_PORT, **options):
+    # Server chạy trong luồng nền với event loop riêng (dùng cho game.py
+    # --host). Trả về cổng đã mở, hoặc None nếu không mở được.
+    ready = threading.Event()
+    box = {}
+
+    async def serve():
+        server = NetServer(**options)
+        try:
+            box['port'] = await server.start(host, port)
+        except OSError as e:
+            print("Warning: Could not start server. Error:", e)
+            return
+        finally:
+            ready.set()
+        await server.run()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    ready.wait()
+    return box.get('port')
+
+
+# --- CLIENT ---
+class ClientWorld:
+    def __init__(self):
+        self.arena = None
+        self.player = None
+        self.width = self.height = 0
+        self.step_time = 1.0 / NET_TICK_RATE
+        self.buffer = b''
+        self.bytes_received = 0
+        self.deltas = 0
+        self.resyncs = 0
+        self.desyncs = 0
+        self.gaps = 0
+        self.waiting = False # Đã lỡ một delta, chờ ảnh 'full'
+        self.want_full = False # Người gọi cần gửi {'t': 'full'} rồi đặt lại False
+
+    def feed(self, data):
+        # Nhận một đoạn byte bất kỳ từ socket; trả về các thông điệp đã áp dụng.
+        self.bytes_received += len(data)
+        lines = (self.buffer + data).split(b'\n')
+        self.buffer = lines.pop()
+        return [self.apply(json.loads(line)) for line in lines if line]
+
+    def apply(self, message):
+        kind = message['t']
+        if kind == 'welcome':
+            self.width, self.height = message['w'], message['h']
+            self.step_time = 1.0 / message['rate']
+        elif kind == 'full':
+            self.load_snapshot(message)
+        elif kind == 'you':
+            self.player = message['id']
+        elif kind == 'd' and self.arena is not None:
+            self.apply_delta(message)
+        return message
+
+    def load_snapshot(self, message):
+        arena = ArenaEngine(self.width, self.height, food_count=0)
+        for snake_id, direction, cells in message['snakes']:
+            arena.add_snake(pairs(cells), direction, snake_id)
+        for pos in pairs(message['food']):
+            arena.add_food(pos)
+        arena.ticks = message['k']
+        if self.arena is not None:
+            self.resyncs += 1
+            # Đang chờ sau khi lỡ delta thì bản sao chắc chắn cũ, không tính là lệch.
+            if not self.waiting and world_signature(arena) != world_signature(self.arena):
+                self.desyncs += 1
+        if self.player is not None and self.player not in {snake[0] for snake in message['snakes']}:
+            self.player = None # Rắn của người chơi đã chết trong các delta bị lỡ
+        self.waiting = False
+        self.arena = arena
+
+    def apply_delta(self, message):
+        arena = self.arena
+        if self.waiting:
+            return
+        if message['k'] != arena.ticks + 1:
+            self.gaps += 1
+            self.waiting = self.want_full = True
+            return
+        moves = message['m']
+        for i in range(0, len(moves), 4):
+            arena.advance_snake(moves[i], (moves[i + 1], moves[i + 2]), bool(moves[i + 3]))
+        for snake_id, cause in message.get('x', ()):
+            arena.remove_snake(snake_id, cause)
+            if snake_id == self.player:
+                self.player = None
+        for pos in pairs(message.get('f', ())):
+            arena.add_food(pos)
+        for snake_id, direction, cells in message.get('s', ()):
+            arena.add_snake(pairs(cells), direction, snake_id)
+        arena.ticks = message['k']
+        self.deltas += 1
+
+
+async def load_client(host, port, seconds, seed=None, sync_timeout=30):
+    # Client không giao diện cho kiểm thử tải: ArenaBot lái rắn trên bản
+    # sao trạng thái, vào lại trận khi chết, cuối cùng xin một ảnh 'full'
+    # để kiểm tra bản sao không bị lệch.
+    loop = asyncio.get_running_loop()
+    reader, writer = await asyncio.open_connection(host, port)
+    world = ClientWorld()
+    bot = ArenaBot(seed)
+    deaths = 0
+
+    def send(message):
+        if not writer.is_closing():
+            writer.write(encode(message))
+
+    send({'t': 'join'})
+    end_time = loop.time() + seconds
+    joined = False
+    closed = False
+    while not closed:
+        remaining = end_time - loop.time()
+        if remaining <= 0:
+            break
+        try:
+            data = await asyncio.wait_for(reader.read(65536), remaining)
+        except asyncio.TimeoutError:
+            break
+        except ConnectionError:
+            data = b''
+        if not data:
+            closed = True
+        for message in world.feed(data):
+            if world.want_full:
+                world.want_full = False
+                send({'t': 'full'})
+            if message['t'] == 'you':
+                joined = True
+            if message['t'] != 'd' or world.waiting:
+                continue
+            if world.player is None:
+                if joined:
+                    deaths += 1
+                    joined = False
+                    send({'t': 'join'})
+                continue
+            snake = world.arena.snakes[world.player]
+            direction = bot.decide(world.arena, snake)
+            if direction != snake.direction:
+                send({'t': 'turn', 'd': direction})
+
+    if not closed:
+        send({'t': 'full'})
+        resyncs = world.resyncs
+        try:
+            while world.resyncs == resyncs:
+                data = await asyncio.wait_for(reader.read(65536), sync_timeout)
+                if not data:
+                    break
+                world.feed(data)
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+    writer.close()
+    return {'bytes_received': world.bytes_received, 'deltas': world.deltas, 'deaths': deaths,
+            'resyncs': world.resyncs, 'desyncs': world.desyncs, 'gaps': world.gaps}
+
+
+def server_for(players, bots=0, rate=NET_TICK_RATE, seed=None, min_size=(32, 16)):
+    width, height = arena_size(players + bots, *min_size)
+    return NetServer(width, height, bots=bots, food_count=arena_food_count(players + bots),
+                     rate=rate, seed=seed)
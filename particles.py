@@ -0,0 +1,168 @@
+import math
+import random
+
+import pygame
+
+# Hệ hạt dùng chung cho mọi hiệu ứng (lấp lánh khi ăn, tia bắn, vệt đuôi,
+# hào quang táo vàng, nổ khi chết).
+# - Pool dung lượng cố định, bố trí kiểu structure-of-arrays: mỗi thuộc tính
+#   là một list riêng, hạt hết hạn bị xoá bằng cách chép hạt cuối vào chỗ nó.
+#   Khi pool đầy, hạt mới bị bỏ (đếm trong .dropped).
+# - Hạt có cùng (màu, bán kính đầu/cuối, alpha, tuổi thọ, drag, trọng lực)
+#   dùng chung một "track": với mỗi tuổi, sprite (render sẵn theo bán kính
+#   và bậc alpha) cùng hệ số dịch chuyển tính trước. Mỗi khung chỉ còn tra
+#   track và một lệnh Surface.blits cho toàn bộ hạt.
+# - Tuổi hạt tính theo khung hình, như các hiệu ứng cũ.
+
+ALPHA_LEVELS = 16
+MAX_RADIUS = 64
+MAX_LIFE = 600
+
+
+class ParticlePool:
+    def __init__(self, capacity=4096, seed=None):
+        self.capacity = capacity
+        self.rng = random.Random(seed)
+        self.x = [0.0] * capacity
+        self.y = [0.0] * capacity
+        self.vx = [0.0] * capacity
+        self.vy = [0.0] * capacity
+        self.born = [0] * capacity
+        self.expires = [0] * capacity
+        self.track = [None] * capacity
+        self.fields = (self.x, self.y, self.vx, self.vy, self.born, self.expires, self.track)
+        self.count = 0
+        self.dropped = 0
+        self.frame = 0
+        self.max_radius = 0
+        self.sprites = {}
+        self.tracks = {}
+
+    def clear(self):
+        self.count = 0
+        self.max_radius = 0
+
+    def get_sprite(self, color, radius, level):
+        key = (color, radius, level)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+            alpha = level * 255 // ALPHA_LEVELS
+            pygame.draw.circle(sprite, (color[0], color[1], color[2], alpha), (radius, radius), radius)
+            if pygame.display.get_surface() is not None:
+                sprite = sprite.convert_alpha()
+            self.sprites[key] = sprite
+        return sprite
+
+    def get_track(self, color, radius_start, radius_end, alpha, life, drag, gravity):
+        # track[tuổi] = (sprite, hệ số vận tốc, độ lệch x, độ lệch y) hoặc None
+        # nếu hạt ở tuổi đó không còn thấy. Vị trí sau `tuổi` bước tích phân
+        # (v nhân drag rồi cộng trọng lực mỗi bước):
+        #   x = x0 + vx0 * f,  y = y0 + vy0 * f + g
+        key = (color, radius_start, radius_end, alpha, life, drag, gravity)
+        track = self.tracks.get(key)
+        if track is not None:
+            return track
+        track = [None] * life
+        factor = 0.0
+        fall = 0.0
+        drag_power = 1.0
+        fall_speed = 0.0
+        for age in range(1, life):
+            factor += drag_power
+            fall += fall_speed
+            drag_power *= drag
+            fall_speed = fall_speed * drag + gravity
+            t = age / life
+            radius = min(MAX_RADIUS, int(radius_start + (radius_end - radius_start) * t))
+            level = int(alpha * (1.0 - t) * ALPHA_LEVELS / 255.0 + 0.5)
+            if radius > 0 and level > 0:
+                track[age] = (self.get_sprite(color, radius, level), factor, -radius, fall - radius)
+        self.tracks[key] = track
+        return track
+
+    def emit(self, x, y, vx=0.0, vy=0.0, life=10, radius_start=4.0, radius_end=0.0,
+             alpha=200, color=(255, 255, 255), drag=1.0, gravity=0.0):
+        i = self.count
+        if i >= self.capacity:
+            self.dropped += 1
+            return
+        life = max(2, min(MAX_LIFE, int(life)))
+        self.count = i + 1
+        self.x[i] = x
+        self.y[i] = y
+        self.vx[i] = vx
+        self.vy[i] = vy
+        self.born[i] = self.frame
+        self.expires[i] = self.frame + life
+        self.track[i] = self.get_track(color, radius_start, radius_end, alpha, life, drag, gravity)
+        radius = int(max(radius_start, radius_end))
+        if radius > self.max_radius:
+            self.max_radius = min(MAX_RADIUS, radius)
+
+    # --- EMITTERS ---
+    def sparkle(self, x, y, radius, color=(255, 255, 100), life=10, alpha=200):
+        # Vòng sáng nở ra rồi mờ dần (hiệu ứng ăn táo cũ).
+        self.emit(x, y, life=life, radius_start=0.0, radius_end=radius, alpha=alpha, color=color)
+
+    def burst(self, x, y, count, color, speed=4.0, life=24, radius=4.0,
+              alpha=230, drag=0.9, gravity=0.0, spread=0.0):
+        rng = self.rng
+        for _ in range(count):
+            angle = rng.uniform(0.0, math.tau)
+            velocity = speed * rng.uniform(0.3, 1.0)
+            self.emit(x + rng.uniform(-spread, spread), y + rng.uniform(-spread, spread),
+                      math.cos(angle) * velocity, math.sin(angle) * velocity,
+                      life * rng.uniform(0.6, 1.0), radius, 0.0, alpha, color, drag, gravity)
+
+    def trail(self, x, y, color, radius=6.0, life=18, alpha=90):
+        rng = self.rng
+        self.emit(x + rng.uniform(-3, 3), y + rng.uniform(-3, 3),
+                  rng.uniform(-0.2, 0.2), rng.uniform(-0.2, 0.2),
+                  life, radius, radius * 0.3, alpha, color, 0.95)
+
+    def glow(self, x, y, color, spread, radius=5.0, life=30, alpha=160):
+        # Đốm sáng bay lên quanh một điểm (táo vàng).
+        rng = self.rng
+        self.emit(x + rng.uniform(-spread, spread), y + rng.uniform(-spread, spread),
+                  rng.uniform(-0.15, 0.15), rng.uniform(-0.8, -0.3),
+                  life, radius, 1.0, alpha, color, 0.98)
+
+    # --- UPDATE / DRAW ---
+    def update(self):
+        self.frame += 1
+        frame = self.frame
+        n = self.count
+        expired = [i for i, end in enumerate(self.expires[:n]) if end <= frame]
+        # Xoá từ chỉ số lớn xuống để hạt cuối được chép vào luôn còn sống.
+        for i in reversed(expired):
+            n -= 1
+            if i != n:
+                for field in self.fields:
+                    field[i] = field[n]
+        self.count = n
+
+    def draw(self, surface, bounds=False, offset=(0, 0)):
+        # Vẽ toàn bộ hạt bằng một lệnh blits, dịch đi -offset (camera). Với
+        # bounds=True trả về hình chữ nhật bao quanh chúng (cho dirty-rect),
+        # còn lại trả về None.
+        n = self.count
+        if not n:
+            return None
+        frame = self.frame
+        ox, oy = offset
+        # blits nhận toạ độ float (tự cắt phần thập phân), bỏ int() cho nhanh.
+        blits = [(entry[0], (x + vx * entry[1] + entry[2] - ox, y + vy * entry[1] + entry[3] - oy))
+                 for x, y, vx, vy, born, track in zip(self.x[:n], self.y[:n], self.vx[:n],
+                                                      self.vy[:n], self.born[:n], self.track[:n])
+                 if (entry := track[frame - born]) is not None]
+        if not blits:
+            return None
+        surface.blits(blits, doreturn=False)
+        if not bounds:
+            return None
+        xs = [pos[0] for _, pos in blits]
+        ys = [pos[1] for _, pos in blits]
+        size = self.max_radius * 2
+        left, top = min(xs), min(ys)
+        return pygame.Rect(left, top, max(xs) - left + size, max(ys) - top + size)
@@ -0,0 +1,113 @@
+import csv
+import time
+from array import array
+from collections import deque
+
+# Đo thời gian từng công đoạn của một khung hình trong game_loop.
+# Mỗi khung: begin_frame(), mark(<công đoạn>) sau mỗi phần, end_frame().
+# Toàn bộ chuỗi số liệu được giữ lại để ghi CSV; cửa sổ gần nhất dùng cho
+# các phân vị hiển thị trên overlay.
+
+PROFILE_STAGES = ('events', 'logic', 'background', 'food', 'snake',
+                  'effects', 'score', 'overlay', 'present')
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class TimingHistogram:
+    # Thống kê thời gian có bộ nhớ cố định cho phiên chạy lâu (autopilot,
+    # soak, worker): đếm/tổng/lớn nhất cộng dồn và histogram các ô rộng
+    # BUCKET giây tới LIMIT (giá trị lớn hơn dồn vào ô cuối). Phân vị là cận
+    # trên của ô chứa nó (không vượt quá max), sai số tối đa một ô.
+    BUCKET = 0.0001
+    LIMIT = 0.25
+
+    def __init__(self):
+        self.counts = array('I', bytes(4 * (int(self.LIMIT / self.BUCKET) + 1)))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, seconds):
+        index = int(seconds / self.BUCKET)
+        last = len(self.counts) - 1
+        self.counts[index if index < last else last] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        # Cùng quy ước với percentile(): phần tử thứ int(q * count) khi đã sắp xếp.
+        if not self.count:
+            return 0.0
+        rank = min(self.count - 1, int(q * self.count))
+        seen = 0
+        for index, count in enumerate(self.counts[:-1]):
+            seen += count
+            if seen > rank:
+                return min((index + 1) * self.BUCKET, self.max)
+        return self.max # Rơi vào ô cuối (vượt LIMIT)
+
+
+class FrameProfiler:
+    def __init__(self, stages=PROFILE_STAGES, window=240):
+        self.stages = stages
+        self.stage_index = {name: i for i, name in enumerate(stages)}
+        self.series = [array('d') for _ in stages]
+        self.totals = array('d')
+        self.recent = [deque(maxlen=window) for _ in stages]
+        self.recent_totals = deque(maxlen=window)
+        self.current = [0.0] * len(stages)
+        self.last = 0.0
+
+    @property
+    def frames(self):
+        return len(self.totals)
+
+    def begin_frame(self):
+        self.current = [0.0] * len(self.stages)
+        self.last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.current[self.stage_index[stage]] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        total = 0.0
+        for i, seconds in enumerate(self.current):
+            ms = seconds * 1000
+            self.series[i].append(ms)
+            self.recent[i].append(ms)
+            total += ms
+        self.totals.append(total)
+        self.recent_totals.append(total)
+
+    def percentiles(self, quantiles=(0.50, 0.95, 0.99)):
+        result = {}
+        for name, values in zip(self.stages, self.recent):
+            ordered = sorted(values)
+            result[name] = tuple(percentile(ordered, q) for q in quantiles)
+        ordered = sorted(self.recent_totals)
+        result['frame'] = tuple(percentile(ordered, q) for q in quantiles)
+        return result
+
+    def write_csv(self, path):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(('frame',) + tuple(f"{name}_ms" for name in self.stages) + ('total_ms',))
+            for i in range(len(self.totals)):
+                row = [i] + [f"{series[i]:.4f}" for series in self.series] + [f"{self.totals[i]:.4f}"]
+                writer.writerow(row)
@@ -0,0 +1,135 @@
+import argparse
+import gzip
+import json
+import os
+import time
+
+from engine import SnakeEngine
+
+# Định dạng replay: JSON (nén gzip nếu tên tệp kết thúc bằng .gz) gồm seed,
+# cấu hình bàn chơi, chế độ wrap và danh sách [tick, hướng] đã được
+# SnakeEngine ghi lại. Vì engine tất định theo seed, chạy lại các lệnh này
+# cho ra đúng ván đấu ban đầu (điểm, số tick, nguyên nhân kết thúc).
+
+REPLAY_VERSION = 1
+DIRECTION_CODES = {'UP': 'U', 'DOWN': 'D', 'LEFT': 'L', 'RIGHT': 'R'}
+CODE_DIRECTIONS = {code: direction for direction, code in DIRECTION_CODES.items()}
+
+
+class ReplayError(Exception):
+    pass
+
+
+def replay_from_engine(engine):
+    return {
+        'version': REPLAY_VERSION,
+        'seed': engine.seed,
+        'wrap': engine.wrap_mode,
+        'grid': [engine.grid_width, engine.grid_height, engine.top_row],
+        'base_speed': engine.base_speed,
+        'inputs': [[tick, DIRECTION_CODES[direction]] for tick, direction in engine.input_log],
+        'result': {
+            'score': engine.score,
+            'ticks': engine.ticks,
+            'death': engine.death_cause,
+            'won': engine.won,
+        },
+    }
+
+
+def save_replay(path, engine):
+    data = json.dumps(replay_from_engine(engine), separators=(',', ':'))
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt', encoding='utf-8') as f:
+        f.write(data)
+
+
+def load_replay(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    try:
+        with opener(path, 'rt', encoding='utf-8') as f:
+            replay = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ReplayError(f"Cannot read replay '{path}': {e}")
+    if replay.get('version') != REPLAY_VERSION:
+        raise ReplayError(f"Unsupported replay version in '{path}': {replay.get('version')}")
+    return replay
+
+
+def engine_from_replay(replay):
+    grid_width, grid_height, top_row = replay['grid']
+    return SnakeEngine(grid_width, grid_height, top_row, wrap_mode=replay['wrap'],
+                       seed=replay['seed'], base_speed=replay['base_speed'])
+
+
+def iter_inputs(replay):
+    for tick, code in replay['inputs']:
+        yield tick, CODE_DIRECTIONS[code]
+
+
+def run_headless(replay, max_ticks=None):
+    engine = engine_from_replay(replay)
+    if max_ticks is None:
+        max_ticks = replay['result']['ticks']
+    inputs = list(iter_inputs(replay))
+    index = 0
+    step = engine.step
+    turn = engine.turn
+    while engine.alive and engine.ticks < max_ticks:
+        while index < len(inputs) and inputs[index][0] <= engine.ticks:
+            turn(inputs[index][1])
+            index += 1
+        step()
+    return engine
+
+
+def check_result(replay, engine):
+    expected = replay['result']
+    actual = {'score': engine.score, 'ticks': engine.ticks,
+              'death': engine.death_cause, 'won': engine.won}
+    return actual == expected, actual
+
+
+def verify_files(paths):
+    failures = 0
+    total_ticks = 0
+    start = time.perf_counter()
+    for path in paths:
+        try:
+            replay = load_replay(path)
+        except ReplayError as e:
+            print(f"ERROR     {path}: {e}")
+            failures += 1
+            continue
+        engine = run_headless(replay)
+        ok, actual = check_result(replay, engine)
+        total_ticks += engine.ticks
+        if ok:
+            print(f"OK        {path}: score {actual['score']} in {actual['ticks']} ticks")
+        else:
+            failures += 1
+            print(f"MISMATCH  {path}: expected {replay['result']}, got {actual}")
+    elapsed = time.perf_counter() - start
+    rate = total_ticks / elapsed if elapsed > 0 else 0
+    print(f"{len(paths) - failures}/{len(paths)} replays verified, "
+          f"{total_ticks} ticks in {elapsed:.3f}s ({rate:,.0f} ticks/s)")
+    return failures == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify Snake Game replays headlessly')
+    parser.add_argument('paths', nargs='+', help='Replay files or directories')
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.endswith(('.json', '.json.gz'))))
+        else:
+            paths.append(path)
+    raise SystemExit(0 if verify_files(paths) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import math
+
+# Bộ lập lịch bước cố định cho mô phỏng, tách khỏi tốc độ khung hình.
+# Mỗi khung cộng thời gian thực vào accumulator rồi chạy các tick đến hạn
+# (while scheduler.next_tick(): engine.step()). Số tick bù trong một khung bị
+# giới hạn: sau một lần khựng dài (cửa sổ bị kéo, máy bận) phần thời gian
+# còn nợ bị bỏ (đếm vào dropped) thay vì chạy dồn một loạt bước làm rắn
+# đâm tường trước khi người chơi kịp thấy. Tick chạy trễ hơn late_after
+# giây so với lúc đến hạn được đếm vào late. alpha là tỉ lệ đã đi được tới
+# tick kế tiếp, dùng để nội suy khi vẽ.
+
+MAX_CATCH_UP_STEPS = 2
+LATE_AFTER = 0.05
+
+
+class FixedStepScheduler:
+    def __init__(self, rate, display_rate=120, max_catch_up=MAX_CATCH_UP_STEPS, late_after=LATE_AFTER):
+        self.display_rate = display_rate
+        self.max_catch_up = max_catch_up
+        self.late_after = late_after
+        self.accumulator = 0.0
+        self.frame_steps = 0
+        self.ticks = 0
+        self.dropped = 0
+        self.late = 0
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        # Khi tốc độ logic cao hơn tốc độ khung hình, mỗi khung bình thường đã
+        # cần vài tick, nên giới hạn bù tăng theo tỉ lệ đó.
+        self.rate = rate
+        self.step_time = 1.0 / rate
+        self.step_cap = max(self.max_catch_up, 2 * math.ceil(rate / self.display_rate))
+
+    def add_time(self, dt):
+        self.accumulator += dt
+        self.frame_steps = 0
+
+    def next_tick(self):
+        if self.accumulator < self.step_time:
+            return False
+        if self.frame_steps >= self.step_cap:
+            owed = int(self.accumulator / self.step_time)
+            self.dropped += owed
+            self.accumulator -= owed * self.step_time
+            return False
+        if self.accumulator - self.step_time > self.late_after:
+            self.late += 1
+        self.accumulator -= self.step_time
+        self.frame_steps += 1
+        self.ticks += 1
+        return True
+
+    @property
+    def alpha(self):
+        return min(1.0, self.accumulator / self.step_time)
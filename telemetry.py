@@ -0,0 +1,144 @@
+import gzip
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Telemetry theo phiên chơi, không bao giờ chặn vòng lặp game.
+# - emit() chỉ thêm một tuple vào hàng đợi có giới hạn (collections.deque:
+#   append/popleft an toàn giữa các luồng mà không cần khoá), không mã
+#   hoá JSON hay chạm tới đĩa trên luồng game.
+# - Một luồng nền thức dậy mỗi FLUSH_INTERVAL giây (hoặc sớm hơn khi hàng
+#   đợi đã đủ BATCH_SIZE hay đầy một nửa), lấy hết sự kiện, mã hoá JSONL và ghi một gzip
+#   member vào file của phiên (mở ở chế độ append cho mỗi lô, nên tiến trình
+#   chết chỉ mất lô đang ghi; gzip đọc được file nhiều member).
+# - Khi hàng đợi đầy (đĩa chậm, luồng ghi bị đói CPU): 'drop-newest' bỏ sự
+#   kiện mới, 'drop-oldest' bỏ sự kiện cũ nhất (deque maxlen). Số sự kiện
+#   bị bỏ, độ sâu hàng đợi hiện tại và lớn nhất có trong metrics().
+
+QUEUE_SIZE = 4096
+BATCH_SIZE = 512
+FLUSH_INTERVAL = 0.5
+DROP_POLICIES = ('drop-newest', 'drop-oldest')
+
+
+class TelemetryBus:
+    def __init__(self, path, queue_size=QUEUE_SIZE, policy='drop-newest',
+                 batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        if policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{policy}', expected one of {DROP_POLICIES}")
+        self.path = path
+        self.queue_size = queue_size
+        self.policy = policy
+        # Đánh thức luồng ghi sớm khi hàng đợi đầy một lô hoặc đầy một nửa.
+        self.wake_depth = max(1, min(batch_size, queue_size // 2))
+        self.flush_interval = flush_interval
+        self.queue = deque(maxlen=queue_size if policy == 'drop-oldest' else None)
+        self.start_time = time.perf_counter()
+        self.emitted = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.written = 0
+        self.batches = 0
+        self.bytes_written = 0
+        self.write_seconds = 0.0
+        self.errors = 0
+        self.wake = threading.Event()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name='telemetry', daemon=True)
+        self.thread.start()
+
+    # --- LUỒNG GAME ---
+    def emit(self, kind, **data):
+        queue = self.queue
+        depth = len(queue)
+        if depth >= self.queue_size:
+            # drop-oldest: deque(maxlen) tự bỏ phần tử đầu khi append.
+            self.dropped += 1
+            if self.policy == 'drop-newest':
+                return
+        else:
+            depth += 1
+        queue.append((time.perf_counter() - self.start_time, kind, data))
+        self.emitted += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if depth == self.wake_depth:
+            self.wake.set()
+
+    @property
+    def depth(self):
+        return len(self.queue)
+
+    def metrics(self):
+        return {
+            'emitted': self.emitted,
+            'written': self.written,
+            'dropped': self.dropped,
+            'queue_depth': len(self.queue),
+            'max_queue_depth': self.max_depth,
+            'queue_size': self.queue_size,
+            'policy': self.policy,
+            'batches': self.batches,
+            'bytes': self.bytes_written,
+            'write_ms': round(self.write_seconds * 1000, 1),
+        }
+
+    def close(self, timeout=5.0):
+        # Ghi nốt những gì còn trong hàng đợi rồi dừng luồng ghi.
+        if self.closed:
+            return
+        self.closed = True
+        self.wake.set()
+        self.thread.join(timeout)
+
+    # --- LUỒNG GHI ---
+    def run(self):
+        while True:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            closing = self.closed
+            self.flush()
+            if closing:
+                return
+
+    def flush(self):
+        queue = self.queue
+        lines = []
+        try:
+            while True:
+                timestamp, kind, data = queue.popleft()
+                data['t'] = round(timestamp, 4)
+                data['e'] = kind
+                lines.append(json.dumps(data, separators=(',', ':')))
+        except IndexError:
+            pass
+        if not lines:
+            return
+        start = time.perf_counter()
+        payload = ('\n'.join(lines) + '\n').encode()
+        try:
+            with gzip.open(self.path, 'ab') as f:
+                f.write(payload)
+            self.bytes_written = os.path.getsize(self.path)
+        except OSError as e:
+            self.errors += 1
+            if self.errors == 1:
+                print("Warning: Could not write telemetry. Error:", e)
+            return
+        finally:
+            self.write_seconds += time.perf_counter() - start
+        self.written += len(lines)
+        self.batches += 1
+
+
+def session_path(directory):
+    os.makedirs(directory, exist_ok=True)
+    name = time.strftime("session-%Y%m%d-%H%M%S") + f"-{os.getpid()}.jsonl.gz"
+    return os.path.join(directory, name)
+
+
+def read_events(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
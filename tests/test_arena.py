@@ -0,0 +1,94 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from arena import ArenaBot, ArenaEngine
+
+SEED = 0
+
+
+def assert_grid_matches(arena):
+    # occupancy/owner/danh sách ô trống phải khớp đúng thân các rắn còn sống.
+    expected = bytearray(len(arena.occupancy))
+    for snake in arena.alive_snakes:
+        for x, y in snake.body:
+            index = y * arena.grid_width + x
+            expected[index] += 1
+            assert arena.owner[index] == snake.id
+    assert arena.occupancy == expected
+    assert arena.free_cell_count == expected.count(0)
+
+
+def two_snakes(first, first_direction, second, second_direction):
+    arena = ArenaEngine(12, 10, food_count=0, seed=SEED)
+    arena.add_snake(first, first_direction)
+    arena.add_snake(second, second_direction)
+    return arena
+
+
+def test_head_on_collision_kills_both():
+    # Hai đầu đối mặt đi vào chỗ của nhau: mỗi đầu đâm vào thân con kia.
+    arena = two_snakes([(5, 5), (4, 5), (3, 5)], 'RIGHT', [(6, 5), (7, 5), (8, 5)], 'LEFT')
+    result = arena.step()
+    assert sorted(result.deaths) == [(0, 'snake'), (1, 'snake')]
+    assert not arena.alive_snakes
+    assert_grid_matches(arena)
+
+
+def test_same_cell_kills_both():
+    arena = two_snakes([(4, 5), (3, 5), (2, 5)], 'RIGHT', [(6, 5), (7, 5), (8, 5)], 'LEFT')
+    result = arena.step()
+    assert sorted(result.deaths) == [(0, 'head'), (1, 'head')]
+    assert not arena.alive_snakes
+    assert_grid_matches(arena)
+
+
+def test_head_to_body_kills_only_the_mover():
+    arena = two_snakes([(5, 4), (4, 4), (3, 4)], 'RIGHT', [(6, 3), (6, 4), (6, 5)], 'UP')
+    result = arena.step()
+    assert result.deaths == [(0, 'snake')]
+    survivor = arena.snakes[1]
+    assert survivor.alive and list(survivor.body) == [(6, 2), (6, 3), (6, 4)]
+    assert_grid_matches(arena)
+
+
+def test_following_a_tail_is_safe():
+    # Ô đuôi vừa rời đi trong cùng tick được phép đi vào.
+    arena = two_snakes([(5, 5), (4, 5), (3, 5)], 'RIGHT', [(8, 5), (7, 5), (6, 5)], 'RIGHT')
+    result = arena.step()
+    assert not result.deaths
+    assert arena.snakes[0].head == (6, 5)
+    assert_grid_matches(arena)
+
+
+def test_self_and_wall_deaths():
+    arena = two_snakes([(5, 5), (5, 6), (4, 6), (4, 5), (3, 5)], 'UP', [(11, 0), (10, 0), (9, 0)], 'RIGHT')
+    arena.turn(0, 'LEFT')
+    result = arena.step()
+    assert sorted(result.deaths) == [(0, 'self'), (1, 'wall')]
+    assert [snake.death_cause for snake in arena.snakes] == ['self', 'wall']
+    assert_grid_matches(arena)
+
+
+def test_bots_play_until_last_snake_standing():
+    arena = ArenaEngine(20, 20, food_count=3, seed=SEED)
+    for _ in range(8):
+        assert arena.spawn_snake(length=3) is not None
+    bot = ArenaBot(seed=SEED, wander=0.3)
+    deaths = {}
+    while len(arena.alive_snakes) > 1 and arena.ticks < 5000:
+        result = arena.step(bot.actions(arena))
+        for snake_id, cause in result.deaths:
+            assert snake_id not in deaths
+            deaths[snake_id] = cause
+        assert_grid_matches(arena)
+    [winner] = arena.alive_snakes
+    assert winner.id not in deaths and len(deaths) == 7
+    assert {'head', 'snake', 'self'} <= set(deaths.values())
+    for snake_id, cause in deaths.items():
+        assert arena.snakes[snake_id].death_cause == cause
+
+    # Slot của rắn đã bị loại được dùng lại khi spawn.
+    assert arena.spawn_snake(length=3) in deaths
+    assert_grid_matches(arena)
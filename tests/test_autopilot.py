@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autopilot import DECISION_BUDGET, Autopilot
+from engine import SnakeEngine
+
+# Mỗi lần tìm có thể vượt ngân sách tối đa 3 ô (các ô kề của ô được mở cuối
+# cùng), và một quyết định có nhiều nhất 4 lần tìm/loang vượt như vậy.
+SLACK = 12
+
+
+@pytest.mark.parametrize('width, height, wrap_mode, ticks', [
+    (32, 18, True, 6000),
+    (32, 18, False, 6000),
+    (101, 101, False, 12000),
+    (101, 101, True, 12000),
+    (500, 500, False, 1500),
+    (500, 500, True, 1500),
+])
+def test_decision_work_is_bounded(width, height, wrap_mode, ticks):
+    # Số ô được duyệt trong một quyết định không phụ thuộc kích thước bàn,
+    # nên thời gian quyết định chậm nhất có chặn trên (đo bằng bench.py
+    # autopilot --max-us).
+    engine = SnakeEngine(width, height, top_row=0, seed=3, wrap_mode=wrap_mode)
+    pilot = Autopilot(engine)
+    while engine.alive and engine.ticks < ticks:
+        engine.step(pilot.decide())
+    assert engine.score > 0
+    assert 0 < pilot.max_visited <= DECISION_BUDGET + SLACK
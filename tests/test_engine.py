@@ -0,0 +1,205 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autopilot import Autopilot
+from engine import GOLDEN_APPLE_CHANCE, SnakeEngine
+
+SEED = 7
+
+
+class RecordingRandom(random.Random):
+    # Ghi lại các lần tung xúc xắc táo vàng để bản cũ dùng đúng kết quả đó.
+    def __init__(self, seed):
+        super().__init__(seed)
+        self.rolls = []
+
+    def randrange(self, start, stop=None, step=1):
+        value = super().randrange(start, stop, step)
+        if start == 0 and stop == GOLDEN_APPLE_CHANCE:
+            self.rolls.append(value)
+        return value
+
+
+class LegacyGame:
+    # Logic một bước của game_loop trước khi tách SnakeEngine, chép nguyên
+    # (tọa độ ô thay cho pixel). spawn_food và xúc xắc táo vàng lấy từ
+    # những gì engine đã chọn, vì engine chọn ô trống theo cách khác.
+    def __init__(self, engine, wrap_mode):
+        self.snake_body = [list(cell) for cell in engine.snake_body]
+        self.snake_pos = list(self.snake_body[0])
+        self.direction = engine.direction
+        self.change_to = self.direction
+        self.food_pos = list(engine.food_pos)
+        self.golden_apple_pos = None
+        self.golden_apple_timer = 0
+        self.score = 0
+        self.current_speed = engine.base_speed
+        self.wrap_mode = wrap_mode
+        self.width = engine.grid_width
+        self.height = engine.grid_height
+        self.top_row = engine.top_row
+        self.death = None
+        self.spawns = []
+        self.rolls = []
+
+    def spawn_food(self):
+        return list(self.spawns.pop(0))
+
+    def turn(self, direction):
+        direction_now = self.direction
+        if direction == 'UP' and direction_now != 'DOWN':
+            self.change_to = 'UP'
+        if direction == 'DOWN' and direction_now != 'UP':
+            self.change_to = 'DOWN'
+        if direction == 'LEFT' and direction_now != 'RIGHT':
+            self.change_to = 'LEFT'
+        if direction == 'RIGHT' and direction_now != 'LEFT':
+            self.change_to = 'RIGHT'
+
+    def step(self):
+        snake_pos, snake_body = self.snake_pos, self.snake_body
+        self.direction = direction = self.change_to
+
+        if direction == 'UP':
+            snake_pos[1] -= 1
+        if direction == 'DOWN':
+            snake_pos[1] += 1
+        if direction == 'LEFT':
+            snake_pos[0] -= 1
+        if direction == 'RIGHT':
+            snake_pos[0] += 1
+
+        if (snake_pos[0] < 0 or snake_pos[0] >= self.width or
+            snake_pos[1] < self.top_row or snake_pos[1] >= self.height):
+            self.death = 'wall'
+            return
+
+        snake_body.insert(0, list(snake_pos))
+        ate_something = False
+
+        if snake_pos[0] == self.food_pos[0] and snake_pos[1] == self.food_pos[1]:
+            ate_something = True
+            self.score += 10
+            if self.score % 50 == 0:
+                self.current_speed += 1
+            self.food_pos = self.spawn_food()
+
+        golden = self.golden_apple_pos
+        if golden and snake_pos[0] == golden[0] and snake_pos[1] == golden[1]:
+            ate_something = True
+            self.score += 50
+            self.golden_apple_pos = None
+            self.golden_apple_timer = 0
+
+        if not ate_something:
+            snake_body.pop()
+        elif self.wrap_mode:
+            snake_body.reverse()
+            snake_pos[:] = snake_body[0]
+
+            if direction == 'UP': direction = 'DOWN'
+            elif direction == 'DOWN': direction = 'UP'
+            elif direction == 'LEFT': direction = 'RIGHT'
+            elif direction == 'RIGHT': direction = 'LEFT'
+
+            self.direction = self.change_to = direction
+
+        if self.golden_apple_pos:
+            self.golden_apple_timer -= 1
+            if self.golden_apple_timer <= 0:
+                self.golden_apple_pos = None
+        elif self.rolls.pop(0) == 1:
+            self.golden_apple_pos = self.spawn_food()
+            self.golden_apple_timer = 150
+
+        for block in snake_body[1:]:
+            if snake_pos[0] == block[0] and snake_pos[1] == block[1]:
+                self.death = 'self'
+                return
+
+
+def assert_same_state(engine, legacy):
+    assert engine.snake_body == [tuple(cell) for cell in legacy.snake_body]
+    assert engine.direction == legacy.direction
+    assert engine.score == legacy.score
+    assert engine.speed == legacy.current_speed
+    assert engine.food_pos == tuple(legacy.food_pos)
+    assert engine.golden_apple_pos == (tuple(legacy.golden_apple_pos) if legacy.golden_apple_pos else None)
+    assert engine.golden_apple_timer == legacy.golden_apple_timer
+    assert engine.death_cause == legacy.death
+
+
+def play(engine, legacy, moves, max_ticks):
+    # Chạy engine và bản cũ song song, so sánh trạng thái sau mỗi tick.
+    # moves(tick) trả về hướng bấm (hoặc None) trước mỗi bước.
+    seen = {'ate': 0, 'speed_up': 0, 'reversed': 0, 'golden_spawned': 0, 'golden_expired': 0}
+    engine.rng = RecordingRandom(SEED)
+    while engine.alive and engine.ticks < max_ticks:
+        direction = moves(engine.ticks)
+        result = engine.step(direction)
+        if direction is not None:
+            legacy.turn(direction)
+        if result.ate_food:
+            legacy.spawns.append(engine.food_pos)
+        if result.golden_spawned:
+            legacy.spawns.append(engine.golden_apple_pos)
+        legacy.rolls.extend(engine.rng.rolls)
+        engine.rng.rolls.clear()
+        legacy.step()
+        assert not legacy.spawns and not legacy.rolls
+        assert_same_state(engine, legacy)
+        seen['ate'] += result.ate_food
+        for key in ('speed_up', 'reversed', 'golden_spawned', 'golden_expired'):
+            seen[key] += getattr(result, key)
+    return seen
+
+
+def test_autopilot_game_matches_legacy_loop():
+    engine = SnakeEngine(seed=SEED)
+    legacy = LegacyGame(engine, wrap_mode=False)
+    pilot = Autopilot(engine)
+    seen = play(engine, legacy, lambda tick: pilot.decide(), 6000)
+    assert seen['ate'] >= 5 and seen['speed_up'] >= 1
+    assert seen['golden_spawned'] >= 1
+
+
+def test_golden_apple_expiry_matches_legacy_loop():
+    # Rắn chạy vòng 4x4 ở góc bàn, không đuổi theo táo vàng nên táo hết hạn.
+    engine = SnakeEngine(seed=SEED)
+    engine.food_pos = (20, 10)
+    legacy = LegacyGame(engine, wrap_mode=False)
+    loop = ['DOWN'] * 3 + ['LEFT'] * 3 + ['UP'] * 3 + ['RIGHT'] * 3
+    seen = play(engine, legacy, lambda tick: loop[tick % len(loop)], 4000)
+    assert engine.alive
+    assert seen['golden_spawned'] >= 1 and seen['golden_expired'] >= 1
+
+
+def test_wrap_mode_reversal_matches_legacy_loop():
+    engine = SnakeEngine(seed=SEED, wrap_mode=True)
+    legacy = LegacyGame(engine, wrap_mode=True)
+    pilot = Autopilot(engine)
+    seen = play(engine, legacy, lambda tick: pilot.decide(), 3000)
+    assert seen['reversed'] >= 5
+
+
+def test_wall_death_matches_legacy_loop():
+    engine = SnakeEngine(seed=SEED)
+    engine.food_pos = (0, engine.grid_height - 1)
+    legacy = LegacyGame(engine, wrap_mode=False)
+    play(engine, legacy, lambda tick: None, 100)
+    assert engine.death_cause == 'wall'
+    assert engine.head == (engine.grid_width - 1, engine.top_row)
+
+
+def test_self_death_matches_legacy_loop():
+    engine = SnakeEngine(seed=SEED)
+    engine.place_snake([(6, 5), (5, 5), (4, 5), (3, 5), (2, 5), (1, 5)], 'RIGHT')
+    engine.food_pos = (0, engine.grid_height - 1)
+    legacy = LegacyGame(engine, wrap_mode=False)
+    turns = {0: 'UP', 1: 'LEFT', 2: 'DOWN'}
+    play(engine, legacy, turns.get, 10)
+    assert engine.death_cause == 'self'
+    assert engine.ticks == 3
@@ -0,0 +1,81 @@
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import game
+from engine import SnakeEngine
+from leaderboard import Leaderboard
+
+
+@pytest.fixture(scope='module', autouse=True)
+def display():
+    game.init_display(hidden=True)
+    game.load_assets()
+    yield
+    game.pygame.quit()
+
+
+@pytest.fixture(autouse=True)
+def no_leaderboard(monkeypatch):
+    # Không ghi vào leaderboard.db thật của repo.
+    monkeypatch.setattr(game, 'LEADERBOARD', None)
+
+
+def winnable_engine(wrap_mode, record_inputs=False):
+    # Bàn 5x1, táo ở x = 4, không cần phím.
+    # - Wrap mode: rắn chiếm x = 1..3; ăn xong rắn quay đầu và ăn nốt táo ở
+    #   x = 0 -> lấp kín bàn sau hai tick dù đã đảo chiều.
+    # - Thường: rắn chiếm x = 0..3, ăn táo là lấp kín bàn.
+    engine = SnakeEngine(5, 1, top_row=0, wrap_mode=wrap_mode, seed=1, record_inputs=record_inputs)
+    if not wrap_mode:
+        engine.place_snake([(3, 0), (2, 0), (1, 0), (0, 0)], 'RIGHT')
+    engine.food_pos = (4, 0)
+    return engine
+
+
+WIN_SCORES = {True: 20, False: 10}
+
+
+@pytest.mark.parametrize('wrap_mode', [True, False])
+def test_game_loop_reports_win(monkeypatch, wrap_mode):
+    monkeypatch.setattr(game, 'new_engine', winnable_engine)
+    score, won = game.game_loop(0, wrap_mode)
+    assert won
+    assert score == WIN_SCORES[wrap_mode]
+
+
+@pytest.mark.parametrize('wrap_mode', [True, False])
+def test_session_shows_win_screen(monkeypatch, wrap_mode):
+    monkeypatch.setattr(game, 'new_engine', winnable_engine)
+    shown = []
+
+    def game_over_screen(score, high_score, won=False):
+        shown.append((score, won))
+        raise game.SessionExit()
+
+    monkeypatch.setattr(game, 'game_over_screen', game_over_screen)
+    with pytest.raises(game.SessionExit):
+        game.run_session(wrap_mode)
+    assert shown == [(WIN_SCORES[wrap_mode], True)]
+
+
+def test_large_boards_rank_separately(monkeypatch, tmp_path):
+    board = Leaderboard(str(tmp_path / 'leaderboard.db'))
+    monkeypatch.setattr(game, 'LEADERBOARD', board)
+    assert game.current_mode(False) == 'normal'
+    assert game.current_mode(True) == 'wrap'
+    game.save_round_score(game.current_mode(False), 120, 300, 30.0)
+
+    monkeypatch.setattr(game, 'BOARD_SIZE', (500, 500))
+    assert game.current_mode(False) == 'normal-500x500'
+    assert game.current_mode(True) == 'wrap-500x500'
+    game.save_round_score(game.current_mode(False), 9000, 20000, 600.0)
+
+    assert game.load_high_score('normal') == 120
+    assert game.load_high_score('normal-500x500') == 9000
+    board.close()
@@ -0,0 +1,68 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from leaderboard import LEGACY_HIGHSCORE_FILE, game_mode, open_leaderboard
+
+
+def write_legacy(directory, text, mtime=1000.0):
+    path = directory / LEGACY_HIGHSCORE_FILE
+    path.write_text(text, encoding='utf-8')
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_legacy_high_score_is_imported_into_normal_mode(tmp_path):
+    write_legacy(tmp_path, "120")
+    board = open_leaderboard(str(tmp_path))
+    assert board.high_score('normal') == 120
+    assert board.top('normal') == [(120, 0, 0.0, 1000.0)]
+    assert board.high_score('wrap') == 0 and board.top('wrap') == []
+    board.close()
+
+
+def test_unreadable_legacy_file_imports_nothing(tmp_path):
+    write_legacy(tmp_path, "not a score")
+    board = open_leaderboard(str(tmp_path))
+    assert board.count('normal') == 0 and board.high_score('normal') == 0
+    board.close()
+
+
+def test_top_orders_by_score_then_earlier_game(tmp_path):
+    board = open_leaderboard(str(tmp_path))
+    board.record_many([
+        ('normal', 50, 10, 1.0, 300.0),
+        ('normal', 90, 20, 2.0, 200.0),
+        ('normal', 50, 30, 3.0, 100.0),
+        ('normal', 90, 40, 4.0, 400.0),
+        ('normal', 10, 50, 5.0, 50.0),
+        ('normal', 70, 60, 6.0, 250.0),
+        ('wrap', 500, 70, 7.0, 10.0),
+        (game_mode(False, (20, 20)), 999, 80, 8.0, 20.0),
+    ])
+    assert board.high_score('normal') == 90
+    assert board.high_score('wrap') == 500
+    assert board.high_score('normal-20x20') == 999
+    assert [(score, played_at) for score, _, _, played_at in board.top('normal')] == [
+        (90, 200.0), (90, 400.0), (70, 250.0), (50, 100.0), (50, 300.0)]
+    assert board.top('normal', limit=2) == [(90, 20, 2.0, 200.0), (90, 40, 4.0, 400.0)]
+    assert board.top('wrap') == [(500, 70, 7.0, 10.0)]
+    board.close()
+
+
+def test_reopening_does_not_import_legacy_score_again(tmp_path):
+    legacy = write_legacy(tmp_path, "120")
+    first = open_leaderboard(str(tmp_path))
+    # Mở thêm khi kết nối đầu vẫn đang dùng, rồi mở lại sau khi file cũ đổi:
+    # điểm cũ chỉ được nhập một lần.
+    second = open_leaderboard(str(tmp_path))
+    first.record('normal', 30, played_at=2000.0)
+    first.close()
+    second.close()
+
+    legacy.write_text("999", encoding='utf-8')
+    board = open_leaderboard(str(tmp_path))
+    assert board.count('normal') == 2
+    assert board.high_score('normal') == 120
+    board.close()
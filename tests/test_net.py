@@ -0,0 +1,107 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from net import ClientWorld, NetServer, encode, snapshot, world_signature
+
+SEED = 5
+
+
+class RecordingWriter:
+    # Thay cho StreamWriter của một client: giữ lại các byte server gửi.
+    def __init__(self):
+        self.data = bytearray()
+        self.transport = self
+
+    def is_closing(self):
+        return False
+
+    def get_write_buffer_size(self):
+        return 0
+
+    def write(self, data):
+        self.data += data
+
+    def close(self):
+        pass
+
+
+def connect():
+    # Server 20x20 có bot và một client (xin vào trận) đã nhận 'welcome' và
+    # ảnh 'full' ban đầu như trong NetServer.handle_client.
+    server = NetServer(20, 20, bots=6, food_count=4, seed=SEED)
+    writer = RecordingWriter()
+    server.clients[writer] = None
+    world = ClientWorld()
+    world.feed(encode({'t': 'welcome', 'w': 20, 'h': 20, 'rate': server.rate}) + encode(snapshot(server.arena)))
+    server.joining.append(writer)
+    return server, writer, world
+
+
+def run(server, writer, ticks):
+    # Các byte server gửi cho client ở mỗi tick.
+    sent = []
+    for _ in range(ticks):
+        server.tick()
+        sent.append(bytes(writer.data))
+        writer.data.clear()
+    return sent
+
+
+def test_deltas_rebuild_authoritative_arena():
+    server, writer, world = connect()
+    kinds = set()
+    for data in run(server, writer, 1):
+        world.feed(data)
+    for _ in range(300):
+        [data] = run(server, writer, 1)
+        # Dữ liệu tới theo từng mảnh bất kỳ, không theo ranh giới dòng.
+        for offset in range(0, len(data), 37):
+            for message in world.feed(data[offset:offset + 37]):
+                kinds.update(key for key in message if key in 'xsf')
+        assert world_signature(world.arena) == world_signature(server.arena)
+        assert world.arena.ticks == server.arena.ticks
+    assert kinds == {'x', 's', 'f'}
+    assert world.deltas == 301 and world.gaps == 0
+
+    # Ảnh 'full' giữa trận khớp với bản sao: không tính là lệch.
+    world.feed(encode(snapshot(server.arena)))
+    assert world.resyncs == 1 and world.desyncs == 0
+
+
+def test_dropped_delta_waits_for_full_snapshot():
+    server, writer, world = connect()
+    sent = run(server, writer, 40)
+    for data in sent[:20]:
+        world.feed(data)
+    before = world_signature(world.arena)
+
+    # Delta của tick 21 bị mất: các delta sau không nối tiếp nên bị bỏ qua.
+    for data in sent[21:]:
+        world.feed(data)
+    assert world.gaps == 1 and world.waiting and world.want_full
+    assert world_signature(world.arena) == before
+
+    world.feed(encode(snapshot(server.arena)))
+    assert not world.waiting
+    assert world_signature(world.arena) == world_signature(server.arena)
+    assert world.resyncs == 1 and world.desyncs == 0
+
+
+def test_out_of_order_delta_then_resync_catches_up():
+    server, writer, world = connect()
+    sent = run(server, writer, 12)
+    for data in sent[:10] + [sent[11], sent[10]]:
+        world.feed(data)
+    assert world.gaps == 1 and world.waiting
+
+    # Server trả ảnh 'full' giữa hai tick; các delta sau đó lại áp được.
+    run(server, writer, 5)
+    world.feed(encode(snapshot(server.arena)))
+    for _ in range(50):
+        [data] = run(server, writer, 1)
+        world.feed(data)
+        assert world_signature(world.arena) == world_signature(server.arena)
+    assert world.arena.ticks == server.arena.ticks
+    assert world.gaps == 1 and world.desyncs == 0
@@ -0,0 +1,31 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profiler import TimingHistogram, percentile
+
+
+def test_histogram_matches_sorted_percentiles():
+    rng = random.Random(3)
+    values = [rng.uniform(0.012, 0.022) for _ in range(5000)] + [0.4, 0.031]
+    histogram = TimingHistogram()
+    for value in values:
+        histogram.add(value)
+    ordered = sorted(values)
+    assert histogram.count == len(values)
+    assert histogram.max == 0.4
+    assert abs(histogram.mean - sum(values) / len(values)) < 1e-12
+    for q in (0.50, 0.95, 0.99):
+        assert 0 <= histogram.percentile(q) - percentile(ordered, q) <= TimingHistogram.BUCKET
+
+
+def test_histogram_memory_is_fixed():
+    histogram = TimingHistogram()
+    buckets = len(histogram.counts)
+    for i in range(100000):
+        histogram.add(i * 1e-5)
+    assert len(histogram.counts) == buckets
+    assert histogram.percentile(1.0) == histogram.max
+    assert TimingHistogram().percentile(0.5) == 0.0
@@ -0,0 +1,44 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from autopilot import Autopilot
+from engine import SnakeEngine
+from replay import check_result, load_replay, run_headless, save_replay
+
+
+def play_recorded(seed, wrap_mode):
+    # Autopilot chơi 1500 tick rồi bấm phím ngẫu nhiên (seed cố định) tới khi chết.
+    engine = SnakeEngine(seed=seed, wrap_mode=wrap_mode, record_inputs=True)
+    pilot = Autopilot(engine)
+    rng = random.Random(seed)
+    while engine.alive:
+        if engine.ticks < 1500:
+            engine.step(pilot.decide())
+        else:
+            engine.step(rng.choice(['UP', 'DOWN', 'LEFT', 'RIGHT']))
+    return engine
+
+
+@pytest.mark.parametrize('seed, wrap_mode, name', [
+    (0, False, 'self.json'),
+    (1, False, 'wall.json.gz'),
+    (2, True, 'wrap.json.gz'),
+])
+def test_replay_round_trip(tmp_path, seed, wrap_mode, name):
+    engine = play_recorded(seed, wrap_mode)
+    assert engine.score > 0 and engine.death_cause in ('self', 'wall')
+    path = str(tmp_path / name)
+    save_replay(path, engine)
+
+    replay = load_replay(path)
+    replayed = run_headless(replay)
+    ok, actual = check_result(replay, replayed)
+    assert ok
+    assert actual == {'score': engine.score, 'ticks': engine.ticks,
+                      'death': engine.death_cause, 'won': False}
+    assert replayed.snake_body == engine.snake_body
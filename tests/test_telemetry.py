@@ -0,0 +1,79 @@
+import gzip
+import json
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telemetry import TelemetryBus, read_events
+
+QUEUE = 64
+
+
+def burst(bus, count):
+    # Phát count sự kiện liền một mạch. Switch interval lớn: luồng ghi
+    # (được đánh thức khi hàng đợi đầy một nửa) không chen vào được cho tới
+    # khi luồng test nhả GIL, nên số sự kiện bị bỏ là xác định.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(60)
+    try:
+        for i in range(count):
+            bus.emit('tick', i=i)
+    finally:
+        sys.setswitchinterval(interval)
+
+
+def read_lines(path):
+    # Đọc thẳng bằng gzip/json: file phải là gzip hợp lệ, mỗi dòng một JSON.
+    with open(path, 'rb') as f:
+        text = gzip.decompress(f.read()).decode('utf-8')
+    assert text.endswith('\n')
+    return [json.loads(line) for line in text.splitlines()]
+
+
+@pytest.mark.parametrize('policy, kept', [
+    ('drop-newest', range(0, QUEUE)),
+    ('drop-oldest', range(200 - QUEUE, 200)),
+])
+def test_full_queue_drops_and_close_flushes(tmp_path, policy, kept):
+    path = str(tmp_path / 'session.jsonl.gz')
+    bus = TelemetryBus(path, queue_size=QUEUE, policy=policy, flush_interval=60)
+    burst(bus, 200)
+    metrics = bus.metrics()
+    assert metrics['dropped'] == 200 - QUEUE
+    assert metrics['queue_depth'] == metrics['max_queue_depth'] == QUEUE
+    assert metrics['written'] == 0
+
+    bus.close()
+    assert not bus.thread.is_alive()
+    assert bus.depth == 0 and bus.metrics()['written'] == QUEUE
+    events = read_lines(path)
+    assert [event['i'] for event in events] == list(kept)
+    assert all(event['e'] == 'tick' for event in events)
+    assert [event['t'] for event in events] == sorted(event['t'] for event in events)
+    bus.close()
+
+
+def test_batches_append_gzip_members(tmp_path):
+    path = str(tmp_path / 'session.jsonl.gz')
+    bus = TelemetryBus(path, queue_size=QUEUE, flush_interval=0.01)
+    for round_index in range(3):
+        for i in range(10):
+            bus.emit('round_end', round=round_index, i=i)
+        deadline = time.monotonic() + 5
+        while bus.depth and time.monotonic() < deadline:
+            time.sleep(0.01)
+    bus.emit('session_end')
+    bus.close()
+    metrics = bus.metrics()
+    assert metrics['dropped'] == 0 and metrics['written'] == 31
+    assert metrics['batches'] >= 3
+    assert metrics['bytes'] == os.path.getsize(path)
+    events = read_events(path)
+    assert events == read_lines(path)
+    assert [(event.get('round'), event.get('i')) for event in events[:-1]] == [
+        (round_index, i) for round_index in range(3) for i in range(10)]
+    assert events[-1]['e'] == 'session_end'